@@ -9,9 +9,13 @@ from ai.evaluator import Evaluator
 class AlphaBetaAI(BaseAI):
     """使用 Alpha-Beta 剪枝算法的高级 AI"""
 
-    def __init__(self, color, depth=3, time_limit=3):
+    def __init__(self, color, depth=3, time_limit=3, eval_params=None, lazy_eval=False,
+                 lazy_margin=None):
         super().__init__('深算国手', color, 4)
-        self.evaluator = Evaluator()
+        self.evaluator = Evaluator(eval_params, lazy_margin)
+        # 杀棋搜索中是否使用懒惰评估；lazy_margin 为 None 时使用评估器推导的裕量
+        self.lazy_eval = lazy_eval
+        self.lazy_margin = lazy_margin
         self.max_depth = depth
         self.time_limit = time_limit
         self.nodes_evaluated = 0
@@ -32,6 +36,7 @@ class AlphaBetaAI(BaseAI):
         self.reset_thinking_info()
         self.nodes_evaluated = 0
         self.transposition_table.clear()
+        self.evaluator.reset_lazy_stats()
         self.start_time = time.time()
 
         if time_limit:
@@ -87,6 +92,8 @@ class AlphaBetaAI(BaseAI):
                 self.thinking_info['best_move'] = best_move
                 self.thinking_info['score'] = best_score
                 self.thinking_info['candidate_moves'] = candidate_moves[:5]
+                self.thinking_info['lazy_evals'] = self.evaluator.lazy_stats['calls']
+                self.thinking_info['lazy_exits'] = self.evaluator.lazy_stats['exits']
 
         return best_move
 
@@ -259,9 +266,8 @@ class AlphaBetaAI(BaseAI):
         Returns:
             float: 评分
         """
-        # 先进行静态评估
-        stand_pat = self.evaluator.evaluate(board)
-        stand_pat = stand_pat if self.color == 'red' else -stand_pat
+        # 先进行静态评估（开启懒惰评估时，远离窗口的局面只计算子力和位置）
+        stand_pat = self._static_evaluate(board, alpha, beta)
 
         # 检查时间限制
         if time.time() - self.start_time > self.time_limit:
@@ -326,6 +332,29 @@ class AlphaBetaAI(BaseAI):
 
             return min_eval
 
+    def _static_evaluate(self, board, alpha, beta):
+        """
+        静态评估（己方视角）
+
+        启用 lazy_eval 时使用懒惰评估：子力+位置已远离 (alpha, beta) 窗口时跳过其余评估项
+
+        Args:
+            board: 棋盘对象
+            alpha: Alpha 值（己方视角）
+            beta: Beta 值（己方视角）
+
+        Returns:
+            float: 评分
+        """
+        if not self.lazy_eval:
+            score = self.evaluator.evaluate(board)
+        elif self.color == 'red':
+            score = self.evaluator.evaluate_lazy(board, alpha, beta)
+        else:
+            # 评估器使用红方视角，窗口需要翻转
+            score = self.evaluator.evaluate_lazy(board, -beta, -alpha)
+        return score if self.color == 'red' else -score
+
     def _get_tactical_moves(self, board, moves, color):
         """
         获取战术走法（吃子和将军）
@@ -2,129 +2,156 @@
 局面评估函数 - 基于专业象棋引擎的评估策略
 """
 import config
+from ai.eval_params import EvalParams, load_params
+
+# 结构评估缓存的最大条目数，超过后整体清空
+STRUCTURE_TABLE_SIZE = 65536
+
+# 非子力评估项计数的上限（每方：5 兵、车/马/炮各 2、士/象各 2、1 将），用于推导懒惰评估裕量
+# 伪合法走法数：车、炮各 17，马 8，士、象各 4，将 4（另加照面吃将 1），兵 3
+MAX_MOBILITY = 2 * 17 + 2 * 17 + 2 * 8 + 2 * 4 + 2 * 4 + 5 + 5 * 3
+MAX_KING_COVER = 8  # 将帅周围只有 8 个格子
+MAX_PAWN_LINKS = 4  # 5 个兵最多 4 对相连
+MAX_CROSSING_PIECES = 11  # 能过河的子：5 兵 + 车马炮各 2
+MAX_KING_THREATS = 16
+MAX_CENTER_LEAD = 15  # 己方将帅总在中路，对方中路至少 1 子
+MAX_KING_DISTANCE = 17
 
 
 class Evaluator:
     """局面评估器"""
 
-    def __init__(self):
-        """初始化评估器"""
-        # 棋子基础价值
-        self.piece_values = config.PIECE_VALUES.copy()
-
-        # 位置价值表（参考专业象棋引擎）
-        self._init_position_tables()
-
-    def _init_position_tables(self):
-        """初始化位置价值表 - 基于专业象棋引擎优化"""
-        # 车的位置价值（控制要道和中路）- 优化版
-        self.rook_position_value = [
-            [206, 208, 207, 213, 214, 213, 207, 208, 206],
-            [206, 212, 209, 216, 233, 216, 209, 212, 206],
-            [206, 208, 207, 214, 216, 214, 207, 208, 206],
-            [206, 213, 213, 216, 216, 216, 213, 213, 206],
-            [208, 211, 211, 214, 215, 214, 211, 211, 208],
-            [208, 212, 212, 214, 215, 214, 212, 212, 208],
-            [204, 209, 204, 212, 214, 212, 204, 209, 204],
-            [198, 208, 204, 212, 212, 212, 204, 208, 198],
-            [200, 208, 206, 212, 200, 212, 206, 208, 200],
-            [194, 206, 204, 212, 200, 212, 204, 206, 194],
-        ]
-
-        # 马的位置价值（中心控制）- 优化版
-        self.horse_position_value = [
-            [90, 90, 90, 96, 90, 96, 90, 90, 90],
-            [90, 96, 103, 97, 94, 97, 103, 96, 90],
-            [92, 98, 99, 103, 99, 103, 99, 98, 92],
-            [93, 108, 100, 107, 100, 107, 100, 108, 93],
-            [90, 100, 99, 103, 104, 103, 99, 100, 90],
-            [90, 98, 101, 102, 103, 102, 101, 98, 90],
-            [92, 94, 98, 95, 98, 95, 98, 94, 92],
-            [93, 92, 94, 95, 92, 95, 94, 92, 93],
-            [85, 90, 92, 93, 78, 93, 92, 90, 85],
-            [88, 85, 90, 88, 90, 88, 90, 85, 88],
-        ]
-
-        # 炮的位置价值（中路和河口）- 优化版
-        self.cannon_position_value = [
-            [100, 100, 96, 91, 90, 91, 96, 100, 100],
-            [98, 98, 96, 92, 89, 92, 96, 98, 98],
-            [97, 97, 96, 91, 92, 91, 96, 97, 97],
-            [96, 99, 99, 98, 100, 98, 99, 99, 96],
-            [96, 96, 96, 96, 100, 96, 96, 96, 96],
-            [95, 96, 99, 96, 100, 96, 99, 96, 95],
-            [96, 96, 96, 96, 96, 96, 96, 96, 96],
-            [97, 96, 100, 99, 101, 99, 100, 96, 97],
-            [96, 97, 98, 98, 98, 98, 98, 97, 96],
-            [96, 96, 97, 99, 99, 99, 97, 96, 96],
-        ]
-
-        # 兵/卒的位置价值（过河更有价值）- 优化版
-        self.pawn_position_value = [
-            [9, 9, 9, 11, 13, 11, 9, 9, 9],
-            [19, 24, 34, 42, 44, 42, 34, 24, 19],
-            [19, 24, 32, 37, 37, 37, 32, 24, 19],
-            [19, 23, 27, 29, 30, 29, 27, 23, 19],
-            [14, 18, 20, 27, 29, 27, 20, 18, 14],
-            [7, 0, 13, 0, 16, 0, 13, 0, 7],
-            [7, 0, 7, 0, 15, 0, 7, 0, 7],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-        ]
-
-        # 士的位置价值（保护将帅）- 优化版
-        self.advisor_position_value = [
-            [0, 0, 0, 20, 0, 20, 0, 0, 0],
-            [0, 0, 0, 0, 23, 0, 0, 0, 0],
-            [0, 0, 0, 20, 0, 20, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-        ]
-
-        # 相/象的位置价值 - 优化版
-        self.elephant_position_value = [
-            [0, 0, 20, 0, 0, 0, 20, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [18, 0, 0, 0, 23, 0, 0, 0, 18],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 20, 0, 0, 0, 20, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-        ]
-
-        # 将/帅的位置价值（中心更安全）- 优化版
-        self.king_position_value = [
-            [0, 0, 0, 8888, 8888, 8888, 0, 0, 0],
-            [0, 0, 0, 8888, 8888, 8888, 0, 0, 0],
-            [0, 0, 0, 8888, 8888, 8888, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0],
-        ]
-
-    def evaluate(self, board):
+    def __init__(self, params=None, lazy_margin=None):
+        """
+        初始化评估器
+
+        Args:
+            params: EvalParams 对象、参数名称或参数文件路径，None 使用 config.EVAL_PARAMS
+            lazy_margin: 懒惰评估裕量（见 evaluate_lazy），None 使用 positional_bound
+        """
+        self.lazy_margin = lazy_margin
+        self.lazy_stats = {'calls': 0, 'exits': 0}
+
+        # 结构评估缓存（以 board.structure_hash 为键，只依赖兵/士/象/将的位置）
+        self.structure_table = {}
+        self.structure_stats = {'probes': 0, 'hits': 0}
+
+        self.set_params(params if params is not None else config.EVAL_PARAMS)
+
+    def set_params(self, params):
+        """
+        替换评估参数（支持按难度热替换调优后的参数）
+
+        Args:
+            params: EvalParams 对象、参数名称或参数文件路径
+        """
+        if not isinstance(params, EvalParams):
+            params = load_params(params)
+
+        self.params = params
+        # 棋子基础价值（走法排序等处使用原始价值）
+        self.piece_values = params.piece_values
+        # 预计算的扁平位置表和预乘权重的评估项常数
+        self.piece_square = params.piece_square
+        self.material = params.material
+        self.terms = params.scaled
+        self.positional_bound = self._positional_bound()
+
+        # 参数变化后结构缓存失效
+        self.structure_table.clear()
+
+    def _positional_bound(self):
+        """
+        子力+位置以外各评估项之和的绝对值上限（由评估参数推导）
+
+        各项按可能取到的最大计数乘以已加权的常数，双方相减的项只计一方。
+
+        Returns:
+            float: 上限
+        """
+        terms = self.terms
+        king_safety = (
+            terms['in_check']
+            + MAX_KING_COVER * terms['king_cover']
+            + terms['advisor_pair'] + terms['elephant_pair'] + terms['elephant_linked']
+            + MAX_PAWN_LINKS * terms['pawn_chain']
+        )
+        aggression = (
+            5 * terms['crossed_pawn']
+            + MAX_CROSSING_PIECES * terms['piece_in_enemy_half']
+            + MAX_KING_THREATS * terms['king_threat']
+            + MAX_CENTER_LEAD * terms['center_control']
+            + MAX_MOBILITY * terms['mobility']
+        )
+        endgame = (
+            MAX_KING_DISTANCE * terms['endgame_king_chase']
+            + 5 * (terms['endgame_crossed_pawn'] + terms['endgame_deep_pawn'])
+            + terms['endgame_decisive']
+        )
+        return abs(king_safety) + abs(aggression) + abs(endgame)
+
+    def evaluate_lazy(self, board, alpha, beta):
+        """
+        懒惰评估：先只计算子力和位置价值，若已远离窗口则跳过其余评估项
+
+        已分胜负的局面总是返回胜负分数。裕量不小于 positional_bound 时，
+        提前返回只发生在完整评估同样落在窗口外的局面，搜索结果不变。
+
+        Args:
+            board: 棋盘对象
+            alpha: 窗口下界（红方视角）
+            beta: 窗口上界（红方视角）
+
+        Returns:
+            float: 评分（提前返回时为子力+位置评分）
+        """
+        self.lazy_stats['calls'] += 1
+
+        board.get_attack_map()
+        decided = self._decided_score(board)
+        if decided is not None:
+            return decided
+
+        material_position = self._evaluate_material_position(board)
+        partial = material_position[0]
+        margin = self.lazy_margin if self.lazy_margin is not None else self.positional_bound
+        if partial + margin <= alpha or partial - margin >= beta:
+            self.lazy_stats['exits'] += 1
+            return partial
+
+        return self._evaluate_terms(board, material_position)
+
+    def reset_lazy_stats(self):
+        """重置懒惰评估统计"""
+        self.lazy_stats = {'calls': 0, 'exits': 0}
+
+    def evaluate(self, board, material_position=None):
         """
         评估当前局面
 
         Args:
             board: 棋盘对象
+            material_position: 已计算好的 (子力+位置评分, 原始子力评分)，None 时重新计算
 
         Returns:
             float: 评分（正数表示红方优势，负数表示黑方优势）
         """
+        # 生成本局面的攻击图，下面的将军判定、将帅安全和进攻性评估共用
+        board.get_attack_map()
+
+        decided = self._decided_score(board)
+        if decided is not None:
+            return decided
+
+        return self._evaluate_terms(board, material_position)
+
+    def _decided_score(self, board):
+        """
+        已分胜负（或和棋）局面的评分
+
+        Returns:
+            float: 胜负评分，未分胜负时为 None
+        """
         from core.rules import is_checkmate, get_game_result
 
         # 首先检查是否已经分出胜负
@@ -150,66 +177,54 @@ class Evaluator:
         if is_checkmate(board, 'red'):
             return -50000
 
-        score = 0
-
-        # 1. 子力价值（35%权重）- 进一步降低，更注重战术
-        material_score = self._evaluate_material(board)
-        score += material_score * 0.35
+        return None
 
-        # 2. 位置价值（30%权重）- 提高位置的重要性
-        score += self._evaluate_position(board) * 0.30
+    def _evaluate_terms(self, board, material_position=None):
+        """子力+位置与其余评估项之和（未分胜负的局面）"""
+        # 1+2. 子力与位置价值（预乘权重的扁平表，一次查表完成）
+        if material_position is None:
+            material_position = self._evaluate_material_position(board)
+        score, material_score = material_position
 
-        # 3. 将帅安全（15%权重）
-        score += self._evaluate_king_safety(board) * 0.15
+        # 3. 将帅安全
+        score += self._evaluate_king_safety(board)
 
-        # 4. 进攻性评估（15%权重）
-        score += self._evaluate_aggression(board) * 0.15
+        # 4. 进攻性评估
+        score += self._evaluate_aggression(board)
 
-        # 5. 残局评估（5%权重）- 新增
-        score += self._evaluate_endgame(board, material_score) * 0.05
+        # 5. 残局评估
+        score += self._evaluate_endgame(board, material_score)
 
         return score
 
-    def _evaluate_material(self, board):
-        """评估子力价值"""
+    def _evaluate_material_position(self, board):
+        """
+        评估子力和位置价值（已按权重预乘）
+
+        Args:
+            board: 棋盘对象
+
+        Returns:
+            tuple: (加权后的子力+位置评分, 原始子力评分)
+        """
         score = 0
+        material_score = 0
+        piece_square = self.piece_square
+        material = self.material
 
         for piece in board.get_all_pieces():
-            value = self.piece_values.get(piece.type, 0)
-            if piece.color == 'red':
-                score += value
-            else:
-                score -= value
+            score += piece_square[piece.color][piece.type][piece.row * 9 + piece.col]
+            material_score += material[piece.color][piece.type]
 
-        return score
+        return score, material_score
 
-    def _evaluate_position(self, board):
-        """评估位置价值"""
+    def _evaluate_material(self, board):
+        """评估子力价值（未加权）"""
         score = 0
+        material = self.material
 
         for piece in board.get_all_pieces():
-            pos_value = 0
-            row = piece.row if piece.color == 'red' else (9 - piece.row)
-
-            if piece.type == 'R':
-                pos_value = self.rook_position_value[row][piece.col]
-            elif piece.type == 'H':
-                pos_value = self.horse_position_value[row][piece.col]
-            elif piece.type == 'C':
-                pos_value = self.cannon_position_value[row][piece.col]
-            elif piece.type == 'P':
-                pos_value = self.pawn_position_value[row][piece.col]
-            elif piece.type == 'A':
-                pos_value = self.advisor_position_value[row][piece.col]
-            elif piece.type == 'E':
-                pos_value = self.elephant_position_value[row][piece.col]
-            elif piece.type == 'K':
-                pos_value = self.king_position_value[row][piece.col]
-
-            if piece.color == 'red':
-                score += pos_value
-            else:
-                score -= pos_value
+            score += material[piece.color][piece.type]
 
         return score
 
@@ -221,41 +236,91 @@ class Evaluator:
 
         # 被将军是很危险的
         if is_in_check(board, 'red'):
-            score -= 60
+            score -= self.terms['in_check']
         if is_in_check(board, 'black'):
-            score += 60
+            score += self.terms['in_check']
 
-        # 检查将帅周围的保护
-        red_king = board.find_king('red')
-        black_king = board.find_king('black')
+        # 结构性评估（将帅周围的掩护、士象阵型、兵链），按结构哈希缓存
+        score += self._evaluate_structure(board)
 
-        if red_king:
-            # 统计红方将帅周围的己方棋子数量
-            protection = 0
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0:
-                        continue
-                    r, c = red_king.row + dr, red_king.col + dc
-                    if 0 <= r <= 9 and 0 <= c <= 8:
-                        p = board.get_piece(r, c)
-                        if p and p.color == 'red':
-                            protection += 1
-            score += protection * 5
+        return score
 
-        if black_king:
-            # 统计黑方将帅周围的己方棋子数量
-            protection = 0
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0:
-                        continue
-                    r, c = black_king.row + dr, black_king.col + dc
-                    if 0 <= r <= 9 and 0 <= c <= 8:
-                        p = board.get_piece(r, c)
-                        if p and p.color == 'black':
-                            protection += 1
-            score -= protection * 5
+    def _evaluate_structure(self, board):
+        """
+        评估兵/士/象/将构成的结构
+
+        结构在搜索中很少变化，因此以只包含这些棋子的结构哈希为键缓存结果
+        （缓存的是已加权的评分）
+
+        Args:
+            board: 棋盘对象
+
+        Returns:
+            int: 结构评分
+        """
+        self.structure_stats['probes'] += 1
+        key = board.structure_hash
+        cached = self.structure_table.get(key)
+        if cached is not None:
+            self.structure_stats['hits'] += 1
+            return cached
+
+        score = self._compute_structure(board)
+
+        if len(self.structure_table) >= STRUCTURE_TABLE_SIZE:
+            self.structure_table.clear()
+        self.structure_table[key] = score
+        return score
+
+    def _compute_structure(self, board):
+        """
+        计算结构评分（只读取兵/士/象/将，保证与结构哈希一致）
+
+        Args:
+            board: 棋盘对象
+
+        Returns:
+            int: 结构评分
+        """
+        score = 0
+        terms = self.terms
+
+        for color, sign in (('red', 1), ('black', -1)):
+            structure = {}
+            for piece in board.get_all_pieces(color):
+                if piece.type in ('P', 'A', 'E', 'K'):
+                    structure.setdefault(piece.type, []).append(piece)
+
+            # 1. 将帅周围的掩护（士、象、兵）
+            kings = structure.get('K')
+            if kings:
+                king = kings[0]
+                cover = 0
+                for piece_type in ('A', 'E', 'P'):
+                    for piece in structure.get(piece_type, []):
+                        if abs(piece.row - king.row) <= 1 and abs(piece.col - king.col) <= 1:
+                            cover += 1
+                score += sign * cover * terms['king_cover']
+
+            # 2. 士象阵型：双士、双象俱全更稳固
+            if len(structure.get('A', [])) == 2:
+                score += sign * terms['advisor_pair']
+            elephants = structure.get('E', [])
+            if len(elephants) == 2:
+                score += sign * terms['elephant_pair']
+                # 双象相连（互相保护）
+                if abs(elephants[0].row - elephants[1].row) == 2 and \
+                        abs(elephants[0].col - elephants[1].col) == 2:
+                    score += sign * terms['elephant_linked']
+
+            # 3. 兵链：过河后左右相连的兵
+            crossed = set()
+            for pawn in structure.get('P', []):
+                if (color == 'red' and pawn.row <= 4) or (color == 'black' and pawn.row >= 5):
+                    crossed.add((pawn.row, pawn.col))
+            for row, col in crossed:
+                if (row, col + 1) in crossed:
+                    score += sign * terms['pawn_chain']
 
         return score
 
@@ -269,9 +334,8 @@ class Evaluator:
         Returns:
             float: 进攻性评分
         """
-        from core.rules import is_in_check
-
         score = 0
+        terms = self.terms
 
         # 1. 控制对方半场的棋子数量（鼓励进攻）
         red_in_enemy = 0
@@ -282,44 +346,26 @@ class Evaluator:
                 red_in_enemy += 1
                 # 过河兵特别奖励
                 if piece.type == 'P':
-                    score += 30
+                    score += terms['crossed_pawn']
             elif piece.color == 'black' and piece.row >= 5:  # 黑方在红方半场
                 black_in_enemy += 1
                 if piece.type == 'P':
-                    score -= 30
+                    score -= terms['crossed_pawn']
 
-        score += (red_in_enemy - black_in_enemy) * 15
+        score += (red_in_enemy - black_in_enemy) * terms['piece_in_enemy_half']
 
-        # 2. 威胁对方将帅的棋子数量
+        # 2. 威胁对方将帅的棋子数量（使用攻击图，不再重复生成走法）
+        attack_map = board.get_attack_map()
         red_king = board.find_king('red')
         black_king = board.find_king('black')
 
         if black_king:
             # 统计能攻击到黑方将帅附近的红方棋子
-            threat_count = 0
-            for piece in board.get_all_pieces():
-                if piece.color == 'red':
-                    moves = piece.get_possible_moves(board)
-                    for move in moves:
-                        # 如果能走到将帅附近3格内
-                        distance = abs(move.to_row - black_king.row) + abs(move.to_col - black_king.col)
-                        if distance <= 3:
-                            threat_count += 1
-                            break
-            score += threat_count * 20
+            score += self._count_king_threats(attack_map.targets('red'), black_king) * terms['king_threat']
 
         if red_king:
             # 统计能攻击到红方将帅附近的黑方棋子
-            threat_count = 0
-            for piece in board.get_all_pieces():
-                if piece.color == 'black':
-                    moves = piece.get_possible_moves(board)
-                    for move in moves:
-                        distance = abs(move.to_row - red_king.row) + abs(move.to_col - red_king.col)
-                        if distance <= 3:
-                            threat_count += 1
-                            break
-            score -= threat_count * 20
+            score -= self._count_king_threats(attack_map.targets('black'), red_king) * terms['king_threat']
 
         # 3. 控制中心区域（中路3列）
         red_center_control = 0
@@ -332,15 +378,34 @@ class Evaluator:
                 else:
                     black_center_control += 1
 
-        score += (red_center_control - black_center_control) * 10
+        score += (red_center_control - black_center_control) * terms['center_control']
 
-        # 4. 活动力评估（可走的合法步数）
-        red_mobility = len(board.get_legal_moves('red'))
-        black_mobility = len(board.get_legal_moves('black'))
-        score += (red_mobility - black_mobility) * 2
+        # 4. 活动力评估（攻击图中的可走步数，不逐一检查是否送将）
+        red_mobility = attack_map.move_count('red')
+        black_mobility = attack_map.move_count('black')
+        score += (red_mobility - black_mobility) * terms['mobility']
 
         return score
 
+    def _count_king_threats(self, targets, king):
+        """
+        统计能走到对方将帅附近（3格内）的棋子数量
+
+        Args:
+            targets: 攻击图中一方每个棋子可到达的格子
+            king: 对方将帅
+
+        Returns:
+            int: 威胁棋子数量
+        """
+        threat_count = 0
+        for squares in targets.values():
+            for row, col in squares:
+                if abs(row - king.row) + abs(col - king.col) <= 3:
+                    threat_count += 1
+                    break
+        return threat_count
+
     def _evaluate_endgame(self, board, material_score):
         """
         残局评估 - 根据子力判断是否进入残局，并调整策略
@@ -353,6 +418,7 @@ class Evaluator:
             float: 残局评分
         """
         score = 0
+        terms = self.terms
 
         # 统计双方子力
         red_pieces = []
@@ -377,25 +443,25 @@ class Evaluator:
 
                 # 如果我方优势，应该缩小距离（追杀）
                 if material_score > 200:
-                    score += (15 - king_distance) * 10
+                    score += (15 - king_distance) * terms['endgame_king_chase']
                 # 如果对方优势，应该拉大距离（逃跑）
                 elif material_score < -200:
-                    score += king_distance * 10
+                    score += king_distance * terms['endgame_king_chase']
 
             # 残局中，兵的价值大幅提升
             for piece in board.get_all_pieces():
                 if piece.type == 'P':
                     # 过河兵在残局中价值更高
                     if piece.color == 'red' and piece.row <= 4:
-                        score += 50
+                        score += terms['endgame_crossed_pawn']
                     elif piece.color == 'black' and piece.row >= 5:
-                        score -= 50
+                        score -= terms['endgame_crossed_pawn']
 
                     # 接近对方底线的兵价值极高
                     if piece.color == 'red' and piece.row <= 2:
-                        score += 100
+                        score += terms['endgame_deep_pawn']
                     elif piece.color == 'black' and piece.row >= 7:
-                        score -= 100
+                        score -= terms['endgame_deep_pawn']
 
         # 判断是否是单子残局（极少子力）
         if total_pieces <= 10:
@@ -405,9 +471,9 @@ class Evaluator:
 
             # 如果一方只剩将帅，另一方有大子，大幅加分
             if len(red_pieces) == 1 and len(black_major_pieces) > 0:
-                score -= 500  # 黑方必胜
+                score -= terms['endgame_decisive']  # 黑方必胜
             elif len(black_pieces) == 1 and len(red_major_pieces) > 0:
-                score += 500  # 红方必胜
+                score += terms['endgame_decisive']  # 红方必胜
 
         return score
 
@@ -3,6 +3,8 @@
 """
 import random
 from ai.base_ai import BaseAI
+from ai.eval_params import load_params
+import config
 
 
 class RandomAI(BaseAI):
@@ -10,16 +12,8 @@ class RandomAI(BaseAI):
 
     def __init__(self, color):
         super().__init__('新手小卒', color, 1)
-        # 棋子价值表
-        self.piece_values = {
-            'K': 10000,
-            'R': 900,
-            'C': 450,
-            'H': 450,
-            'A': 200,
-            'E': 200,
-            'P': 100
-        }
+        # 棋子价值表（与评估器共用参数文件）
+        self.piece_values = load_params(config.EVAL_PARAMS).piece_values
 
     def get_move(self, board, time_limit=None):
         """
@@ -0,0 +1,413 @@
+"""
+Texel 风格的评估参数自动调优（离线工具）
+
+数据集每行一个局面：FEN 与对局结果（红方视角）用分号分隔，例如
+    rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w; 1/2-1/2
+结果可以写作 1-0 / 0-1 / 1/2-1/2，或 1 / 0 / 0.5。
+
+调优对象是子力价值和位置价值表：这两项在评估中是线性的，预先为每个局面
+提取稀疏特征，其余评估项作为固定偏移量，之后每次迭代只需做点积。
+以 logistic 损失（交叉熵）为目标做梯度下降，梯度按数据分片在多个进程中并行计算。
+
+用法:
+    python -m ai.tuning positions.txt -o ai/params/tuned.json --workers 4
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+
+from core.board import Board
+from ai.eval_params import EvalParams, PIECE_TYPES, load_params, save_params
+from ai.evaluator import Evaluator
+
+# 参与调优的子力（双方各有一个将帅，价值相互抵消，不参与调优）
+TUNED_PIECE_TYPES = ['A', 'E', 'H', 'R', 'C', 'P']
+PST_OFFSET = len(TUNED_PIECE_TYPES)
+
+RESULT_VALUES = {
+    '1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5,
+    '1': 1.0, '0': 0.0, '0.5': 0.5,
+    '1.0': 1.0, '0.0': 0.0,
+}
+
+# 评估绝对值达到该值的局面已分胜负，不参与调优
+DECISIVE_SCORE = 50000
+
+# 工作进程中的全局状态（由进程池初始化函数设置）
+_worker_evaluator = None
+_worker_base_vector = None
+_worker_samples = None
+
+
+def parse_dataset(path):
+    """
+    读取数据集
+
+    Args:
+        path: 数据集文件路径
+
+    Returns:
+        list: [(fen, result), ...]，result 为红方得分 1.0 / 0.5 / 0.0
+    """
+    positions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fen, sep, result = line.rpartition(';')
+            if not sep or result.strip() not in RESULT_VALUES:
+                raise ValueError(f"数据集第{line_no}行格式错误: {line}")
+            positions.append((fen.strip(), RESULT_VALUES[result.strip()]))
+    return positions
+
+
+def params_to_vector(params):
+    """
+    将评估参数展开为调优向量
+
+    Args:
+        params: EvalParams 对象
+
+    Returns:
+        list: [子力价值..., 位置价值表...]
+    """
+    vector = [float(params.piece_values[t]) for t in TUNED_PIECE_TYPES]
+    for piece_type in PIECE_TYPES:
+        for row in params.position_tables[piece_type]:
+            vector.extend(float(v) for v in row)
+    return vector
+
+
+def vector_to_params(params, vector, name=None):
+    """
+    将调优向量写回参数字典（数值取整）
+
+    Args:
+        params: 作为基础的 EvalParams 对象（权重和评估项常数保持不变）
+        vector: 调优向量
+        name: 新参数集名称
+
+    Returns:
+        dict: 可以直接保存的参数字典
+    """
+    data = params.to_dict()
+    if name:
+        data['name'] = name
+    for i, piece_type in enumerate(TUNED_PIECE_TYPES):
+        data['piece_values'][piece_type] = int(round(vector[i]))
+    for t, piece_type in enumerate(PIECE_TYPES):
+        base = PST_OFFSET + t * 90
+        data['position_tables'][piece_type] = [
+            [int(round(vector[base + row * 9 + col])) for col in range(9)]
+            for row in range(10)
+        ]
+    return data
+
+
+def extract_features(board, params):
+    """
+    提取局面中子力和位置价值的线性特征
+
+    评估中这部分为 Σ 符号 * (子力 * 子力权重 + 位置价值 * 位置权重)，
+    因此每个参数的系数只取决于棋子的分布。
+
+    Args:
+        board: 棋盘对象
+        params: EvalParams 对象
+
+    Returns:
+        list: 稀疏特征 [(参数下标, 系数), ...]
+    """
+    material_weight = params.weights['material']
+    position_weight = params.weights['position']
+    coefficients = {}
+
+    for piece in board.get_all_pieces():
+        sign = 1 if piece.color == 'red' else -1
+        if piece.type in TUNED_PIECE_TYPES:
+            index = TUNED_PIECE_TYPES.index(piece.type)
+            coefficients[index] = coefficients.get(index, 0.0) + sign * material_weight
+
+        table_row = piece.row if piece.color == 'red' else 9 - piece.row
+        index = PST_OFFSET + PIECE_TYPES.index(piece.type) * 90 + table_row * 9 + piece.col
+        coefficients[index] = coefficients.get(index, 0.0) + sign * position_weight
+
+    return [(index, coeff) for index, coeff in coefficients.items() if coeff]
+
+
+def _init_feature_worker(params):
+    """特征提取进程初始化：每个进程创建一次评估器"""
+    global _worker_evaluator, _worker_base_vector
+    _worker_evaluator = Evaluator(params)
+    _worker_base_vector = params_to_vector(params)
+
+
+def _extract_sample(position):
+    """
+    计算单个局面的完整评估并拆分为线性特征和固定偏移量
+
+    Args:
+        position: (fen, result)
+
+    Returns:
+        tuple: (features, offset, result)，已分胜负的局面返回 None
+    """
+    fen, result = position
+    board, _ = Board.from_fen(fen)
+    params = _worker_evaluator.params
+
+    score = _worker_evaluator.evaluate(board)
+    if abs(score) >= DECISIVE_SCORE:
+        return None
+
+    features = extract_features(board, params)
+    linear = sum(coeff * _worker_base_vector[index] for index, coeff in features)
+    return features, score - linear, result
+
+
+def _init_gradient_worker(samples):
+    """梯度计算进程初始化：保存完整样本，按分片下标取用"""
+    global _worker_samples
+    _worker_samples = samples
+
+
+def _sigmoid(score, k):
+    """将评估值映射为红方期望得分"""
+    x = -k * score * math.log(10) / 400
+    if x > 500:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(x))
+
+
+def _shard_loss_and_gradient(task):
+    """
+    计算一个数据分片上的损失和梯度（未取平均）
+
+    Args:
+        task: (分片下标, 分片数, 参数向量, K, 是否计算梯度)
+
+    Returns:
+        tuple: (损失和, 梯度列表或 None)
+    """
+    shard, shards, vector, k, with_gradient = task
+    scale = k * math.log(10) / 400
+    loss = 0.0
+    gradient = [0.0] * len(vector) if with_gradient else None
+    eps = 1e-12
+
+    for features, offset, result in _worker_samples[shard::shards]:
+        score = offset
+        for index, coeff in features:
+            score += coeff * vector[index]
+        p = _sigmoid(score, k)
+        loss -= result * math.log(p + eps) + (1 - result) * math.log(1 - p + eps)
+
+        if with_gradient:
+            # d(交叉熵)/d(评估值) = (p - y) * scale
+            delta = (p - result) * scale
+            for index, coeff in features:
+                gradient[index] += delta * coeff
+
+    return loss, gradient
+
+
+class TexelTuner:
+    """Texel 风格的评估参数调优器"""
+
+    def __init__(self, params='default', workers=None):
+        """
+        初始化调优器
+
+        Args:
+            params: 作为起点的参数（EvalParams、名称或路径）
+            workers: 并行进程数，None 使用 CPU 核数
+        """
+        self.params = params if isinstance(params, EvalParams) else load_params(params)
+        self.workers = workers or os.cpu_count() or 1
+        self.vector = params_to_vector(self.params)
+        self.samples = []
+        self.k = 1.0
+        self._pool = None
+
+    def load_positions(self, positions):
+        """
+        批量计算所有局面的评估并提取特征（多进程）
+
+        Args:
+            positions: [(fen, result), ...]
+
+        Returns:
+            int: 参与调优的局面数（已分胜负的局面被跳过）
+        """
+        chunksize = max(1, len(positions) // (self.workers * 4))
+        with multiprocessing.Pool(self.workers, _init_feature_worker, (self.params,)) as pool:
+            samples = pool.map(_extract_sample, positions, chunksize=chunksize)
+
+        self.samples = [s for s in samples if s is not None]
+        self.close()
+        return len(self.samples)
+
+    def _get_pool(self):
+        """创建梯度计算进程池（样本加载后创建，各进程持有完整样本）"""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers, _init_gradient_worker, (self.samples,))
+        return self._pool
+
+    def close(self):
+        """关闭梯度计算进程池"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def loss_and_gradient(self, vector=None, k=None, with_gradient=True):
+        """
+        计算平均损失和梯度，按分片在进程池中并行
+
+        Args:
+            vector: 参数向量，None 使用当前向量
+            k: sigmoid 缩放系数，None 使用当前值
+            with_gradient: 是否计算梯度
+
+        Returns:
+            tuple: (平均损失, 平均梯度或 None)
+        """
+        if not self.samples:
+            raise ValueError("没有可用于调优的局面")
+
+        vector = self.vector if vector is None else vector
+        k = self.k if k is None else k
+        shards = self.workers
+        tasks = [(shard, shards, vector, k, with_gradient) for shard in range(shards)]
+        results = self._get_pool().map(_shard_loss_and_gradient, tasks)
+
+        n = len(self.samples)
+        loss = sum(r[0] for r in results) / n
+        if not with_gradient:
+            return loss, None
+
+        gradient = [0.0] * len(vector)
+        for _, shard_gradient in results:
+            for i, g in enumerate(shard_gradient):
+                gradient[i] += g
+        return loss, [g / n for g in gradient]
+
+    def fit_k(self, low=0.1, high=3.0, iterations=20):
+        """
+        用黄金分割搜索拟合 sigmoid 缩放系数 K（参数不变时使损失最小）
+
+        Returns:
+            float: 拟合得到的 K
+        """
+        ratio = (math.sqrt(5) - 1) / 2
+
+        def loss(k):
+            return self.loss_and_gradient(k=k, with_gradient=False)[0]
+
+        a, b = low, high
+        c, d = b - ratio * (b - a), a + ratio * (b - a)
+        loss_c, loss_d = loss(c), loss(d)
+        for _ in range(iterations):
+            if loss_c < loss_d:
+                b, d, loss_d = d, c, loss_c
+                c = b - ratio * (b - a)
+                loss_c = loss(c)
+            else:
+                a, c, loss_c = c, d, loss_d
+                d = a + ratio * (b - a)
+                loss_d = loss(d)
+
+        self.k = (a + b) / 2
+        return self.k
+
+    def tune(self, iterations=200, learning_rate=1.0, callback=None):
+        """
+        用 Adam 梯度下降最小化 logistic 损失
+
+        Args:
+            iterations: 迭代次数
+            learning_rate: 学习率（评估参数单位）
+            callback: 每次迭代后调用 callback(iteration, loss)
+
+        Returns:
+            float: 最终损失
+        """
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        m = [0.0] * len(self.vector)
+        v = [0.0] * len(self.vector)
+        loss = None
+
+        for iteration in range(1, iterations + 1):
+            loss, gradient = self.loss_and_gradient()
+            for i, g in enumerate(gradient):
+                if not g:
+                    continue
+                m[i] = beta1 * m[i] + (1 - beta1) * g
+                v[i] = beta2 * v[i] + (1 - beta2) * g * g
+                m_hat = m[i] / (1 - beta1 ** iteration)
+                v_hat = v[i] / (1 - beta2 ** iteration)
+                self.vector[i] -= learning_rate * m_hat / (math.sqrt(v_hat) + eps)
+
+            if callback:
+                callback(iteration, loss)
+
+        return self.loss_and_gradient(with_gradient=False)[0] if loss is not None else None
+
+    def result_params(self, name=None):
+        """
+        导出调优结果
+
+        Args:
+            name: 参数集名称
+
+        Returns:
+            dict: 参数字典（可用 save_params 保存）
+        """
+        return vector_to_params(self.params, self.vector, name)
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='Texel 风格的评估参数调优')
+    parser.add_argument('dataset', help='局面数据集（每行 FEN; 结果）')
+    parser.add_argument('-o', '--output', required=True, help='输出参数文件路径')
+    parser.add_argument('--params', default='default', help='初始参数名称或路径')
+    parser.add_argument('--iterations', type=int, default=200, help='迭代次数')
+    parser.add_argument('--learning-rate', type=float, default=1.0, help='学习率')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数')
+    parser.add_argument('--k', type=float, default=None, help='sigmoid 缩放系数（默认自动拟合）')
+    args = parser.parse_args(argv)
+
+    tuner = TexelTuner(args.params, workers=args.workers)
+    try:
+        positions = parse_dataset(args.dataset)
+        count = tuner.load_positions(positions)
+        print(f"读取局面 {len(positions)} 个，参与调优 {count} 个")
+
+        if args.k is not None:
+            tuner.k = args.k
+        else:
+            print(f"拟合 K = {tuner.fit_k():.4f}")
+
+        initial_loss = tuner.loss_and_gradient(with_gradient=False)[0]
+        print(f"初始损失: {initial_loss:.6f}")
+
+        def report(iteration, loss):
+            if iteration % 10 == 0:
+                print(f"  迭代 {iteration}: 损失 {loss:.6f}")
+
+        final_loss = tuner.tune(args.iterations, args.learning_rate, callback=report)
+        print(f"最终损失: {final_loss:.6f}")
+
+        name = os.path.splitext(os.path.basename(args.output))[0]
+        save_params(tuner.result_params(name), args.output)
+        print(f"参数已保存到 {args.output}")
+    finally:
+        tuner.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
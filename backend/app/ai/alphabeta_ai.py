@@ -9,14 +9,25 @@ from app.ai.evaluator import Evaluator
 class AlphaBetaAI(BaseAI):
     """使用 Alpha-Beta 剪枝算法的高级 AI"""
 
-    def __init__(self, color, depth=3, time_limit=3):
+    def __init__(self, color, depth=3, time_limit=3, eval_params=None, lazy_eval=False,
+                 lazy_margin=None, parallel_workers=0, max_nodes=None):
         super().__init__('深算国手', color, 4)
-        self.evaluator = Evaluator()
+        self.evaluator = Evaluator(eval_params, lazy_margin)
+        self.eval_params = eval_params
+        # 杀棋搜索中是否使用懒惰评估；lazy_margin 为 None 时使用评估器推导的裕量
+        self.lazy_eval = lazy_eval
+        self.lazy_margin = lazy_margin
         self.max_depth = depth
         self.time_limit = time_limit
+        # 节点预算：设置后代替时间限制，搜索量与机器负载无关
+        self.max_nodes = max_nodes
         self.nodes_evaluated = 0
         self.transposition_table = {}  # 置换表
         self.start_time = 0
+        # 根节点并行搜索的进程数，小于2时串行搜索
+        self.parallel_workers = parallel_workers
+        self.worker_nodes = 0
+        self._search_id = None
 
     def get_move(self, board, time_limit=None):
         """
@@ -30,8 +41,8 @@ class AlphaBetaAI(BaseAI):
             Move: 最佳走法
         """
         self.reset_thinking_info()
-        self.nodes_evaluated = 0
-        self.transposition_table.clear()
+        self.reset_search_state()
+        self.evaluator.reset_lazy_stats()
         self.start_time = time.time()
 
         if time_limit:
@@ -48,7 +59,7 @@ class AlphaBetaAI(BaseAI):
 
         # 迭代加深搜索
         for depth in range(1, self.max_depth + 1):
-            if time.time() - self.start_time > self.time_limit * 0.9:
+            if self._out_of_budget(0.9):
                 break
 
             current_best_move = None
@@ -58,20 +69,25 @@ class AlphaBetaAI(BaseAI):
             # 走法排序（使用上一次迭代的结果）
             sorted_moves = self._order_moves(board_copy, legal_moves, best_move)
 
-            for move in sorted_moves:
-                if time.time() - self.start_time > self.time_limit:
-                    break
-
-                captured = board_copy.make_move(move)
-
-                score = self._alpha_beta(
-                    board_copy, depth - 1, float('-inf'), float('inf'), False
+            if self.parallel_workers > 1 and depth > 1:
+                # 多进程根节点并行搜索
+                from app.ai.parallel_search import search_root_parallel
+                candidate_moves, worker_nodes = search_root_parallel(
+                    self, board_copy, sorted_moves, depth,
+                    float('-inf'), float('inf'), self.parallel_workers
                 )
-
-                board_copy.undo_move(move, captured)
-
-                candidate_moves.append((move, score))
-
+                self.worker_nodes += worker_nodes
+            else:
+                for move in sorted_moves:
+                    if self._out_of_budget():
+                        break
+
+                    score = self._search_root_move(
+                        board_copy, move, depth, float('-inf'), float('inf')
+                    )
+                    candidate_moves.append((move, score))
+
+            for move, score in candidate_moves:
                 if score > current_best_score:
                     current_best_score = score
                     current_best_move = move
@@ -83,13 +99,78 @@ class AlphaBetaAI(BaseAI):
                 # 更新思考信息
                 candidate_moves.sort(key=lambda x: x[1], reverse=True)
                 self.thinking_info['depth'] = depth
-                self.thinking_info['nodes_evaluated'] = self.nodes_evaluated
+                self.thinking_info['nodes_evaluated'] = self.nodes_evaluated + self.worker_nodes
                 self.thinking_info['best_move'] = best_move
                 self.thinking_info['score'] = best_score
                 self.thinking_info['candidate_moves'] = candidate_moves[:5]
+                self.thinking_info['lazy_evals'] = self.evaluator.lazy_stats['calls']
+                self.thinking_info['lazy_exits'] = self.evaluator.lazy_stats['exits']
 
+        self._record_speed()
         return best_move
 
+    def _out_of_budget(self, fraction=1.0):
+        """
+        搜索预算是否已用完
+
+        设置了 max_nodes 时只按节点数判断（与机器负载无关，结果可复现），
+        否则按时间判断
+
+        Args:
+            fraction: 使用预算的比例（开始新一轮迭代前用较小的比例）
+        """
+        if self.max_nodes is not None:
+            return self.nodes_evaluated + self.worker_nodes >= self.max_nodes * fraction
+        return time.time() - self.start_time > self.time_limit * fraction
+
+    def _record_speed(self):
+        """记录本次搜索的用时和每秒节点数"""
+        elapsed = time.time() - self.start_time
+        nodes = self.nodes_evaluated + self.worker_nodes
+        self.thinking_info['nodes_evaluated'] = nodes
+        self.thinking_info['elapsed'] = round(elapsed, 3)
+        self.thinking_info['nps'] = int(nodes / elapsed) if elapsed > 0 else 0
+
+    def reset_search_state(self):
+        """清空一次搜索的状态（置换表、节点计数）"""
+        self.nodes_evaluated = 0
+        self.worker_nodes = 0
+        self.transposition_table.clear()
+        if self.parallel_workers > 1:
+            from app.ai.parallel_search import new_search_id
+            self._search_id = new_search_id()
+
+    def _search_root_move(self, board, move, depth, alpha, beta):
+        """
+        搜索一个根走法
+
+        Args:
+            board: 棋盘对象（根局面）
+            move: 根走法
+            depth: 本次迭代的深度
+            alpha: Alpha 值
+            beta: Beta 值
+
+        Returns:
+            float: 该走法的评分
+        """
+        captured = board.make_move(move)
+        score = self._alpha_beta(board, depth - 1, alpha, beta, False)
+        board.undo_move(move, captured)
+        return score
+
+    def _parallel_spec(self):
+        """工作进程重建本 AI 所需的参数（工作进程内不再并行）"""
+        options = (
+            ('depth', self.max_depth),
+            ('time_limit', self.time_limit),
+            ('max_nodes', self.max_nodes),
+            ('eval_params', self.eval_params),
+            ('lazy_eval', self.lazy_eval),
+            ('lazy_margin', self.lazy_margin),
+        )
+        return ('AlphaBetaAI', self.color, options)
+
     def _alpha_beta(self, board, depth, alpha, beta, maximizing):
         """
         Alpha-Beta 剪枝算法
@@ -106,8 +187,8 @@ class AlphaBetaAI(BaseAI):
         """
         self.nodes_evaluated += 1
 
-        # 检查时间限制
-        if time.time() - self.start_time > self.time_limit:
+        # 检查搜索预算
+        if self._out_of_budget():
             return 0
 
         # 查置换表
@@ -259,12 +340,11 @@ class AlphaBetaAI(BaseAI):
         Returns:
             float: 评分
         """
-        # 先进行静态评估
-        stand_pat = self.evaluator.evaluate(board)
-        stand_pat = stand_pat if self.color == 'red' else -stand_pat
+        # 先进行静态评估（开启懒惰评估时，远离窗口的局面只计算子力和位置）
+        stand_pat = self._static_evaluate(board, alpha, beta)
 
-        # 检查时间限制
-        if time.time() - self.start_time > self.time_limit:
+        # 检查搜索预算
+        if self._out_of_budget():
             return stand_pat
 
         # 达到杀棋搜索深度限制
@@ -326,6 +406,29 @@ class AlphaBetaAI(BaseAI):
 
             return min_eval
 
+    def _static_evaluate(self, board, alpha, beta):
+        """
+        静态评估（己方视角）
+
+        启用 lazy_eval 时使用懒惰评估：子力+位置已远离 (alpha, beta) 窗口时跳过其余评估项
+
+        Args:
+            board: 棋盘对象
+            alpha: Alpha 值（己方视角）
+            beta: Beta 值（己方视角）
+
+        Returns:
+            float: 评分
+        """
+        if not self.lazy_eval:
+            score = self.evaluator.evaluate(board)
+        elif self.color == 'red':
+            score = self.evaluator.evaluate_lazy(board, alpha, beta)
+        else:
+            # 评估器使用红方视角，窗口需要翻转
+            score = self.evaluator.evaluate_lazy(board, -beta, -alpha)
+        return score if self.color == 'red' else -score
+
     def _get_tactical_moves(self, board, moves, color):
         """
         获取战术走法（吃子和将军）
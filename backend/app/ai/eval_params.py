@@ -0,0 +1,174 @@
+"""
+评估参数 - 从版本化的参数文件加载权重、子力价值和位置价值表
+"""
+import json
+import os
+
+# 参数文件格式版本，格式不兼容时递增
+PARAMS_VERSION = 1
+
+# 内置参数文件目录（ai/params/<name>.json）
+PARAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'params')
+
+PIECE_TYPES = ['K', 'A', 'E', 'H', 'R', 'C', 'P']
+WEIGHT_NAMES = ['material', 'position', 'king_safety', 'aggression', 'endgame']
+
+# 每个评估项常数所属的权重组，加载时预先乘以对应权重
+TERM_GROUPS = {
+    'in_check': 'king_safety',
+    'king_cover': 'king_safety',
+    'advisor_pair': 'king_safety',
+    'elephant_pair': 'king_safety',
+    'elephant_linked': 'king_safety',
+    'pawn_chain': 'king_safety',
+    'crossed_pawn': 'aggression',
+    'piece_in_enemy_half': 'aggression',
+    'king_threat': 'aggression',
+    'center_control': 'aggression',
+    'mobility': 'aggression',
+    'endgame_king_chase': 'endgame',
+    'endgame_crossed_pawn': 'endgame',
+    'endgame_deep_pawn': 'endgame',
+    'endgame_decisive': 'endgame',
+}
+
+# 已加载的参数（只读共享，按名称或路径缓存）
+_params_cache = {}
+
+
+class EvalParams:
+    """评估参数集合，加载后预计算为扁平数组"""
+
+    def __init__(self, data):
+        """
+        初始化评估参数
+
+        Args:
+            data: 参数字典（参数文件的内容）
+
+        Raises:
+            ValueError: 版本不匹配或缺少字段
+        """
+        version = data.get('version')
+        if version != PARAMS_VERSION:
+            raise ValueError(f"不支持的评估参数版本: {version}（需要 {PARAMS_VERSION}）")
+
+        for section in ('weights', 'piece_values', 'terms', 'position_tables'):
+            if section not in data:
+                raise ValueError(f"评估参数缺少字段: {section}")
+
+        self.version = version
+        self.name = data.get('name', 'custom')
+        self.weights = {name: float(data['weights'][name]) for name in WEIGHT_NAMES}
+        self.piece_values = {t: data['piece_values'][t] for t in PIECE_TYPES}
+        self.terms = {name: data['terms'][name] for name in TERM_GROUPS}
+        self.position_tables = {
+            t: [list(row) for row in data['position_tables'][t]] for t in PIECE_TYPES
+        }
+
+        self._precompute()
+
+    def _precompute(self):
+        """
+        预计算扁平数组和预乘权重，评估热路径中不再做权重乘法
+
+        piece_square[color][type][row * 9 + col] = 子力 * 子力权重 + 位置价值 * 位置权重
+        （红方为正、黑方为负）
+        material[color][type] = 带符号的原始子力价值（残局判断使用）
+        scaled[term] = 评估项常数 * 所属权重
+        """
+        material_weight = self.weights['material']
+        position_weight = self.weights['position']
+
+        self.piece_square = {}
+        self.material = {}
+        for color, sign in (('red', 1), ('black', -1)):
+            self.piece_square[color] = {}
+            self.material[color] = {}
+            for piece_type in PIECE_TYPES:
+                value = self.piece_values[piece_type]
+                table = self.position_tables[piece_type]
+                flat = []
+                for row in range(10):
+                    table_row = row if color == 'red' else 9 - row
+                    for col in range(9):
+                        flat.append(sign * (value * material_weight + table[table_row][col] * position_weight))
+                self.piece_square[color][piece_type] = flat
+                self.material[color][piece_type] = sign * value
+
+        self.scaled = {
+            name: self.terms[name] * self.weights[group] for name, group in TERM_GROUPS.items()
+        }
+
+    def to_dict(self):
+        """转换为可写入参数文件的字典"""
+        return {
+            'version': self.version,
+            'name': self.name,
+            'weights': dict(self.weights),
+            'piece_values': dict(self.piece_values),
+            'terms': dict(self.terms),
+            'position_tables': {t: [list(row) for row in table] for t, table in self.position_tables.items()},
+        }
+
+
+def resolve_params_path(name_or_path):
+    """
+    将参数名称解析为文件路径
+
+    Args:
+        name_or_path: 内置参数名称（如 'default'）或 JSON 文件路径
+
+    Returns:
+        str: 参数文件路径
+    """
+    if os.path.sep in name_or_path or name_or_path.endswith('.json'):
+        return name_or_path
+    return os.path.join(PARAMS_DIR, f"{name_or_path}.json")
+
+
+def _cache_key(path):
+    """参数缓存的键（绝对路径，同一文件的相对与绝对路径共用一项）"""
+    return os.path.abspath(path)
+
+
+def load_params(name_or_path='default', reload=False):
+    """
+    加载评估参数（同一文件只解析一次，结果在所有评估器间共享）
+
+    Args:
+        name_or_path: 内置参数名称或 JSON 文件路径
+        reload: 是否忽略缓存重新读取（用于热替换调优后的参数）
+
+    Returns:
+        EvalParams: 评估参数
+    """
+    path = resolve_params_path(name_or_path)
+    key = _cache_key(path)
+    if not reload and key in _params_cache:
+        return _params_cache[key]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        params = EvalParams(json.load(f))
+
+    _params_cache[key] = params
+    return params
+
+
+def save_params(params, path):
+    """
+    保存评估参数到文件
+
+    Args:
+        params: EvalParams 对象或参数字典
+        path: 目标文件路径
+    """
+    data = params.to_dict() if isinstance(params, EvalParams) else params
+    # 先校验再写入，避免产生无法加载的参数文件
+    EvalParams(data)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+    _params_cache.pop(_cache_key(path), None)
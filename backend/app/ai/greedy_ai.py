@@ -8,9 +8,9 @@ from app.ai.evaluator import Evaluator
 class GreedyAI(BaseAI):
     """贪心算法 AI，优先吃子"""
 
-    def __init__(self, color):
+    def __init__(self, color, eval_params=None):
         super().__init__('贪心将军', color, 2)
-        self.evaluator = Evaluator()
+        self.evaluator = Evaluator(eval_params)
 
     def get_move(self, board, time_limit=None):
         """
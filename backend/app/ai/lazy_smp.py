@@ -0,0 +1,259 @@
+"""
+Lazy SMP：多个进程以错开的起始深度搜索同一个根局面
+
+各进程共享一张放在 multiprocessing.shared_memory 中的置换表，彼此通过置换表
+间接分工，搜索算法本身（MasterAI._alpha_beta）不做任何修改。
+主进程同样参与搜索，结束后通知辅助进程停止，取所有进程中完成深度最深的结果。
+
+每个进程只创建一张共享置换表并在多次搜索间复用（同一进程同一时间只做一次
+Lazy SMP 搜索），新搜索通过递增代数使旧条目失效，而不是重新分配和清零。
+"""
+import atexit
+import struct
+import time
+from concurrent.futures import wait
+from multiprocessing import shared_memory
+
+from app.core.board import Board
+from app.ai.parallel_search import _find_move, _worker_ai, get_pool
+
+# 共享置换表的条目数（2 的幂，每条 24 字节）
+SHARED_TT_ENTRIES = 1 << 20
+
+# 表头：进行中的搜索代数（0 表示没有，辅助进程据此停止）
+_HEADER = struct.Struct('<Q')
+HEADER_SIZE = _HEADER.size
+
+# 条目格式：校验字（key ^ 分数位 ^ 元数据）、分数位、元数据（深度 | 类型 << 16 | 代数 << 24）
+ENTRY_FORMAT = '<QQQ'
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+FLAG_CODES = {'exact': 1, 'lower': 2, 'upper': 3}
+FLAG_NAMES = {code: name for name, code in FLAG_CODES.items()}
+
+_DOUBLE = struct.Struct('<d')
+_BITS = struct.Struct('<Q')
+
+# 本进程拥有的共享置换表（多次搜索复用，进程退出时释放）
+_process_table = None
+
+
+class SharedTranspositionTable:
+    """
+    放在共享内存中的置换表，支持 MasterAI 使用的字典接口
+
+    条目为 (depth, score, flag)。写入不加锁：读取时用校验字检测被并发写坏的
+    条目（无锁哈希），校验失败视为未命中。每个条目记录写入时的搜索代数，
+    只有当前代数的条目有效；创建者调用 clear() 开始新的一代，非创建者调用
+    clear() 不做任何事，以免工作进程开始新搜索时抹掉其他进程已写入的结果。
+    """
+
+    def __init__(self, entries=SHARED_TT_ENTRIES, name=None, generation=0):
+        """
+        创建或连接共享置换表
+
+        Args:
+            entries: 条目数（必须是 2 的幂）
+            name: 共享内存名称，None 表示新建
+            generation: 连接时使用的搜索代数（由创建者传给辅助进程）
+        """
+        if entries & (entries - 1):
+            raise ValueError(f"置换表条目数必须是 2 的幂: {entries}")
+
+        self.entries = entries
+        self.mask = entries - 1
+        self.owner = name is None
+        self.generation = generation
+        if self.owner:
+            size = HEADER_SIZE + entries * ENTRY_SIZE
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:] = bytes(size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        # 最近一次 __contains__ 读到的条目，避免 `in` 与 `[]` 之间被其他进程覆盖
+        self._last_key = None
+        self._last_entry = None
+
+    def _read(self, key):
+        """读取 key 对应的条目，不存在或校验失败时返回 None"""
+        offset = HEADER_SIZE + (key & self.mask) * ENTRY_SIZE
+        check, score_bits, meta = struct.unpack_from(ENTRY_FORMAT, self.shm.buf, offset)
+        if meta == 0 or meta >> 24 != self.generation or check ^ score_bits ^ meta != key:
+            return None
+        score = _DOUBLE.unpack(_BITS.pack(score_bits))[0]
+        return (meta & 0xFFFF, score, FLAG_NAMES[(meta >> 16) & 0xFF])
+
+    def __contains__(self, key):
+        entry = self._read(key)
+        self._last_key = key
+        self._last_entry = entry
+        return entry is not None
+
+    def __getitem__(self, key):
+        entry = self._last_entry if key == self._last_key else self._read(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key, value):
+        depth, score, flag = value
+        offset = HEADER_SIZE + (key & self.mask) * ENTRY_SIZE
+
+        # 本代同一局面只用更深的结果替换，其他条目总是替换
+        check, score_bits, meta = struct.unpack_from(ENTRY_FORMAT, self.shm.buf, offset)
+        if (meta >> 24 == self.generation and check ^ score_bits ^ meta == key
+                and (meta & 0xFFFF) > depth):
+            return
+
+        score_bits = _BITS.unpack(_DOUBLE.pack(score))[0]
+        meta = max(depth, 0) | (FLAG_CODES[flag] << 16) | (self.generation << 24)
+        struct.pack_into(ENTRY_FORMAT, self.shm.buf, offset, key ^ score_bits ^ meta, score_bits, meta)
+        if key == self._last_key:
+            self._last_key = None
+
+    def new_generation(self):
+        """开始新的一次搜索：之前写入的条目全部失效（只有创建者调用）"""
+        self._last_key = None
+        self.generation += 1
+        _HEADER.pack_into(self.shm.buf, 0, self.generation)
+
+    def request_stop(self):
+        """通知连接到本代的辅助进程停止搜索（只有创建者调用）"""
+        _HEADER.pack_into(self.shm.buf, 0, 0)
+
+    def stop_requested(self):
+        """创建者是否已结束本代的搜索（辅助进程在搜索中检查）"""
+        return _HEADER.unpack_from(self.shm.buf, 0)[0] != self.generation
+
+    def clear(self):
+        """清空置换表（只有创建者可以清空，通过开始新的一代实现）"""
+        self._last_key = None
+        if self.owner:
+            self.new_generation()
+
+    def close(self):
+        """断开共享内存，创建者同时释放它"""
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def process_shared_table(entries=SHARED_TT_ENTRIES):
+    """本进程的共享置换表（首次使用时创建，之后每次搜索复用）"""
+    global _process_table
+    if _process_table is None:
+        _process_table = SharedTranspositionTable(entries)
+    return _process_table
+
+
+def close_shared_table():
+    """释放本进程的共享置换表"""
+    global _process_table
+    if _process_table is not None:
+        _process_table.close()
+        _process_table = None
+
+
+atexit.register(close_shared_table)
+
+
+def _lazy_smp_task(spec, search_id, table_name, entries, generation, fen, start_depth, time_budget):
+    """
+    工作进程任务：从 start_depth 开始迭代加深搜索整个根局面
+
+    搜索结束后立即断开共享置换表，不保留旧表的映射。
+
+    Returns:
+        tuple: (完成的深度, 走法 (from_row, from_col, to_row, to_col), 评分, 搜索节点数)
+    """
+    ai = _worker_ai(spec, search_id)
+    table = SharedTranspositionTable(entries, name=table_name, generation=generation)
+    ai.transposition_table = table
+    ai.should_stop = table.stop_requested
+    ai.start_depth = start_depth
+    board, _ = Board.from_fen(fen)
+
+    try:
+        ai.get_move(board, time_limit=time_budget)
+    finally:
+        ai.transposition_table = {}
+        ai.should_stop = None
+        table.close()
+
+    nodes = ai.nodes_evaluated
+    if ai.completed_result is None:
+        return 0, None, 0, nodes
+    depth, move, score = ai.completed_result
+    return depth, (move.from_row, move.from_col, move.to_row, move.to_col), score, nodes
+
+
+def start_helpers(ai, board, workers):
+    """
+    启动辅助进程搜索同一局面
+
+    辅助进程的起始深度在 2 和 3 之间交替错开，使各进程尽早走到不同的深度，
+    主进程从深度 1 开始。调用前主进程应已清空共享置换表。
+
+    Args:
+        ai: 主进程中的 MasterAI（transposition_table 为共享置换表）
+        board: 棋盘对象（根局面）
+        workers: 总进程数（含主进程）
+
+    Returns:
+        list: 辅助进程的 future
+    """
+    table = ai.transposition_table
+    spec = ai._parallel_spec()
+    fen = board.to_fen(ai.color)
+    remaining = ai.time_limit - (time.time() - ai.start_time)
+    pool = get_pool(workers - 1)
+
+    return [
+        pool.submit(
+            _lazy_smp_task, spec, ai._search_id, table.name, table.entries,
+            table.generation, fen, 2 + i % 2, remaining
+        )
+        for i in range(workers - 1)
+    ]
+
+
+def collect_helpers(ai, board, futures):
+    """
+    通知辅助进程停止并等待它们返回，取完成深度最深的结果
+
+    Args:
+        ai: 主进程中的 MasterAI
+        board: 棋盘对象（根局面）
+        futures: start_helpers 返回的 future
+
+    Returns:
+        tuple: (最佳走法, 完成的深度, 评分, 辅助进程搜索的节点数)，
+               辅助进程没有比主进程更深的结果时走法为 None
+    """
+    # 主进程已结束搜索：辅助进程在下一个节点检查到停止信号后返回已完成的迭代，
+    # 不再与同一进程池中的下一次搜索争抢 CPU
+    ai.transposition_table.request_stop()
+
+    # 截止时间只作为辅助进程未能及时响应时的保底
+    timeout = None
+    if ai.max_nodes is None:
+        timeout = max(ai.time_limit - (time.time() - ai.start_time), 0) + 1
+    done, not_done = wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+
+    main_depth = ai.completed_result[0] if ai.completed_result else 0
+    best = (None, main_depth, None)
+    helper_nodes = 0
+    for future in done:
+        if future.exception() is not None:
+            continue
+        depth, move_key, score, nodes = future.result()
+        helper_nodes += nodes
+        if move_key is not None and depth > best[1]:
+            best = (move_key, depth, score)
+
+    move_key, depth, score = best
+    move = _find_move(board, move_key) if move_key is not None else None
+    return move, depth, score, helper_nodes
@@ -10,11 +10,19 @@ from app.ai.evaluator import Evaluator
 class MasterAI(BaseAI):
     """最强AI - 使用所有高级优化技术"""
 
-    def __init__(self, color, depth=10, time_limit=60, quiescence_depth=8):
+    def __init__(self, color, depth=10, time_limit=60, quiescence_depth=8, eval_params=None,
+                 lazy_eval=False, lazy_margin=None, parallel_workers=0, parallel_mode='root',
+                 max_nodes=None):
         super().__init__('绝世棋圣', color, 5)
-        self.evaluator = Evaluator()
+        self.evaluator = Evaluator(eval_params, lazy_margin)
+        self.eval_params = eval_params
+        # 静态搜索中是否使用懒惰评估；lazy_margin 为 None 时使用评估器推导的裕量
+        self.lazy_eval = lazy_eval
+        self.lazy_margin = lazy_margin
         self.max_depth = depth
         self.time_limit = time_limit
+        # 节点预算：设置后代替时间限制，搜索量与机器负载无关
+        self.max_nodes = max_nodes
         self.quiescence_depth = quiescence_depth
         self.nodes_evaluated = 0
         self.transposition_table = {}
@@ -22,14 +30,23 @@ class MasterAI(BaseAI):
         self.history_table = {}  # 历史启发式表
         self.start_time = 0
         self.pv_table = {}  # 主变例表
+        self.best_moves = {}  # 各局面搜索到的最佳走法（局面哈希 -> 走法坐标），用于提取主变例
+        self.excluded_root_moves = set()  # 根局面不搜索的走法坐标（多主变例分析），并行搜索时不生效
+        # 并行搜索的进程数，小于2时串行搜索
+        # parallel_mode: 'root' 根节点分割，'lazy_smp' 多进程共享置换表
+        self.parallel_workers = parallel_workers
+        self.parallel_mode = parallel_mode
+        self.worker_nodes = 0
+        self._search_id = None
+        self.start_depth = 1  # 迭代加深的起始深度（Lazy SMP 辅助进程错开深度）
+        self.completed_result = None  # 最近一次在时限内完成的迭代 (depth, move, score)
+        self.should_stop = None  # 外部停止信号（Lazy SMP 辅助进程），返回 True 时结束搜索
 
     def get_move(self, board, time_limit=None):
         """使用迭代加深和所有优化技术选择最佳走法"""
         self.reset_thinking_info()
-        self.nodes_evaluated = 0
-        self.transposition_table.clear()
-        self.killer_moves.clear()
-        self.pv_table.clear()
+        self.reset_search_state()
+        self.evaluator.reset_lazy_stats()
         self.start_time = time.time()
 
         if time_limit:
@@ -37,9 +54,18 @@ class MasterAI(BaseAI):
 
         board_copy = board.copy()
         legal_moves = board_copy.get_legal_moves(self.color)
+        if self.excluded_root_moves:
+            legal_moves = [
+                move for move in legal_moves
+                if (move.from_row, move.from_col, move.to_row, move.to_col) not in self.excluded_root_moves
+            ]
         if not legal_moves:
             return None
 
+        helpers = None
+        if self.parallel_workers > 1 and self.parallel_mode == 'lazy_smp':
+            helpers = self._start_lazy_smp(board_copy)
+
         best_move = None
         best_score = float('-inf')
 
@@ -47,13 +73,14 @@ class MasterAI(BaseAI):
         aspiration_window = 50
         previous_score = 0
 
-        for depth in range(1, self.max_depth + 1):
-            if time.time() - self.start_time > self.time_limit * 0.85:
+        for depth in range(self.start_depth, self.max_depth + 1):
+            if self._out_of_budget(0.85):
                 break
 
             # 渴望窗口搜索
-            alpha = previous_score - aspiration_window if depth > 1 else float('-inf')
-            beta = previous_score + aspiration_window if depth > 1 else float('inf')
+            use_window = depth > self.start_depth
+            alpha = previous_score - aspiration_window if use_window else float('-inf')
+            beta = previous_score + aspiration_window if use_window else float('inf')
 
             current_best_move = None
             current_best_score = float('-inf')
@@ -64,40 +91,50 @@ class MasterAI(BaseAI):
 
             failed_low = False
             failed_high = False
+            parallel = self.parallel_workers > 1 and self.parallel_mode == 'root' and depth > 1
 
-            for move in sorted_moves:
-                if time.time() - self.start_time > self.time_limit:
-                    break
+            if parallel:
+                # 多进程根节点并行搜索
+                candidate_moves = self._search_root_parallel(board_copy, sorted_moves, depth, alpha, beta)
+                for move, score in candidate_moves:
+                    if score > current_best_score:
+                        current_best_score = score
+                        current_best_move = move
+                failed_high = current_best_score >= beta
+            else:
+                for move in sorted_moves:
+                    if self._out_of_budget():
+                        break
 
-                captured = board_copy.make_move(move)
+                    captured = board_copy.make_move(move)
 
-                # PVS搜索 (Principal Variation Search)
-                if current_best_move is None:
-                    score = -self._alpha_beta(board_copy, depth - 1, -beta, -alpha, False, depth)
-                else:
-                    # 零窗口搜索
-                    score = -self._alpha_beta(board_copy, depth - 1, -alpha - 1, -alpha, False, depth)
-                    if alpha < score < beta:
-                        # 重新搜索
-                        score = -self._alpha_beta(board_copy, depth - 1, -beta, -score, False, depth)
+                    # PVS搜索 (Principal Variation Search)
+                    if current_best_move is None:
+                        score = self._alpha_beta(board_copy, depth - 1, alpha, beta, False, depth)
+                    else:
+                        # 零窗口搜索
+                        score = self._alpha_beta(board_copy, depth - 1, alpha, alpha + 1, False, depth)
+                        if alpha < score < beta:
+                            # 重新搜索
+                            score = self._alpha_beta(board_copy, depth - 1, alpha, beta, False, depth)
 
-                board_copy.undo_move(move, captured)
+                    board_copy.undo_move(move, captured)
 
-                candidate_moves.append((move, score))
+                    candidate_moves.append((move, score))
 
-                if score > current_best_score:
-                    current_best_score = score
-                    current_best_move = move
+                    if score > current_best_score:
+                        current_best_score = score
+                        current_best_move = move
 
-                if score > alpha:
-                    alpha = score
+                    if score > alpha:
+                        alpha = score
 
-                if score >= beta:
-                    failed_high = True
-                    break
+                    if score >= beta:
+                        failed_high = True
+                        break
 
             # 渴望窗口失败处理
-            if failed_high or (current_best_score <= previous_score - aspiration_window and depth > 1):
+            if failed_high or (current_best_score <= previous_score - aspiration_window and use_window):
                 # 重新搜索完整窗口
                 alpha = float('-inf')
                 beta = float('inf')
@@ -105,22 +142,25 @@ class MasterAI(BaseAI):
                 current_best_score = float('-inf')
                 candidate_moves = []
 
-                for move in sorted_moves:
-                    if time.time() - self.start_time > self.time_limit:
-                        break
+                if parallel:
+                    candidate_moves = self._search_root_parallel(board_copy, sorted_moves, depth, alpha, beta)
+                else:
+                    for move in sorted_moves:
+                        if self._out_of_budget():
+                            break
 
-                    captured = board_copy.make_move(move)
-                    score = -self._alpha_beta(board_copy, depth - 1, -beta, -alpha, False, depth)
-                    board_copy.undo_move(move, captured)
+                        captured = board_copy.make_move(move)
+                        score = self._alpha_beta(board_copy, depth - 1, alpha, beta, False, depth)
+                        board_copy.undo_move(move, captured)
 
-                    candidate_moves.append((move, score))
+                        candidate_moves.append((move, score))
+                        alpha = max(alpha, score)
 
+                for move, score in candidate_moves:
                     if score > current_best_score:
                         current_best_score = score
                         current_best_move = move
 
-                    alpha = max(alpha, score)
-
             if current_best_move:
                 best_move = current_best_move
                 best_score = current_best_score
@@ -129,20 +169,156 @@ class MasterAI(BaseAI):
                 # 更新PV表
                 self.pv_table[0] = best_move
 
+                if not self._out_of_budget():
+                    self.completed_result = (depth, best_move, best_score)
+
                 candidate_moves.sort(key=lambda x: x[1], reverse=True)
                 self.thinking_info['depth'] = depth
-                self.thinking_info['nodes_evaluated'] = self.nodes_evaluated
+                self.thinking_info['nodes_evaluated'] = self.nodes_evaluated + self.worker_nodes
                 self.thinking_info['best_move'] = best_move
                 self.thinking_info['score'] = best_score
                 self.thinking_info['candidate_moves'] = candidate_moves[:5]
+                self.thinking_info['lazy_evals'] = self.evaluator.lazy_stats['calls']
+                self.thinking_info['lazy_exits'] = self.evaluator.lazy_stats['exits']
+
+        if helpers is not None:
+            best_move = self._collect_lazy_smp(board_copy, helpers, best_move)
 
+        self._record_speed()
         return best_move
 
+    def _out_of_budget(self, fraction=1.0):
+        """
+        搜索预算是否已用完
+
+        设置了 max_nodes 时只按节点数判断（与机器负载无关，结果可复现），
+        否则按时间判断；收到外部停止信号时立即结束
+
+        Args:
+            fraction: 使用预算的比例（开始新一轮迭代前用较小的比例）
+        """
+        if self.should_stop is not None and self.should_stop():
+            return True
+        if self.max_nodes is not None:
+            return self.nodes_evaluated + self.worker_nodes >= self.max_nodes * fraction
+        return time.time() - self.start_time > self.time_limit * fraction
+
+    def _record_speed(self):
+        """记录本次搜索的用时和每秒节点数"""
+        elapsed = time.time() - self.start_time
+        nodes = self.nodes_evaluated + self.worker_nodes
+        self.thinking_info['nodes_evaluated'] = nodes
+        self.thinking_info['elapsed'] = round(elapsed, 3)
+        self.thinking_info['nps'] = int(nodes / elapsed) if elapsed > 0 else 0
+
+    def _start_lazy_smp(self, board):
+        """Lazy SMP：换用共享置换表并启动辅助进程"""
+        from app.ai.lazy_smp import process_shared_table, start_helpers
+        table = process_shared_table()
+        table.new_generation()
+        self.transposition_table = table
+        return start_helpers(self, board, self.parallel_workers)
+
+    def _collect_lazy_smp(self, board, helpers, best_move):
+        """Lazy SMP：取主进程与辅助进程中完成深度最深的结果"""
+        from app.ai.lazy_smp import collect_helpers
+        move, depth, score, helper_nodes = collect_helpers(self, board, helpers)
+        self.worker_nodes += helper_nodes
+        self.thinking_info['nodes_evaluated'] = self.nodes_evaluated + self.worker_nodes
+        if move is None:
+            return best_move
+
+        self.thinking_info['depth'] = depth
+        self.thinking_info['best_move'] = move
+        self.thinking_info['score'] = score
+        return move
+
+    def close(self):
+        """不再使用 Lazy SMP 的共享置换表（表由进程保留，供下一次搜索复用）"""
+        from app.ai.lazy_smp import SharedTranspositionTable
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table = {}
+
+    def reset_search_state(self):
+        """清空一次搜索的状态（置换表、杀手走法、主变例、节点计数）"""
+        self.nodes_evaluated = 0
+        self.worker_nodes = 0
+        self.completed_result = None
+        self.transposition_table.clear()
+        self.killer_moves.clear()
+        self.pv_table.clear()
+        self.best_moves.clear()
+        if self.parallel_workers > 1:
+            from app.ai.parallel_search import new_search_id
+            self._search_id = new_search_id()
+
+    def _search_root_move(self, board, move, depth, alpha, beta):
+        """
+        搜索一个根走法（alpha 已知时先用零窗口搜索）
+
+        Args:
+            board: 棋盘对象（根局面）
+            move: 根走法
+            depth: 本次迭代的深度
+            alpha: Alpha 值
+            beta: Beta 值
+
+        Returns:
+            float: 该走法的评分
+        """
+        captured = board.make_move(move)
+        if alpha == float('-inf'):
+            score = self._alpha_beta(board, depth - 1, alpha, beta, False, depth)
+        else:
+            score = self._alpha_beta(board, depth - 1, alpha, alpha + 1, False, depth)
+            if alpha < score < beta:
+                score = self._alpha_beta(board, depth - 1, alpha, beta, False, depth)
+        board.undo_move(move, captured)
+        return score
+
+    def _search_root_parallel(self, board, sorted_moves, depth, alpha, beta):
+        """多进程搜索所有根走法，返回候选走法列表"""
+        from app.ai.parallel_search import search_root_parallel
+        candidate_moves, worker_nodes = search_root_parallel(
+            self, board, sorted_moves, depth, alpha, beta, self.parallel_workers
+        )
+        self.worker_nodes += worker_nodes
+        return candidate_moves
+
+    def _parallel_spec(self):
+        """工作进程重建本 AI 所需的参数（工作进程内不再并行）"""
+        options = (
+            ('depth', self.max_depth),
+            ('time_limit', self.time_limit),
+            ('max_nodes', self.max_nodes),
+            ('quiescence_depth', self.quiescence_depth),
+            ('eval_params', self.eval_params),
+            ('lazy_eval', self.lazy_eval),
+            ('lazy_margin', self.lazy_margin),
+        )
+        return ('MasterAI', self.color, options)
+
     def _alpha_beta(self, board, depth, alpha, beta, maximizing, root_depth):
-        """Alpha-Beta搜索，包含所有优化"""
+        """
+        Alpha-Beta搜索，包含所有优化
+
+        极小极大形式：评分和 (alpha, beta) 窗口始终是己方视角，
+        与静态搜索一致，叶节点的懒惰评估才能使用同一个窗口。
+
+        Args:
+            board: 棋盘对象
+            depth: 剩余深度
+            alpha: Alpha 值（己方视角）
+            beta: Beta 值（己方视角）
+            maximizing: 是否轮到己方走棋
+            root_depth: 本次迭代的深度
+
+        Returns:
+            float: 评分（己方视角）
+        """
         self.nodes_evaluated += 1
 
-        if time.time() - self.start_time > self.time_limit:
+        if self._out_of_budget():
             return 0
 
         # 置换表查询
@@ -175,15 +351,20 @@ class MasterAI(BaseAI):
 
         # 空着裁剪 (Null Move Pruning) - 不在被将军时使用
         if depth >= 3 and not is_in_check(board, current_color):
-            # 跳过一步，看对方能否获得优势
-            null_score = -self._alpha_beta(board, depth - 3, -beta, -beta + 1, not maximizing, root_depth)
-            if null_score >= beta:
-                return beta
+            # 跳过一步，看对方连走两步能否扭转局面
+            if maximizing:
+                null_score = self._alpha_beta(board, depth - 3, beta - 1, beta, False, root_depth)
+                if null_score >= beta:
+                    return beta
+            else:
+                null_score = self._alpha_beta(board, depth - 3, alpha, alpha + 1, True, root_depth)
+                if null_score <= alpha:
+                    return alpha
 
         # 走法排序
         sorted_moves = self._order_moves_advanced(board, legal_moves, depth)
 
-        original_alpha = alpha
+        original_alpha, original_beta = alpha, beta
         best_score = float('-inf') if maximizing else float('inf')
         best_move = None
 
@@ -197,11 +378,11 @@ class MasterAI(BaseAI):
 
             if maximizing:
                 if reduction > 0:
-                    score = -self._alpha_beta(board, depth - 1 - reduction, -beta, -alpha, False, root_depth)
+                    score = self._alpha_beta(board, depth - 1 - reduction, alpha, beta, False, root_depth)
                     if score > alpha:
-                        score = -self._alpha_beta(board, depth - 1, -beta, -alpha, False, root_depth)
+                        score = self._alpha_beta(board, depth - 1, alpha, beta, False, root_depth)
                 else:
-                    score = -self._alpha_beta(board, depth - 1, -beta, -alpha, False, root_depth)
+                    score = self._alpha_beta(board, depth - 1, alpha, beta, False, root_depth)
 
                 board.undo_move(move, captured)
 
@@ -217,11 +398,11 @@ class MasterAI(BaseAI):
                     break
             else:
                 if reduction > 0:
-                    score = -self._alpha_beta(board, depth - 1 - reduction, -beta, -alpha, True, root_depth)
+                    score = self._alpha_beta(board, depth - 1 - reduction, alpha, beta, True, root_depth)
                     if score < beta:
-                        score = -self._alpha_beta(board, depth - 1, -beta, -alpha, True, root_depth)
+                        score = self._alpha_beta(board, depth - 1, alpha, beta, True, root_depth)
                 else:
-                    score = -self._alpha_beta(board, depth - 1, -beta, -alpha, True, root_depth)
+                    score = self._alpha_beta(board, depth - 1, alpha, beta, True, root_depth)
 
                 board.undo_move(move, captured)
 
@@ -238,15 +419,48 @@ class MasterAI(BaseAI):
         # 存入置换表
         if best_score <= original_alpha:
             flag = 'upper'
-        elif best_score >= beta:
+        elif best_score >= original_beta:
             flag = 'lower'
         else:
             flag = 'exact'
 
         self.transposition_table[board_hash] = (depth, best_score, flag)
+        # 己方节点的上界、对方节点的下界说明各走法都被剪掉，没有可靠的最佳走法
+        if best_move is not None and flag != ('upper' if maximizing else 'lower'):
+            self.best_moves[board_hash] = (best_move.from_row, best_move.from_col, best_move.to_row, best_move.to_col)
 
         return best_score
 
+    def principal_variation(self, board, first_move, max_length=12):
+        """
+        沿最佳走法表提取主变例
+
+        Args:
+            board: 棋盘对象（根局面）
+            first_move: 根局面的最佳走法
+            max_length: 最多步数
+
+        Returns:
+            list: [(from_row, from_col, to_row, to_col), ...]
+        """
+        from app.ai.parallel_search import _find_move
+
+        board = board.copy()
+        pv = []
+        seen = set()
+        color = self.color
+        move = first_move
+        while move is not None and len(pv) < max_length and board.hash_value not in seen:
+            seen.add(board.hash_value)
+            pv.append((move.from_row, move.from_col, move.to_row, move.to_col))
+            board.make_move(move)
+            color = 'black' if color == 'red' else 'red'
+            # 局面哈希不含走棋方，走法必须属于当前走棋方
+            move_key = self.best_moves.get(board.hash_value)
+            piece = board.get_piece(move_key[0], move_key[1]) if move_key is not None else None
+            move = _find_move(board, move_key) if piece is not None and piece.color == color else None
+        return pv
+
     def _order_moves_advanced(self, board, moves, depth, pv_move=None):
         """高级走法排序"""
         from app.core.rules import is_in_check, is_checkmate
@@ -326,10 +540,9 @@ class MasterAI(BaseAI):
 
     def _quiescence_search(self, board, alpha, beta, maximizing, depth):
         """静态搜索"""
-        stand_pat = self.evaluator.evaluate(board)
-        stand_pat = stand_pat if self.color == 'red' else -stand_pat
+        stand_pat = self._static_evaluate(board, alpha, beta)
 
-        if time.time() - self.start_time > self.time_limit:
+        if self._out_of_budget():
             return stand_pat
 
         if depth <= 0:
@@ -384,6 +597,29 @@ class MasterAI(BaseAI):
 
             return min_eval
 
+    def _static_evaluate(self, board, alpha, beta):
+        """
+        静态评估（己方视角）
+
+        启用 lazy_eval 时使用懒惰评估：子力+位置已远离 (alpha, beta) 窗口时跳过其余评估项
+
+        Args:
+            board: 棋盘对象
+            alpha: Alpha 值（己方视角）
+            beta: Beta 值（己方视角）
+
+        Returns:
+            float: 评分
+        """
+        if not self.lazy_eval:
+            score = self.evaluator.evaluate(board)
+        elif self.color == 'red':
+            score = self.evaluator.evaluate_lazy(board, alpha, beta)
+        else:
+            # 评估器使用红方视角，窗口需要翻转
+            score = self.evaluator.evaluate_lazy(board, -beta, -alpha)
+        return score if self.color == 'red' else -score
+
     def _get_tactical_moves(self, board, moves, color):
         """获取战术走法"""
         from app.core.rules import is_in_check
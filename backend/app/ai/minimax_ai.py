@@ -8,9 +8,9 @@ from app.ai.evaluator import Evaluator
 class MinimaxAI(BaseAI):
     """使用 Minimax 算法的 AI"""
 
-    def __init__(self, color, depth=3):
+    def __init__(self, color, depth=3, eval_params=None):
         super().__init__('谋略军师', color, 3)
-        self.evaluator = Evaluator()
+        self.evaluator = Evaluator(eval_params)
         self.max_depth = depth
         self.nodes_evaluated = 0
 
@@ -0,0 +1,228 @@
+"""
+多进程根节点并行搜索
+
+先串行搜索排序后的第一个根走法得到 alpha（Young Brothers Wait），
+其余根走法分发到进程池中搜索。主进程在收到结果后立即提高 alpha，
+之后派发的走法都使用最新的 alpha 界，思考信息中的节点数为各进程之和。
+
+设置了节点预算（max_nodes）时结果需要可复现，不能依赖进程完成的先后：
+其余走法按固定批次派发，同一批任务使用相同的 alpha 并平分剩余节点预算，
+每个任务使用新建的 AI（不受工作进程中残留搜索状态的影响），
+整批完成后按走法顺序合并结果。
+"""
+import atexit
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from app.core.board import Board
+
+# 按进程数共享的进程池（进程在多次搜索间复用）
+_pools = {}
+
+# 工作进程中缓存的 AI 实例：search_id 不变时复用置换表等搜索状态
+_worker_ais = {}
+
+
+def get_pool(workers):
+    """获取（必要时创建）指定进程数的进程池"""
+    pool = _pools.get(workers)
+    if pool is None:
+        # 使用 spawn：服务进程中有其他线程时 fork 不安全
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        _pools[workers] = pool
+    return pool
+
+
+def shutdown_pools():
+    """关闭所有进程池"""
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+# AI 进程池的工作进程退出时一并关闭它创建的进程池
+atexit.register(shutdown_pools)
+
+
+def _create_ai(class_name, color, options):
+    """在工作进程中按名称创建 AI"""
+    if class_name == 'MasterAI':
+        from app.ai.master_ai import MasterAI
+        return MasterAI(color, **options)
+    from app.ai.alphabeta_ai import AlphaBetaAI
+    return AlphaBetaAI(color, **options)
+
+
+def _worker_ai(spec, search_id):
+    """获取工作进程中的 AI 实例，新的一次搜索时清空搜索状态"""
+    class_name, color, options = spec
+    ai = _worker_ais.get(spec)
+    if ai is None:
+        ai = _create_ai(class_name, color, dict(options))
+        _worker_ais[spec] = ai
+    if getattr(ai, '_search_id', None) != search_id:
+        ai.reset_search_state()
+        ai._search_id = search_id
+    return ai
+
+
+def _find_move(board, move_key):
+    """在棋盘上找到与 (from_row, from_col, to_row, to_col) 对应的走法"""
+    from_row, from_col, to_row, to_col = move_key
+    piece = board.get_piece(from_row, from_col)
+    if piece is None:
+        return None
+    for move in piece.get_possible_moves(board):
+        if move.to_row == to_row and move.to_col == to_col:
+            return move
+    return None
+
+
+def _search_move_task(spec, search_id, fen, move_key, depth, alpha, beta, time_budget, node_budget):
+    """
+    工作进程任务：搜索一个根走法
+
+    Returns:
+        tuple: (评分, 搜索节点数)
+    """
+    if node_budget is not None:
+        # 节点预算模式：结果不能取决于任务被分到哪个进程，不复用缓存的 AI
+        class_name, color, options = spec
+        ai = _create_ai(class_name, color, dict(options))
+    else:
+        ai = _worker_ai(spec, search_id)
+    board, _ = Board.from_fen(fen)
+    move = _find_move(board, move_key)
+    if move is None:
+        return float('-inf'), 0
+
+    ai.start_time = time.time()
+    ai.time_limit = time_budget
+    ai.max_nodes = node_budget
+    ai.nodes_evaluated = 0
+    score = ai._search_root_move(board, move, depth, alpha, beta)
+    return score, ai.nodes_evaluated
+
+
+def search_root_parallel(ai, board, moves, depth, alpha, beta, workers):
+    """
+    并行搜索根节点的所有走法
+
+    Args:
+        ai: 发起搜索的 AI（AlphaBetaAI 或 MasterAI）
+        board: 棋盘对象（根局面）
+        moves: 排序后的根走法
+        depth: 本次迭代的深度
+        alpha: Alpha 值
+        beta: Beta 值
+        workers: 进程数
+
+    Returns:
+        tuple: (候选走法 [(move, score), ...], 工作进程搜索的节点数)
+    """
+    # 第一个走法串行搜索，确定 alpha 后再并行搜索其余走法
+    first = moves[0]
+    score = ai._search_root_move(board, first, depth, alpha, beta)
+    candidate_moves = [(first, score)]
+    alpha = max(alpha, score)
+    if score >= beta or len(moves) == 1:
+        return candidate_moves, 0
+
+    spec = ai._parallel_spec()
+    search_id = ai._search_id
+    fen = board.to_fen(ai.color)
+    pool = get_pool(workers)
+
+    if ai.max_nodes is not None:
+        candidate_moves, worker_nodes = _search_batches(
+            ai, pool, spec, search_id, fen, moves[1:], depth, alpha, beta, workers
+        )
+        return [(first, score)] + candidate_moves, worker_nodes
+
+    queue = list(moves[1:])
+    pending = {}
+    worker_nodes = 0
+
+    while queue or pending:
+        # 保持每个进程一个任务，新任务总是带上当前最好的 alpha
+        while queue and len(pending) < workers:
+            remaining = ai.time_limit - (time.time() - ai.start_time)
+            if remaining <= 0:
+                queue.clear()
+                break
+            move = queue.pop(0)
+            future = pool.submit(
+                _search_move_task, spec, search_id, fen, _move_key(move),
+                depth, alpha, beta, remaining, None
+            )
+            pending[future] = move
+
+        if not pending:
+            break
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            move = pending.pop(future)
+            score, nodes = future.result()
+            worker_nodes += nodes
+            candidate_moves.append((move, score))
+            alpha = max(alpha, score)
+
+            if score >= beta:
+                # 超出窗口上界，其余走法无需再搜索
+                queue.clear()
+
+    return candidate_moves, worker_nodes
+
+
+def _search_batches(ai, pool, spec, search_id, fen, moves, depth, alpha, beta, workers):
+    """
+    节点预算模式下按固定批次并行搜索根走法（结果与进程完成顺序无关）
+
+    Returns:
+        tuple: (候选走法 [(move, score), ...], 工作进程搜索的节点数)
+    """
+    candidate_moves = []
+    worker_nodes = 0
+
+    for start in range(0, len(moves), workers):
+        node_budget = ai.max_nodes - ai.nodes_evaluated - ai.worker_nodes - worker_nodes
+        batch = moves[start:start + workers]
+        # 同一批任务平分剩余预算，预算总和不超过 max_nodes
+        share = node_budget // len(batch)
+        if share <= 0:
+            break
+
+        futures = [
+            pool.submit(
+                _search_move_task, spec, search_id, fen, _move_key(move),
+                depth, alpha, beta, ai.time_limit, share
+            )
+            for move in batch
+        ]
+        for move, future in zip(batch, futures):
+            score, nodes = future.result()
+            worker_nodes += nodes
+            candidate_moves.append((move, score))
+            alpha = max(alpha, score)
+
+        if alpha >= beta:
+            # 超出窗口上界，其余走法无需再搜索
+            break
+
+    return candidate_moves, worker_nodes
+
+
+def _move_key(move):
+    """走法在进程间传递的形式 (from_row, from_col, to_row, to_col)"""
+    return (move.from_row, move.from_col, move.to_row, move.to_col)
+
+
+def new_search_id():
+    """生成一次根搜索的标识（工作进程据此重置搜索状态）"""
+    return uuid.uuid4().hex
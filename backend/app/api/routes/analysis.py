@@ -0,0 +1,47 @@
+"""
+Position analysis REST API routes
+"""
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+
+from app.services.ai_pool import AIJobCancelled, AIJobError, AIJobTimeout, AIOverloaded
+from app.services.analysis import AnalysisError, analysis_service
+
+router = APIRouter(prefix="/api/v1/analyze", tags=["analysis"])
+
+
+class AnalyzeRequest(BaseModel):
+    fen: str
+    depth: Optional[int] = None
+    time_limit: Optional[float] = None
+    multipv: int = 1
+
+
+@router.post("")
+async def analyze_position(request: AnalyzeRequest):
+    """Best move, score and principal variation(s) for a position"""
+    if request.depth is not None and request.depth <= 0:
+        raise HTTPException(status_code=400, detail="depth must be positive")
+    if request.time_limit is not None and request.time_limit <= 0:
+        raise HTTPException(status_code=400, detail="time_limit must be positive")
+    if request.multipv <= 0:
+        raise HTTPException(status_code=400, detail="multipv must be positive")
+
+    try:
+        return await analysis_service.analyze(
+            request.fen,
+            depth=request.depth,
+            time_limit=request.time_limit,
+            multipv=request.multipv
+        )
+    except AnalysisError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AIOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except AIJobTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except AIJobCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except AIJobError as e:
+        raise HTTPException(status_code=500, detail=f"AI error: {e}")
@@ -1,15 +1,38 @@
 """
 Game REST API routes
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 
 from app.services.game_service import session_manager
+from app.services.sharding import shard_map
 from app import config
 
 router = APIRouter(prefix="/api/v1/games", tags=["games"])
 
+# HTTP status by error code (errors without a code are client errors: 400)
+ERROR_STATUS = {
+    'overloaded': 503,
+    'timeout': 504,
+    'ai_error': 500,
+    'cancelled': 409,
+    'stale': 409,
+    'busy': 409,
+    'read_only': 403,
+}
+
+
+def require_local_game(game_id: str):
+    """Reject requests for games owned by another replica (421 Misdirected Request)"""
+    if not shard_map.is_local(game_id):
+        owner = shard_map.owner(game_id)
+        raise HTTPException(
+            status_code=421,
+            detail=f"Game is served by {owner}",
+            headers={'X-Shard-Owner': owner}
+        )
+
 
 class CreateGameRequest(BaseModel):
     ai_type: str = 'alphabeta'
@@ -53,78 +76,89 @@ async def create_game(request: CreateGameRequest):
     }
 
 
-@router.get("/{game_id}")
+@router.get("/{game_id}", dependencies=[Depends(require_local_game)])
 async def get_game(game_id: str):
     """Get game state by ID"""
-    session = session_manager.get_session(game_id)
+    session = await session_manager.get_session(game_id)
     if not session:
         raise HTTPException(status_code=404, detail="Game not found")
 
     return session_manager.get_game_state(session)
 
 
-@router.delete("/{game_id}")
+@router.delete("/{game_id}", dependencies=[Depends(require_local_game)])
 async def delete_game(game_id: str):
     """Delete a game session"""
-    if not session_manager.delete_session(game_id):
+    if not await session_manager.delete_session(game_id):
         raise HTTPException(status_code=404, detail="Game not found")
 
     return {'success': True}
 
 
-@router.post("/{game_id}/moves")
+@router.post("/{game_id}/moves", dependencies=[Depends(require_local_game)])
 async def make_move(game_id: str, request: MoveRequest):
     """Make a move in the game"""
-    session = session_manager.get_session(game_id)
+    session = await session_manager.get_session(game_id)
     if not session:
         raise HTTPException(status_code=404, detail="Game not found")
 
-    result = session_manager.make_move(
+    result = await session_manager.make_move_async(
         session,
         request.from_row, request.from_col,
         request.to_row, request.to_col
     )
 
     if not result['success']:
-        raise HTTPException(status_code=400, detail=result['error'])
+        raise HTTPException(status_code=ERROR_STATUS.get(result.get('code'), 400), detail=result['error'])
 
     return result
 
 
-@router.post("/{game_id}/ai-move")
+@router.post("/{game_id}/ai-move", dependencies=[Depends(require_local_game)])
 async def get_ai_move(game_id: str):
     """Request AI to make a move"""
-    session = session_manager.get_session(game_id)
+    session = await session_manager.get_session(game_id)
     if not session:
         raise HTTPException(status_code=404, detail="Game not found")
 
-    result = session_manager.get_ai_move(session)
+    result = await session_manager.get_ai_move_async(session)
 
     if not result['success']:
-        raise HTTPException(status_code=400, detail=result['error'])
+        status_code = ERROR_STATUS.get(result.get('code'), 400)
+        raise HTTPException(status_code=status_code, detail=result['error'])
 
     return result
 
 
-@router.post("/{game_id}/undo")
+@router.post("/{game_id}/undo", dependencies=[Depends(require_local_game)])
 async def undo_move(game_id: str, request: UndoRequest):
     """Undo moves"""
-    session = session_manager.get_session(game_id)
+    session = await session_manager.get_session(game_id)
     if not session:
         raise HTTPException(status_code=404, detail="Game not found")
 
-    result = session_manager.undo_move(session, request.steps)
+    result = await session_manager.undo_move_async(session, request.steps)
 
     if not result['success']:
-        raise HTTPException(status_code=400, detail=result['error'])
+        raise HTTPException(status_code=ERROR_STATUS.get(result.get('code'), 400), detail=result['error'])
 
     return result
 
 
-@router.post("/{game_id}/legal-moves")
+@router.get("/{game_id}/legal-moves", dependencies=[Depends(require_local_game)])
+async def get_legal_move_map(game_id: str):
+    """Get the legal moves of every piece of the side to move"""
+    session = await session_manager.get_session(game_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    return session_manager.get_legal_move_map(session)
+
+
+@router.post("/{game_id}/legal-moves", dependencies=[Depends(require_local_game)])
 async def get_legal_moves(game_id: str, request: LegalMovesRequest):
     """Get legal moves for a piece"""
-    session = session_manager.get_session(game_id)
+    session = await session_manager.get_session(game_id)
     if not session:
         raise HTTPException(status_code=404, detail="Game not found")
 
@@ -0,0 +1,79 @@
+"""
+AI-vs-AI match REST API routes
+
+Matches are watched over the game WebSocket:
+/ws/games/{match_id}?role=spectator
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+
+from app.api.routes.games import require_local_game
+from app.services.match_runner import MatchError, MatchLimitReached, match_runner
+
+router = APIRouter(prefix="/api/v1/matches", tags=["matches"])
+
+
+class CreateMatchRequest(BaseModel):
+    red_ai: str = 'alphabeta'
+    black_ai: str = 'master'
+    move_time: Optional[float] = None
+    max_moves: Optional[int] = None
+    move_interval: Optional[float] = None
+
+
+def require_local_match(match_id: str):
+    """Reject requests for matches played by another replica (421)"""
+    require_local_game(match_id)
+
+
+@router.post("")
+async def create_match(request: CreateMatchRequest):
+    """Start an AI-vs-AI match"""
+    if request.move_time is not None and request.move_time <= 0:
+        raise HTTPException(status_code=400, detail="move_time must be positive")
+    if request.max_moves is not None and request.max_moves <= 0:
+        raise HTTPException(status_code=400, detail="max_moves must be positive")
+
+    try:
+        match = match_runner.start_match(
+            request.red_ai,
+            request.black_ai,
+            move_time=request.move_time,
+            max_moves=request.max_moves,
+            move_interval=request.move_interval
+        )
+    except MatchLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except MatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        'match': match.to_dict(),
+        'websocket': f'/ws/games/{match.match_id}?role=spectator'
+    }
+
+
+@router.get("")
+async def list_matches():
+    """List running, waiting and recently finished matches on this replica"""
+    return {'matches': [match.to_dict() for match in match_runner.matches.values()]}
+
+
+@router.get("/{match_id}", dependencies=[Depends(require_local_match)])
+async def get_match(match_id: str):
+    """Get a match's status"""
+    match = match_runner.get_match(match_id)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    return match.to_dict()
+
+
+@router.delete("/{match_id}", dependencies=[Depends(require_local_match)])
+async def cancel_match(match_id: str):
+    """Stop a match"""
+    if not match_runner.cancel_match(match_id):
+        raise HTTPException(status_code=404, detail="Match not found or already over")
+
+    return {'success': True}
@@ -0,0 +1,71 @@
+"""
+WebSocket message encodings
+
+JSON in text frames is the default. MessagePack in binary frames is chosen
+per connection with the `encoding=msgpack` query parameter and needs the
+optional 'msgpack' package. Either way the messages have the same
+structure; clients may send in either form (text frames are read as JSON,
+binary frames as MessagePack).
+"""
+import json
+from typing import Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+class JSONCodec:
+    """JSON text frames, encoded like WebSocket.send_json"""
+    name = 'json'
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+
+    async def send(self, websocket: WebSocket, frame: str):
+        await websocket.send_text(frame)
+
+
+class MsgpackCodec:
+    """MessagePack binary frames"""
+    name = 'msgpack'
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    async def send(self, websocket: WebSocket, frame: bytes):
+        await websocket.send_bytes(frame)
+
+
+JSON_CODEC = JSONCodec()
+
+CODECS: Dict[str, object] = {'json': JSON_CODEC}
+if msgpack is not None:
+    CODECS['msgpack'] = MsgpackCodec()
+
+
+def get_codec(name: str) -> Optional[object]:
+    """The codec for an encoding name, or None if unknown or not installed"""
+    return CODECS.get(name)
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    """
+    Receive and decode one client message
+
+    Raises:
+        WebSocketDisconnect: the client disconnected
+        ValueError: the frame could not be decoded
+    """
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        raise WebSocketDisconnect(message.get('code', 1000))
+
+    if message.get('bytes') is not None:
+        if msgpack is None:
+            raise ValueError("Binary frames need the 'msgpack' package")
+        return msgpack.unpackb(message['bytes'], raw=False)
+    return json.loads(message['text'])
@@ -1,47 +1,353 @@
 """
 WebSocket handler for real-time game communication
+
+Two protocol versions are served, chosen per connection with the
+`protocol` query parameter (default 1):
+
+- v1: move_made, ai_move and undo_done carry the full result, including
+  the whole game_state.
+- v2: the same messages carry only the change: `seq` (the game state
+  version after it), `hash` (CRC-32 of the position's FEN), the move or
+  number of undone steps, and the new turn, result and check flag. A
+  client applies the delta when `seq` is one past its own and the hash
+  matches; otherwise it sends `get_state` for a full game_state snapshot,
+  as it receives on (re)connect.
+
+Other results (such as match_finished) are sent unchanged in both versions.
+
+The `encoding` query parameter picks JSON text frames (default) or
+MessagePack binary frames, see codecs.py.
+
+`role=spectator` opens a read-only connection: it receives everything the
+players do but cannot move, undo or ask for AI moves. Spectators may add
+`delay=<seconds>` to watch the game that many seconds behind (the snapshot
+sent on connect is delayed too, and progress messages are skipped).
 """
-import json
 import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
+from app import config
+from app.api.websocket.codecs import JSON_CODEC, get_codec, receive_message
 from app.services.game_service import session_manager
+from app.services.sharding import shard_map
+
+PROTOCOL_VERSIONS = (1, 2)
+
+# Fields of game_state repeated in v2 deltas
+DELTA_STATE_FIELDS = ('current_turn', 'game_result', 'is_check')
+
+# Results sent to v2 clients as deltas; any other result is sent as-is
+DELTA_MESSAGE_TYPES = ('move_made', 'ai_move', 'undo_done')
+
+# Progress messages: a newer one replaces one still queued, and they are
+# dropped first when a client's send queue is full
+PROGRESS_MESSAGE_TYPES = ('ai_thinking', 'ai_queued')
+
+# Close code for clients evicted because they could not keep up
+SLOW_CONSUMER_CLOSE_CODE = 4408
+
+ROLES = ('player', 'spectator')
+
+# Messages spectators may not send
+PLAYER_MESSAGE_TYPES = ('move', 'request_ai_move', 'undo')
+
+# Upper bounds (seconds) of the fan-out latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+@dataclass
+class FanoutMetrics:
+    """Time from a message being queued (plus any spectator delay) to it being sent"""
+    sent: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def record(self, latency: float):
+        self.sent += 1
+        self.total_seconds += latency
+        self.max_seconds = max(self.max_seconds, latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'sent': self.sent,
+            'mean_seconds': self.total_seconds / self.sent if self.sent else 0.0,
+            'max_seconds': round(self.max_seconds, 6),
+            'buckets': {
+                **{f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+                'inf': self.buckets[-1],
+            },
+        }
+
+
+class Connection:
+    """
+    One client's WebSocket, with what it negotiated and its send queue
+
+    Messages are queued and written by a sender task per connection, so a
+    slow client never holds up the others in the same game. The queue holds
+    at most WS_SEND_QUEUE_MAX frames; a client whose queue is full of
+    messages that cannot be dropped, or whose send takes longer than
+    WS_SEND_TIMEOUT, is evicted. Frames a delayed spectator is not due to
+    see yet do not count against the limit. Any other send error means the
+    client went away: the connection is dropped without counting as an
+    eviction.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        protocol: int = 1,
+        codec=JSON_CODEC,
+        role: str = 'player',
+        delay: float = 0.0
+    ):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.codec = codec
+        self.role = role
+        self.delay = delay
+        self.closed = False
+        self.dropped = 0
+        # (progress message type or None, encoded frame, time queued)
+        self._queue: Deque[Tuple[Optional[str], object, float]] = deque()
+        self._wakeup = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+        self._on_failure: Optional[Callable[['Connection', bool], None]] = None
+        self._metrics: Optional[FanoutMetrics] = None
+
+    @property
+    def read_only(self) -> bool:
+        return self.role == 'spectator'
+
+    def start(self, on_failure: Callable[['Connection', bool], None], metrics: Optional[FanoutMetrics] = None):
+        """
+        Start the sender task; on_failure(connection, evicted) is called when
+        sending stops, with evicted True if the client could not keep up
+        """
+        self._on_failure = on_failure
+        self._metrics = metrics
+        self._sender = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stop sending (queued frames are discarded)"""
+        self.closed = True
+        self._queue.clear()
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+
+    def send(self, message: dict):
+        """Encode and queue one message for this client"""
+        self.enqueue(self.codec.encode(message), self._progress_key(message))
+
+    def enqueue(self, frame, progress: Optional[str] = None):
+        """Queue an encoded frame; progress is the message type of a progress message"""
+        if self.closed or (progress is not None and self.delay):
+            # Progress is stale by the time a delayed spectator would see it
+            return
+
+        now = time.monotonic()
+        if progress is not None:
+            for i, (key, _, _) in enumerate(self._queue):
+                if key == progress:
+                    self._queue[i] = (progress, frame, now)
+                    return
+
+        if len(self._queue) >= config.WS_SEND_QUEUE_MAX and self._backlog(now) >= config.WS_SEND_QUEUE_MAX:
+            if progress is not None:
+                self.dropped += 1
+                return
+            for i, (key, _, _) in enumerate(self._queue):
+                if key is not None:
+                    del self._queue[i]
+                    self.dropped += 1
+                    break
+            else:
+                # Backlog of messages the client needs: it cannot keep up
+                self._fail(evicted=True)
+                return
+
+        self._queue.append((progress, frame, now))
+        self._wakeup.set()
+
+    def _backlog(self, now: float) -> int:
+        """Queued frames already due (frames held back by a spectator delay do not count)"""
+        if not self.delay:
+            return len(self._queue)
+        return sum(1 for _, _, queued_at in self._queue if queued_at + self.delay <= now)
+
+    @staticmethod
+    def _progress_key(message: dict) -> Optional[str]:
+        message_type = message.get('type')
+        return message_type if message_type in PROGRESS_MESSAGE_TYPES else None
+
+    async def _run(self):
+        """Sender task: write queued frames in order, each once its delay has passed"""
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _, frame, queued_at = self._queue[0]
+                due = queued_at + self.delay
+                wait = due - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                self._queue.popleft()
+                await asyncio.wait_for(
+                    self.codec.send(self.websocket, frame), config.WS_SEND_TIMEOUT
+                )
+                if self._metrics is not None:
+                    self._metrics.record(time.monotonic() - due)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._fail(evicted=True)
+        except Exception:
+            # Disconnected (or the socket broke): not a slow consumer
+            self._fail(evicted=False)
+
+    def _fail(self, evicted: bool):
+        if not self.closed:
+            self.stop()
+            if self._on_failure is not None:
+                self._on_failure(self, evicted)
 
 
 class ConnectionManager:
     """Manages WebSocket connections"""
 
     def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.active_connections: Dict[str, Dict[WebSocket, Connection]] = {}
+        self.evicted = 0
+        self.fanout = FanoutMetrics()
 
-    async def connect(self, websocket: WebSocket, game_id: str):
+    async def connect(self, websocket: WebSocket, game_id: str, connection: Connection = None):
         """Accept a new WebSocket connection"""
         await websocket.accept()
+        connection = connection or Connection(websocket)
         if game_id not in self.active_connections:
-            self.active_connections[game_id] = set()
-        self.active_connections[game_id].add(websocket)
+            self.active_connections[game_id] = {}
+        self.active_connections[game_id][websocket] = connection
+        connection.start(lambda conn, evicted: self._drop(game_id, conn, evicted), self.fanout)
 
     def disconnect(self, websocket: WebSocket, game_id: str):
         """Remove a WebSocket connection"""
         if game_id in self.active_connections:
-            self.active_connections[game_id].discard(websocket)
+            connection = self.active_connections[game_id].pop(websocket, None)
+            if connection is not None:
+                connection.stop()
             if not self.active_connections[game_id]:
                 del self.active_connections[game_id]
 
+    def _drop(self, game_id: str, connection: Connection, evicted: bool):
+        """
+        Drop a client whose sender stopped and close its socket; only clients
+        that could not keep up count as evicted
+        """
+        self.disconnect(connection.websocket, game_id)
+        if evicted:
+            self.evicted += 1
+            asyncio.create_task(self._close(connection.websocket, SLOW_CONSUMER_CLOSE_CODE, "Client too slow"))
+        else:
+            asyncio.create_task(self._close(connection.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = 1000, reason: Optional[str] = None):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), config.WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Connection counts, backpressure counters and fan-out latency"""
+        connections = [c for game in self.active_connections.values() for c in game.values()]
+        return {
+            'games': len(self.active_connections),
+            'connections': len(connections),
+            'spectators': sum(1 for c in connections if c.read_only),
+            'queued_frames': sum(len(c._queue) for c in connections),
+            'dropped_messages': sum(c.dropped for c in connections),
+            'evicted_clients': self.evicted,
+            'fanout_latency': self.fanout.to_dict(),
+        }
+
     async def send_to_game(self, game_id: str, message: dict):
-        """Send a message to all connections for a game"""
-        if game_id in self.active_connections:
-            disconnected = set()
-            for connection in self.active_connections[game_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    disconnected.add(connection)
+        """Send a message to all connections for a game (encoded once per encoding)"""
+        self._broadcast(game_id, lambda protocol: message, Connection._progress_key(message))
+
+    async def send_result_to_game(self, game_id: str, message_type: str, result: dict):
+        """
+        Broadcast a move, AI move or undo result (or a match event)
+
+        v1 connections get the full result, v2 connections a delta; each
+        form is encoded at most once per encoding. Messages outside
+        DELTA_MESSAGE_TYPES go to every connection unchanged.
+        """
+        delta = message_type in DELTA_MESSAGE_TYPES
 
-            # Clean up disconnected
-            for conn in disconnected:
-                self.active_connections[game_id].discard(conn)
+        def build(protocol: int) -> dict:
+            data = delta_data(result) if delta and protocol != 1 else result
+            return {'type': message_type, 'data': data}
+
+        self._broadcast(game_id, build)
+
+    def _broadcast(self, game_id: str, build: Callable[[int], dict], progress: Optional[str] = None):
+        """
+        Queue build(protocol) on every connection, encoding once per
+        (protocol, encoding); the connections' sender tasks write them
+        concurrently
+        """
+        connections = self.active_connections.get(game_id)
+        if not connections:
+            return
+
+        encoded: Dict[Tuple[int, str], object] = {}
+        for connection in list(connections.values()):
+            key = (connection.protocol, connection.codec.name)
+            frame = encoded.get(key)
+            if frame is None:
+                frame = encoded[key] = connection.codec.encode(build(connection.protocol))
+            connection.enqueue(frame, progress)
+
+
+def send_game_state(connection: Connection, session):
+    """Queue a full game_state snapshot (JSON reuses the session's cached state JSON)"""
+    if connection.codec is JSON_CODEC:
+        connection.enqueue(
+            '{"type":"game_state","data":' + session_manager.get_game_state_json(session) + '}'
+        )
+    else:
+        connection.send({
+            'type': 'game_state',
+            'data': session_manager.get_game_state(session)
+        })
+
+
+def delta_data(result: dict) -> dict:
+    """The v2 form of a move, AI move or undo result"""
+    state = result['game_state']
+    data = {'seq': state['version'], 'hash': state['hash']}
+    for key in DELTA_STATE_FIELDS:
+        data[key] = state[key]
+    if 'move_info' in result:
+        data['move'] = result['move_info']
+    if 'steps' in result:
+        data['steps'] = result['steps']
+    if 'thinking_info' in result:
+        data['thinking_info'] = result['thinking_info']
+    return data
 
 
 manager = ConnectionManager()
@@ -49,29 +355,64 @@ manager = ConnectionManager()
 
 async def handle_websocket(websocket: WebSocket, game_id: str):
     """Handle WebSocket connection for a game"""
-    session = session_manager.get_session(game_id)
+    if not shard_map.is_local(game_id):
+        # Same meaning as HTTP 421; the reason names the owning replica
+        await websocket.close(code=4421, reason=shard_map.owner(game_id))
+        return
+
+    session = await session_manager.get_session(game_id)
     if not session:
         await websocket.close(code=4004, reason="Game not found")
         return
 
-    await manager.connect(websocket, game_id)
+    try:
+        protocol = int(websocket.query_params.get('protocol', 1))
+    except ValueError:
+        protocol = 0
+    if protocol not in PROTOCOL_VERSIONS:
+        await websocket.close(code=4400, reason="Unsupported protocol version")
+        return
+
+    codec = get_codec(websocket.query_params.get('encoding', 'json'))
+    if codec is None:
+        await websocket.close(code=4400, reason="Unsupported encoding")
+        return
+
+    role = websocket.query_params.get('role', 'player')
+    try:
+        delay = float(websocket.query_params.get('delay', 0))
+    except ValueError:
+        delay = -1
+    if role not in ROLES or not 0 <= delay <= config.WS_SPECTATOR_MAX_DELAY or (delay and role != 'spectator'):
+        await websocket.close(code=4400, reason="Invalid role or delay")
+        return
+
+    connection = Connection(websocket, protocol, codec, role, delay)
+
+    # Keep this session object live (not evicted to the store) while connected
+    session_manager.pin(session)
+    await manager.connect(websocket, game_id, connection)
 
     try:
         # Send initial game state
-        await websocket.send_json({
-            'type': 'game_state',
-            'data': session_manager.get_game_state(session)
-        })
+        send_game_state(connection, session)
 
         while True:
             # Receive message
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
             message_type = data.get('type')
 
+            if connection.read_only and message_type in PLAYER_MESSAGE_TYPES:
+                connection.send({
+                    'type': 'error',
+                    'data': {'message': 'Spectators cannot change the game', 'code': 'read_only'}
+                })
+                continue
+
             if message_type == 'move':
                 # Handle player move
                 move_data = data.get('data', {})
-                result = session_manager.make_move(
+                result = await session_manager.make_move_async(
                     session,
                     move_data.get('from_row'),
                     move_data.get('from_col'),
@@ -80,12 +421,9 @@ async def handle_websocket(websocket: WebSocket, game_id: str):
                 )
 
                 if result['success']:
-                    await manager.send_to_game(game_id, {
-                        'type': 'move_made',
-                        'data': result
-                    })
+                    await manager.send_result_to_game(game_id, 'move_made', result)
                 else:
-                    await websocket.send_json({
+                    connection.send({
                         'type': 'error',
                         'data': {'message': result['error']}
                     })
@@ -97,36 +435,34 @@ async def handle_websocket(websocket: WebSocket, game_id: str):
                     'data': {'status': 'started'}
                 })
 
-                # Get AI move (run in thread pool to not block)
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    None,
-                    session_manager.get_ai_move,
-                    session
+                async def report_queue_position(position: int):
+                    await manager.send_to_game(game_id, {
+                        'type': 'ai_queued',
+                        'data': {'position': position}
+                    })
+
+                # Get AI move (searched in the AI worker pool)
+                result = await session_manager.get_ai_move_async(
+                    session,
+                    on_queued=report_queue_position
                 )
 
                 if result['success']:
-                    await manager.send_to_game(game_id, {
-                        'type': 'ai_move',
-                        'data': result
-                    })
+                    await manager.send_result_to_game(game_id, 'ai_move', result)
                 else:
-                    await websocket.send_json({
+                    connection.send({
                         'type': 'error',
-                        'data': {'message': result['error']}
+                        'data': {'message': result['error'], 'code': result.get('code')}
                     })
 
             elif message_type == 'undo':
                 steps = data.get('data', {}).get('steps', 2)
-                result = session_manager.undo_move(session, steps)
+                result = await session_manager.undo_move_async(session, steps)
 
                 if result['success']:
-                    await manager.send_to_game(game_id, {
-                        'type': 'undo_done',
-                        'data': result
-                    })
+                    await manager.send_result_to_game(game_id, 'undo_done', result)
                 else:
-                    await websocket.send_json({
+                    connection.send({
                         'type': 'error',
                         'data': {'message': result['error']}
                     })
@@ -138,19 +474,24 @@ async def handle_websocket(websocket: WebSocket, game_id: str):
                     move_data.get('row'),
                     move_data.get('col')
                 )
-                await websocket.send_json({
+                connection.send({
                     'type': 'legal_moves',
                     'data': {'moves': moves}
                 })
 
-            elif message_type == 'get_state':
-                await websocket.send_json({
-                    'type': 'game_state',
-                    'data': session_manager.get_game_state(session)
+            elif message_type == 'get_all_legal_moves':
+                connection.send({
+                    'type': 'legal_move_map',
+                    'data': session_manager.get_legal_move_map(session)
                 })
 
+            elif message_type == 'get_state':
+                send_game_state(connection, session)
+
     except WebSocketDisconnect:
         manager.disconnect(websocket, game_id)
     except Exception as e:
         manager.disconnect(websocket, game_id)
         raise
+    finally:
+        session_manager.unpin(session)
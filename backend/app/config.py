@@ -1,17 +1,12 @@
 """
 Backend configuration
 """
+import os
 
-# Piece values (copied from original config)
-PIECE_VALUES = {
-    'K': 10000,
-    'R': 900,
-    'C': 450,
-    'H': 450,
-    'A': 200,
-    'E': 200,
-    'P': 100
-}
+# Evaluation parameter set (name under app/ai/params/ or a file path).
+# Piece values, term weights and piece-square tables live in the parameter file;
+# individual AI_CONFIGS entries may override it with their own 'eval_params'.
+EVAL_PARAMS = 'default'
 
 # AI configurations
 AI_CONFIGS = {
@@ -29,14 +24,25 @@ AI_CONFIGS = {
         'name': '谋略军师',
         'difficulty': 3,
         'description': 'Minimax算法，有战术深度',
-        'depth': 3
+        'depth': 3,
+        'eval_params': 'default'
     },
     'alphabeta': {
         'name': '深算国手',
         'difficulty': 4,
         'description': 'Alpha-Beta剪枝，强大的求胜欲望',
         'depth': 8,
-        'time_limit': 30
+        'time_limit': 30,
+        'min_time_limit': 5,  # floor when the time budget is scaled down under load
+        'max_nodes': None,  # node budget; when set it replaces time_limit (reproducible searches),
+                            # optionally with a 'min_max_nodes' floor for load scaling
+        'eval_params': 'default',
+        # Quiescence stand-pat skips the positional terms when material + PST is
+        # further outside the window than those terms can add up to (the bound
+        # Evaluator derives from the eval params, or 'lazy_margin' if set)
+        'lazy_eval': True,
+        'lazy_margin': None,
+        'parallel_workers': 0  # root moves searched in worker processes when > 1
     },
     'master': {
         'name': '绝世棋圣',
@@ -44,10 +50,78 @@ AI_CONFIGS = {
         'description': '最强AI，深度搜索+高级优化，挑战极限',
         'depth': 10,
         'time_limit': 60,
-        'quiescence_depth': 8
+        'min_time_limit': 10,
+        'max_nodes': None,
+        'quiescence_depth': 8,
+        'eval_params': 'default',
+        'lazy_eval': True,
+        'lazy_margin': None,
+        # Searches already run one per AI pool worker; each extra process here
+        # takes another pool slot (see AIWorkerPool), so parallelism across
+        # games comes from AI_POOL_WORKERS instead
+        'parallel_workers': 0,
+        'parallel_mode': 'lazy_smp'  # 'root': split root moves, 'lazy_smp': shared transposition table
     }
 }
 
+# AI worker pool: searches run in separate processes, off the event loop
+AI_POOL_WORKERS = 4
+AI_JOB_TIMEOUT = 60  # seconds, for AI types without their own time_limit
+AI_JOB_TIMEOUT_GRACE = 5  # seconds allowed past an AI's time_limit before a job is abandoned
+AI_MAX_SEARCHES_PER_WORKER = 1  # concurrent searches per worker process; the rest are queued
+AI_QUEUE_MAX = 64  # queued searches beyond this are rejected (HTTP 503)
+AI_QUEUE_AGING = 10  # seconds of waiting that move a queued search up one difficulty level
+
+# Load-aware time budgets: load = (running + queued searches) / pool capacity.
+# Above the threshold, time_limit is divided by 1 + (load - threshold) * scaling,
+# but never below an AI's 'min_time_limit'.
+AI_BUDGET_LOAD_THRESHOLD = 0.75
+AI_BUDGET_SCALING = 1.0
+
+# AI-vs-AI matches played by the server (demo channels, engine regression runs)
+MATCH_MAX_CONCURRENT = 2  # matches playing at once; the rest wait for a slot
+MATCH_MAX_PENDING = 16  # waiting matches beyond this are rejected (HTTP 503)
+MATCH_MAX_MOVES = 300  # a match still ongoing after this many moves is stopped (also the request cap)
+MATCH_MAX_MOVE_TIME = 30  # longest per-move search time a match request may ask for, in seconds
+MATCH_MOVE_INTERVAL = 0.0  # minimum seconds between moves (for watchable streams)
+MATCH_MAX_MOVE_INTERVAL = 30  # longest move interval a match request may ask for, in seconds
+MATCH_PRIORITY = 10  # AI queue priority of match searches (player searches use difficulty 1-5)
+MATCH_RETRY_DELAY = 5  # seconds to wait before retrying a move rejected by a full AI queue
+MATCH_HISTORY = 100  # finished matches kept for GET /api/v1/matches
+
+# Position analysis (POST /api/v1/analyze): hints and post-game review without a game session
+ANALYSIS_DEFAULT_DEPTH = 6
+ANALYSIS_MAX_DEPTH = 10
+ANALYSIS_DEFAULT_TIME = 5  # seconds, shared by all requested lines
+ANALYSIS_MAX_TIME = 30
+ANALYSIS_MAX_MULTIPV = 5  # best lines per request
+ANALYSIS_PV_LENGTH = 12  # moves reported per line
+ANALYSIS_PRIORITY = 3  # AI queue priority (player searches use difficulty 1-5)
+ANALYSIS_CACHE_SIZE = 2048  # analysed positions kept in the LRU cache
+ANALYSIS_MATE_SCORE = 100000  # reported score for a forced win (negated for a forced loss)
+
+# WebSocket fan-out: each client has a bounded send queue drained by its own task
+WS_SEND_QUEUE_MAX = 64  # queued frames per client; progress messages are dropped first
+WS_SEND_TIMEOUT = 10  # seconds a single send may take before the client is evicted
+WS_SPECTATOR_MAX_DELAY = 120  # longest delayed stream a spectator may ask for, in seconds
+
 # Game session settings
 SESSION_TIMEOUT = 3600  # 1 hour
+SESSION_SWEEP_INTERVAL = 60  # seconds between background expiry sweeps
 MAX_SESSIONS = 1000
+
+# Session store: idle sessions are evicted to it as compact snapshots and
+# rehydrated on their next request. 'memory' keeps snapshots in-process;
+# 'sqlite' and 'redis' survive restarts and can be shared by replicas.
+SESSION_STORE = os.environ.get('SESSION_STORE', 'memory')  # 'memory', 'sqlite' or 'redis'
+SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH', 'sessions.db')  # sqlite
+SESSION_STORE_URL = os.environ.get('SESSION_STORE_URL', 'redis://localhost:6379/0')  # redis
+SESSION_IDLE_EVICT = 300  # seconds of inactivity before a live session is moved to the store
+
+# Sharding across replicas: each replica owns the games that hash to it.
+# SHARD_NODES lists every replica's base URL (comma-separated, same order
+# everywhere); SHARD_ID is this replica's entry. Empty means a single replica.
+SHARD_NODES = os.environ.get('SHARD_NODES', '')
+SHARD_ID = os.environ.get('SHARD_ID', '')
+SHARD_VNODES = 64  # virtual points per replica on the hash ring
+ROUTER_TIMEOUT = 120  # seconds the router waits for a replica (covers the longest AI search)
@@ -1,16 +1,42 @@
 """
 FastAPI main application entry point
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.ai.parallel_search import shutdown_pools
+from app.api.routes.analysis import router as analysis_router
 from app.api.routes.games import router as games_router
-from app.api.websocket.game_ws import handle_websocket
+from app.api.routes.matches import router as matches_router
+from app.api.websocket.game_ws import handle_websocket, manager as ws_manager
+from app.services.ai_pool import ai_pool
+from app.services.analysis import analysis_service
+from app.services.game_service import session_manager
+from app.services.match_runner import match_runner
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the AI worker processes, the session sweeper and match streaming with the app"""
+    ai_pool.start()
+    session_manager.start_sweeper()
+    match_runner.listeners.append(ws_manager.send_result_to_game)
+    yield
+    await match_runner.shutdown()
+    await session_manager.stop_sweeper()
+    await session_manager.flush()
+    session_manager.store.close()
+    ai_pool.shutdown()
+    shutdown_pools()
+
 
 app = FastAPI(
     title="Xiangqi API",
     description="Chinese Chess (Xiangqi) Game API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend
@@ -24,6 +50,8 @@ app.add_middleware(
 
 # Include REST API routes
 app.include_router(games_router)
+app.include_router(matches_router)
+app.include_router(analysis_router)
 
 
 # WebSocket endpoint
@@ -44,3 +72,14 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """AI worker pool, search budget, analysis cache, match and WebSocket fan-out statistics"""
+    return {
+        "ai_pool": ai_pool.stats(),
+        "analysis": analysis_service.stats(),
+        "matches": match_runner.stats(),
+        "websockets": ws_manager.stats()
+    }
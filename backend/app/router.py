@@ -0,0 +1,175 @@
+"""
+Shard router - forwards each request to the replica owning its game
+
+Game ids are placed on the consistent hash ring from app.services.sharding,
+so every REST call under /api/v1/games/{game_id} or
+/api/v1/matches/{match_id} and every /ws/games/{game_id} connection goes to
+the one replica holding that game in memory. Position analyses are placed on
+the same ring by their FEN, so repeated analyses of a position hit one
+replica's analysis cache. Other requests (creating a game, AI types, docs)
+go to the replicas in turn; a new game gets an id owned by whichever
+replica created it.
+
+Run with the same SHARD_NODES as the replicas and no SHARD_ID:
+    uvicorn app.router:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import itertools
+import json
+from contextlib import asynccontextmanager
+
+import httpx
+import websockets
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import Response
+
+from app import config
+from app.core.board import Board
+from app.services.sharding import shard_map
+
+# Paths whose next segment is a game id (a match id is its game's id)
+GAME_PREFIXES = ('/api/v1/games/', '/api/v1/matches/')
+
+# Paths under GAME_PREFIXES whose first segment is not a game id
+NON_GAME_SEGMENTS = {'config'}
+
+ANALYSIS_PATH = '/api/v1/analyze'
+
+# Connection-level headers that must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host', 'content-length',
+}
+
+if not shard_map.enabled:
+    raise RuntimeError("app.router needs SHARD_NODES to list the backend replicas")
+
+_next_node = itertools.cycle(shard_map.nodes)
+_client: httpx.AsyncClient = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one HTTP connection pool to the replicas"""
+    global _client
+    _client = httpx.AsyncClient(timeout=config.ROUTER_TIMEOUT)
+    yield
+    await _client.aclose()
+
+
+app = FastAPI(title="Xiangqi shard router", lifespan=lifespan)
+
+
+def _node_for_path(path: str) -> str:
+    """The replica that should serve a request path"""
+    for prefix in GAME_PREFIXES:
+        if path.startswith(prefix):
+            segment = path[len(prefix):].split('/', 1)[0]
+            if segment and segment not in NON_GAME_SEGMENTS:
+                return shard_map.owner(segment)
+    return next(_next_node)
+
+
+def _node_for_analysis(body: bytes) -> str:
+    """The replica whose analysis cache holds a position (any replica if the body is unreadable)"""
+    try:
+        # Normalised the way the replicas key their cache, so equivalent
+        # spellings of a position reach the same replica
+        board, turn = Board.from_fen(json.loads(body)['fen'])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return next(_next_node)
+    return shard_map.owner(board.to_fen(turn))
+
+
+def _forward_headers(headers) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "nodes": shard_map.nodes}
+
+
+@app.websocket("/ws/games/{game_id}")
+async def proxy_websocket(websocket: WebSocket, game_id: str):
+    """Relay a game WebSocket to the owning replica, frame by frame"""
+    node = shard_map.owner(game_id)
+    url = 'ws' + node[len('http'):] + f'/ws/games/{game_id}'
+    if websocket.url.query:
+        # e.g. the protocol version
+        url += '?' + websocket.url.query
+
+    try:
+        upstream = await websockets.connect(url)
+    except (OSError, websockets.InvalidHandshake):
+        # The replica refused the game (e.g. not found) or is unreachable
+        await websocket.close(code=4004, reason="Game not available")
+        return
+
+    await websocket.accept()
+
+    async def client_to_upstream():
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            if message.get('text') is not None:
+                await upstream.send(message['text'])
+            elif message.get('bytes') is not None:
+                await upstream.send(message['bytes'])
+
+    async def upstream_to_client():
+        async for message in upstream:
+            if isinstance(message, str):
+                await websocket.send_text(message)
+            else:
+                await websocket.send_bytes(message)
+
+    tasks = [
+        asyncio.create_task(client_to_upstream()),
+        asyncio.create_task(upstream_to_client()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await upstream.close()
+
+    if tasks[1].done() and not tasks[1].cancelled():
+        # Replica closed first: pass its close code on to the client
+        try:
+            await websocket.close(code=upstream.close_code or 1000, reason=upstream.close_reason or '')
+        except RuntimeError:
+            pass
+
+
+@app.api_route(
+    "/{path:path}",
+    methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"]
+)
+async def proxy_http(request: Request, path: str):
+    """Forward a REST request to the owning (or next) replica"""
+    body = await request.body()
+    if request.url.path.rstrip('/') == ANALYSIS_PATH:
+        node = _node_for_analysis(body)
+    else:
+        node = _node_for_path(request.url.path)
+    try:
+        upstream = await _client.request(
+            request.method,
+            node + request.url.path,
+            params=request.query_params,
+            content=body,
+            headers=_forward_headers(request.headers)
+        )
+    except httpx.TimeoutException:
+        return Response(status_code=504)
+    except httpx.TransportError:
+        return Response(status_code=502)
+
+    return Response(
+        content=upstream.content,
+        status_code=upstream.status_code,
+        headers=_forward_headers(upstream.headers)
+    )
@@ -0,0 +1,457 @@
+"""
+AI worker pool - runs AI searches in separate processes
+
+Searches are CPU bound, so running them on the event loop (or in the default
+thread executor, where the GIL serializes them) stalls every other game.
+Jobs carry only a FEN string and the AI settings; each worker process
+rebuilds the position and returns the chosen move as plain tuples.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.board import Board
+from app.ai.random_ai import RandomAI
+from app.ai.greedy_ai import GreedyAI
+from app.ai.minimax_ai import MinimaxAI
+from app.ai.alphabeta_ai import AlphaBetaAI
+from app.ai.master_ai import MasterAI
+from app.services.budget import BudgetPolicy
+from app import config
+
+
+class AIJobError(Exception):
+    """An AI job failed in the worker process"""
+
+
+class AIJobTimeout(AIJobError):
+    """An AI job did not finish within its timeout"""
+
+
+class AIJobCancelled(AIJobError):
+    """An AI job was cancelled through AIWorkerPool.cancel()"""
+
+
+class AIOverloaded(AIJobError):
+    """The AI queue is full and the job was rejected"""
+
+
+def create_ai(ai_type: str, color: str):
+    """Create an AI instance configured from config.AI_CONFIGS"""
+    ai_config = config.AI_CONFIGS.get(ai_type, {})
+
+    if ai_type == 'random':
+        return RandomAI(color)
+    if ai_type == 'greedy':
+        return GreedyAI(color)
+    if ai_type == 'minimax':
+        return MinimaxAI(
+            color,
+            depth=ai_config.get('depth', 3),
+            eval_params=ai_config.get('eval_params')
+        )
+    if ai_type == 'master':
+        return MasterAI(
+            color,
+            depth=ai_config.get('depth', 10),
+            time_limit=ai_config.get('time_limit', 60),
+            quiescence_depth=ai_config.get('quiescence_depth', 8),
+            eval_params=ai_config.get('eval_params'),
+            lazy_eval=ai_config.get('lazy_eval', False),
+            lazy_margin=ai_config.get('lazy_margin'),
+            parallel_workers=ai_config.get('parallel_workers', 0),
+            parallel_mode=ai_config.get('parallel_mode', 'root'),
+            max_nodes=ai_config.get('max_nodes')
+        )
+
+    # alphabeta
+    ai_config = config.AI_CONFIGS.get('alphabeta', {})
+    return AlphaBetaAI(
+        color,
+        depth=ai_config.get('depth', 8),
+        time_limit=ai_config.get('time_limit', 30),
+        eval_params=ai_config.get('eval_params'),
+        lazy_eval=ai_config.get('lazy_eval', False),
+        lazy_margin=ai_config.get('lazy_margin'),
+        parallel_workers=ai_config.get('parallel_workers', 0),
+        max_nodes=ai_config.get('max_nodes')
+    )
+
+
+def release_ai(ai):
+    """Free resources held by an AI instance (e.g. a shared-memory table)"""
+    close = getattr(ai, 'close', None)
+    if close is not None:
+        close()
+
+
+def search_slots(ai_type: str) -> int:
+    """Pool slots a search occupies: one per process it runs on (parallel_workers)"""
+    return max(config.AI_CONFIGS.get(ai_type, {}).get('parallel_workers', 0), 1)
+
+
+def job_timeout(ai_type: str, time_limit: Optional[float] = None) -> float:
+    """Seconds to wait for a job: its time limit plus a grace period"""
+    ai_config = config.AI_CONFIGS.get(ai_type, {})
+    configured = ai_config.get('time_limit')
+    if configured is None or ai_config.get('max_nodes') is not None:
+        # Depth- and node-bounded searches ignore time limits
+        time_limit = config.AI_JOB_TIMEOUT
+    elif time_limit is None:
+        time_limit = configured
+    return time_limit + config.AI_JOB_TIMEOUT_GRACE
+
+
+def run_search_job(ai_type: str, color: str, fen: str, time_limit: Optional[float] = None,
+                   max_nodes: Optional[int] = None) -> dict:
+    """
+    Worker process entry point: search one position
+
+    max_nodes overrides the AI's configured node budget (if it has one).
+
+    Returns:
+        dict with keys: move ((from_row, from_col, to_row, to_col) or None),
+        thinking_info
+    """
+    board, _ = Board.from_fen(fen)
+    # A fresh AI per job: search state is never shared between games
+    ai = create_ai(ai_type, color)
+    if max_nodes is not None and getattr(ai, 'max_nodes', None) is not None:
+        ai.max_nodes = max_nodes
+    try:
+        move = ai.get_move(board, time_limit=time_limit)
+        thinking_info = ai.get_thinking_info()
+    finally:
+        release_ai(ai)
+
+    return {
+        'move': (move.from_row, move.from_col, move.to_row, move.to_col) if move else None,
+        'thinking_info': {
+            'depth': thinking_info.get('depth', 0),
+            'nodes_evaluated': thinking_info.get('nodes_evaluated', 0),
+            'score': thinking_info.get('score', 0),
+            'elapsed': thinking_info.get('elapsed', 0),
+            'nps': thinking_info.get('nps', 0)
+        }
+    }
+
+
+@dataclass
+class AIJob:
+    """A search waiting in, or dispatched from, the pool's queue"""
+    ai_type: str
+    color: str
+    fen: str
+    time_limit: Optional[float]
+    max_nodes: Optional[int]
+    priority: int
+    seq: int
+    enqueued_at: float
+    started: asyncio.Future
+    on_queued: Optional[Callable[[int], Awaitable[None]]] = None
+    position: int = 0
+    result: Optional[asyncio.Future] = None
+    cancelled: bool = False
+    # Other work run in place of a search (e.g. position analysis): (function, args)
+    task: Optional[Tuple[Callable, tuple]] = None
+    slots: int = 1
+    executor: Optional[ProcessPoolExecutor] = None
+
+    def effective_priority(self, now: float) -> float:
+        """Lower runs first; waiting jobs age towards the front of the queue"""
+        return self.priority - (now - self.enqueued_at) / config.AI_QUEUE_AGING
+
+
+class AIWorkerPool:
+    """
+    Process pool that both the REST and WebSocket paths submit searches to
+
+    At most workers * AI_MAX_SEARCHES_PER_WORKER slots are in use at once; a
+    search takes one slot per process it runs on (see search_slots), so a
+    parallel search that starts its own helper processes counts that CPU
+    use too. The rest wait in a priority queue ordered by difficulty (cheap AIs first,
+    with aging so master searches are not starved). When the queue is full
+    new searches are rejected with AIOverloaded. Searches that do not set
+    their own time_limit get a load-aware budget from BudgetPolicy when
+    they start.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or config.AI_POOL_WORKERS
+        self.capacity = self.workers * config.AI_MAX_SEARCHES_PER_WORKER
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: List[AIJob] = []
+        self._running = 0
+        self._seq = 0
+        self._jobs: Dict[str, AIJob] = {}
+        self._notify_tasks: Set[asyncio.Task] = set()
+        self.budget_policy = BudgetPolicy()
+        self._search_totals = {'searches': 0, 'nodes': 0, 'seconds': 0.0}
+
+    @property
+    def running(self) -> int:
+        """Pool slots taken by searches currently running in worker processes"""
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        """Pool slots that searches waiting for a free worker will take"""
+        return sum(job.slots for job in self._queue)
+
+    def stats(self) -> dict:
+        """Pool utilization, budget metrics and search throughput"""
+        seconds = self._search_totals['seconds']
+        return {
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'running': self._running,
+            'queued': self.queued,
+            'load': self.budget_policy.load(self._running, self.queued, self.capacity),
+            'budgets': self.budget_policy.metrics.to_dict(),
+            'searches': self._search_totals['searches'],
+            'nodes': self._search_totals['nodes'],
+            'nps': int(self._search_totals['nodes'] / seconds) if seconds > 0 else 0,
+        }
+
+    def _record_search(self, thinking_info: dict):
+        """Accumulate node counts and search time of a finished job"""
+        totals = self._search_totals
+        totals['searches'] += 1
+        totals['nodes'] += thinking_info.get('nodes_evaluated', 0)
+        totals['seconds'] += thinking_info.get('elapsed', 0)
+
+    def start(self):
+        """Start the worker processes (called on startup, or lazily on first use)"""
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+    def shutdown(self):
+        """Stop the worker processes and drop queued jobs"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for job in self._queue:
+            job.cancelled = True
+            job.started.cancel()
+        self._queue.clear()
+        self._jobs.clear()
+        self._running = 0
+
+    async def search(
+        self,
+        ai_type: str,
+        color: str,
+        fen: str,
+        job_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        time_limit: Optional[float] = None,
+        on_queued: Optional[Callable[[int], Awaitable[None]]] = None,
+        priority: Optional[int] = None
+    ) -> dict:
+        """
+        Queue a search and wait for its result
+
+        Args:
+            job_key: identifies the job for cancel() (e.g. the game ID)
+            timeout: seconds to wait once the search has started,
+                defaults to the search's time budget plus a grace period
+            time_limit: overrides the AI's own (load-scaled) time limit
+            on_queued: coroutine called with the 1-based queue position
+                whenever the search has to wait, and again as it moves up
+            priority: queue priority (lower runs first), defaults to the
+                AI's difficulty
+
+        Raises:
+            AIOverloaded: the queue is full
+            AIJobTimeout: the job did not finish in time
+            AIJobCancelled: the job was cancelled with cancel()
+            AIJobError: the worker failed
+        """
+        if time_limit is not None and timeout is not None:
+            # Let a running search stop by itself before it is abandoned
+            time_limit = min(time_limit, timeout)
+
+        job = self._new_job(ai_type, color, fen, time_limit, priority, on_queued)
+        result = await self._run(job, job_key, timeout)
+        self._record_search(result['thinking_info'])
+        return result
+
+    async def run_task(
+        self,
+        func: Callable,
+        args: tuple,
+        ai_type: str,
+        timeout: float,
+        job_key: Optional[str] = None,
+        on_queued: Optional[Callable[[int], Awaitable[None]]] = None,
+        priority: Optional[int] = None
+    ):
+        """
+        Queue other AI work (e.g. position analysis) behind the same limits
+
+        func(*args) runs in a worker process, so it must be a module-level
+        function and args must be picklable. The job takes one search slot;
+        ai_type only sets the default priority. Raises like search().
+        """
+        job = self._new_job(ai_type, '', '', None, priority, on_queued)
+        job.task = (func, args)
+        job.slots = 1
+        return await self._run(job, job_key, timeout)
+
+    def _new_job(self, ai_type, color, fen, time_limit, priority, on_queued) -> AIJob:
+        self._seq += 1
+        return AIJob(
+            ai_type=ai_type,
+            color=color,
+            fen=fen,
+            time_limit=time_limit,
+            max_nodes=None,
+            priority=(
+                priority if priority is not None
+                else config.AI_CONFIGS.get(ai_type, {}).get('difficulty', 1)
+            ),
+            seq=self._seq,
+            enqueued_at=time.monotonic(),
+            started=asyncio.get_running_loop().create_future(),
+            on_queued=on_queued,
+            slots=search_slots(ai_type)
+        )
+
+    async def _run(self, job: AIJob, job_key: Optional[str], timeout: Optional[float]):
+        """Queue a job and wait for its worker's result"""
+        self.start()
+        if len(self._queue) >= config.AI_QUEUE_MAX:
+            raise AIOverloaded("AI is busy, please try again shortly")
+
+        if job_key is not None:
+            self.cancel(job_key)
+            self._jobs[job_key] = job
+
+        self._queue.append(job)
+        self._dispatch()
+
+        try:
+            await job.started
+            if timeout is None:
+                timeout = job_timeout(job.ai_type, job.time_limit)
+            return await asyncio.wait_for(job.result, timeout)
+        except asyncio.TimeoutError:
+            raise AIJobTimeout(f"AI search timed out after {timeout:.0f}s")
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                # The awaiting task itself was cancelled (e.g. client went away)
+                raise
+            raise AIJobCancelled("AI search was cancelled")
+        except BrokenProcessPool as e:
+            # A worker died; the next dispatch starts a fresh pool (the broken
+            # pool's jobs free their slots through their done callbacks)
+            self._discard_executor(job.executor)
+            raise AIJobError(f"AI worker crashed: {e}")
+        except Exception as e:
+            raise AIJobError(str(e))
+        finally:
+            if job in self._queue:
+                self._queue.remove(job)
+                self._notify_positions()
+            if job_key is not None and self._jobs.get(job_key) is job:
+                del self._jobs[job_key]
+
+    def cancel(self, job_key: str) -> bool:
+        """
+        Cancel the job registered under job_key
+
+        A queued job is dropped; a running search cannot be interrupted and
+        finishes within its own time limit, but its result is discarded.
+        """
+        job = self._jobs.pop(job_key, None)
+        if job is None:
+            return False
+
+        job.cancelled = True
+        if not job.started.done():
+            job.started.cancel()
+            return True
+        if job.result is not None and not job.result.done():
+            job.result.cancel()
+            return True
+        return False
+
+    def _dispatch(self):
+        """Start queued jobs while there is spare capacity"""
+        self.start()
+        now = time.monotonic()
+        while self._queue and self._running < self.capacity:
+            job = min(self._queue, key=lambda j: (j.effective_priority(now), j.seq))
+            if self._running and self._running + job.slots > self.capacity:
+                # Wait for enough free slots (a job larger than the pool runs alone)
+                break
+            self._queue.remove(job)
+
+            if job.task is not None:
+                func, args = job.task
+            else:
+                if job.time_limit is None:
+                    job.time_limit, job.max_nodes = self.budget_policy.budget(
+                        job.ai_type, self._running, self.queued, self.capacity
+                    )
+                func = run_search_job
+                args = (job.ai_type, job.color, job.fen, job.time_limit, job.max_nodes)
+            try:
+                future = self._executor.submit(func, *args)
+            except BrokenProcessPool:
+                # A worker died since the last dispatch
+                self._discard_executor(self._executor)
+                self.start()
+                future = self._executor.submit(func, *args)
+            job.executor = self._executor
+            self._running += job.slots
+            # The worker slots free up when the process finishes, even if the
+            # caller has already given up on the result
+            future.add_done_callback(self._on_worker_done(asyncio.get_running_loop(), job.slots))
+            job.result = asyncio.wrap_future(future)
+            job.started.set_result(None)
+
+        self._notify_positions()
+
+    def _discard_executor(self, executor: Optional[ProcessPoolExecutor]):
+        """Shut down a broken executor unless it has already been replaced"""
+        if executor is not None and executor is self._executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _on_worker_done(self, loop, slots: int):
+        """Executor callback (runs in the executor's thread) that frees a job's slots"""
+        def callback(_future):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._job_finished, slots)
+        return callback
+
+    def _job_finished(self, slots: int):
+        """A worker process finished a search"""
+        self._running = max(self._running - slots, 0)
+        self._dispatch()
+
+    def _notify_positions(self):
+        """Tell waiting clients their (changed) queue positions"""
+        now = time.monotonic()
+        ordered = sorted(self._queue, key=lambda j: (j.effective_priority(now), j.seq))
+        for position, job in enumerate(ordered, 1):
+            if job.position == position:
+                continue
+            job.position = position
+            if job.on_queued is not None:
+                task = asyncio.ensure_future(job.on_queued(position))
+                self._notify_tasks.add(task)
+                task.add_done_callback(self._notify_tasks.discard)
+
+
+# Global AI worker pool instance
+ai_pool = AIWorkerPool()
@@ -0,0 +1,226 @@
+"""
+Position analysis - hints and post-game review without a game session
+
+A position (FEN) is searched on the AI worker pool by the master engine,
+running single-process so one analysis takes one worker slot. MultiPV
+lines come from searching again with the earlier best root moves excluded,
+so the time budget is split between the lines.
+
+Results are kept in an LRU cache keyed by Zobrist hash and side to move,
+shared by every client of this replica (behind the shard router, analysis
+requests for the same position go to the same replica). A cached result
+answers any request for the same position that asks for no more depth,
+lines or time; identical requests arriving while a search is running wait
+for that search instead of starting their own.
+"""
+import asyncio
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.core.board import Board
+from app.core.rules import validate_position
+from app.ai.master_ai import MasterAI
+from app.services.ai_pool import ai_pool
+from app import config
+
+AI_TYPE = 'master'
+
+# Evaluator scores this large mean the game is decided in the searched line
+# (checkmate is scored 50000, a captured king 100000; see Evaluator.evaluate)
+MATE_THRESHOLD = 50000
+
+
+class AnalysisError(ValueError):
+    """The analysis request is invalid (a malformed FEN or an illegal position)"""
+
+
+def _score_value(score: float) -> Tuple[int, bool]:
+    """Engine score as a JSON-safe integer, plus whether it is a forced mate"""
+    if math.isinf(score) or abs(score) >= MATE_THRESHOLD:
+        return (config.ANALYSIS_MATE_SCORE if score > 0 else -config.ANALYSIS_MATE_SCORE), True
+    return int(round(score)), False
+
+
+def run_analysis_job(fen: str, depth: int, time_limit: float, multipv: int) -> dict:
+    """
+    Worker process entry point: analyse one position
+
+    Returns:
+        dict with keys: lines (best first, each with move, score, mate,
+        depth and pv as (from_row, from_col, to_row, to_col) tuples),
+        nodes, elapsed
+    """
+    board, turn = Board.from_fen(fen)
+    ai_config = config.AI_CONFIGS[AI_TYPE]
+    ai = MasterAI(
+        turn,
+        depth=depth,
+        time_limit=time_limit,
+        quiescence_depth=ai_config.get('quiescence_depth', 8),
+        eval_params=ai_config.get('eval_params'),
+        lazy_eval=ai_config.get('lazy_eval', False),
+        lazy_margin=ai_config.get('lazy_margin'),
+        parallel_workers=0
+    )
+
+    lines = []
+    nodes = 0
+    elapsed = 0.0
+    for _ in range(multipv):
+        move = ai.get_move(board, time_limit=time_limit / multipv)
+        info = ai.get_thinking_info()
+        nodes += info.get('nodes_evaluated', 0)
+        elapsed += info.get('elapsed', 0)
+        if move is None:
+            break
+
+        score, mate = _score_value(info.get('score', 0))
+        move_key = (move.from_row, move.from_col, move.to_row, move.to_col)
+        lines.append({
+            'move': move_key,
+            'score': score,
+            'mate': mate,
+            'depth': info.get('depth', 0),
+            'pv': ai.principal_variation(board, move, config.ANALYSIS_PV_LENGTH),
+        })
+        ai.excluded_root_moves.add(move_key)
+
+    return {'lines': lines, 'nodes': nodes, 'elapsed': round(elapsed, 3)}
+
+
+@dataclass
+class _CachedAnalysis:
+    fen: str
+    depth: int
+    time_limit: float
+    multipv: int
+    result: dict
+
+    def covers(self, fen: str, depth: int, time_limit: float, multipv: int) -> bool:
+        return (
+            self.fen == fen and self.depth >= depth
+            and self.time_limit >= time_limit and self.multipv >= multipv
+        )
+
+
+class AnalysisService:
+    """Runs analyses on the worker pool behind a shared LRU cache"""
+
+    def __init__(self, cache_size: Optional[int] = None):
+        self.cache_size = cache_size if cache_size is not None else config.ANALYSIS_CACHE_SIZE
+        self._cache: 'OrderedDict[Tuple[int, str], _CachedAnalysis]' = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._stats = {'requests': 0, 'hits': 0, 'shared': 0}
+
+    def stats(self) -> dict:
+        return dict(self._stats, cached=len(self._cache), size=self.cache_size)
+
+    async def analyze(
+        self,
+        fen: str,
+        depth: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        multipv: int = 1
+    ) -> dict:
+        """
+        Analyse a position
+
+        depth, time_limit and multipv are clamped to the configured maxima.
+
+        Raises:
+            AnalysisError: the FEN is malformed, or the position is illegal
+                (a king is missing or the side not to move is in check)
+            AIJobError (and subclasses): as raised by the AI worker pool
+        """
+        try:
+            board, turn = Board.from_fen(fen)
+        except ValueError as e:
+            raise AnalysisError(f"Invalid FEN: {e}") from e
+        error = validate_position(board, turn)
+        if error is not None:
+            raise AnalysisError(f"Illegal position: {error}")
+
+        depth = min(max(depth or config.ANALYSIS_DEFAULT_DEPTH, 1), config.ANALYSIS_MAX_DEPTH)
+        time_limit = min(time_limit or config.ANALYSIS_DEFAULT_TIME, config.ANALYSIS_MAX_TIME)
+        multipv = min(max(multipv, 1), config.ANALYSIS_MAX_MULTIPV)
+        # Normalised so equal positions share cache entries
+        fen = board.to_fen(turn)
+        key = (board.hash_value, turn)
+        self._stats['requests'] += 1
+
+        cached = self._cache.get(key)
+        if cached is not None and cached.covers(fen, depth, time_limit, multipv):
+            self._cache.move_to_end(key)
+            self._stats['hits'] += 1
+            return self._response(fen, turn, depth, cached.result, multipv, cached=True)
+
+        job = (key, depth, time_limit, multipv)
+        inflight = self._inflight.get(job)
+        if inflight is not None:
+            self._stats['shared'] += 1
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request that started the search went away; search again
+                return await self.analyze(fen, depth, time_limit, multipv)
+            return self._response(fen, turn, depth, result, multipv, cached=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[job] = future
+        try:
+            result = await ai_pool.run_task(
+                run_analysis_job,
+                (fen, depth, time_limit, multipv),
+                ai_type=AI_TYPE,
+                timeout=time_limit + config.AI_JOB_TIMEOUT_GRACE,
+                priority=config.ANALYSIS_PRIORITY
+            )
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the exception; do not warn about an unretrieved one
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._inflight[job]
+
+        self._store(key, _CachedAnalysis(fen, depth, time_limit, multipv, result))
+        return self._response(fen, turn, depth, result, multipv, cached=False)
+
+    def _store(self, key: Tuple[int, str], entry: _CachedAnalysis):
+        current = self._cache.get(key)
+        if current is not None and current.covers(entry.fen, entry.depth, entry.time_limit, entry.multipv):
+            self._cache.move_to_end(key)
+            return
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _response(fen: str, turn: str, depth: int, result: dict, multipv: int, cached: bool) -> dict:
+        lines = result['lines'][:multipv]
+        return {
+            'fen': fen,
+            'side_to_move': turn,
+            'depth': depth,
+            'best_move': lines[0]['move'] if lines else None,
+            'score': lines[0]['score'] if lines else None,
+            'pv': lines[0]['pv'] if lines else [],
+            'lines': lines,
+            'nodes': result['nodes'],
+            'elapsed': result['elapsed'],
+            'cached': cached,
+        }
+
+
+# Global analysis service instance
+analysis_service = AnalysisService()
@@ -0,0 +1,108 @@
+"""
+Load-aware search budgets
+
+Each AI's configured time_limit (or max_nodes) is its budget on an idle
+server. When the worker pool is busy, budgets shrink so queued players are
+not kept waiting behind long searches, but never below the AI's configured
+floor ('min_time_limit' / 'min_max_nodes').
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from app import config
+
+
+@dataclass
+class BudgetMetrics:
+    """Counters describing how budgets were granted"""
+    searches: int = 0
+    reduced: int = 0  # budget cut below the configured limit
+    floored: int = 0  # budget cut down to the configured floor
+    requested_seconds: float = 0.0
+    granted_seconds: float = 0.0
+    requested_nodes: int = 0
+    granted_nodes: int = 0
+    reduced_by_type: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            'searches': self.searches,
+            'reduced': self.reduced,
+            'floored': self.floored,
+            'reduced_ratio': self.reduced / self.searches if self.searches else 0.0,
+            'requested_seconds': round(self.requested_seconds, 3),
+            'granted_seconds': round(self.granted_seconds, 3),
+            'requested_nodes': self.requested_nodes,
+            'granted_nodes': self.granted_nodes,
+            'reduced_by_type': dict(self.reduced_by_type),
+        }
+
+
+class BudgetPolicy:
+    """Scales search time and node budgets by worker utilization and queue depth"""
+
+    def __init__(self):
+        self.metrics = BudgetMetrics()
+
+    def load(self, running: int, queued: int, capacity: int) -> float:
+        """
+        Server load: 1.0 means every worker busy and nothing waiting
+
+        Queued searches count fully, since each one adds a whole search
+        to the wait of the players behind it.
+        """
+        return (running + queued) / max(capacity, 1)
+
+    def scale(self, load: float) -> float:
+        """Budget multiplier for a given load (1.0 up to AI_BUDGET_LOAD_THRESHOLD)"""
+        excess = load - config.AI_BUDGET_LOAD_THRESHOLD
+        if excess <= 0:
+            return 1.0
+        return 1.0 / (1.0 + excess * config.AI_BUDGET_SCALING)
+
+    def budget(
+        self, ai_type: str, running: int, queued: int, capacity: int
+    ) -> Tuple[Optional[float], Optional[int]]:
+        """
+        Time and node budgets for a search about to start
+
+        Returns:
+            (seconds, nodes); either is None when the AI type has no such
+            limit configured (depth-bounded AIs get (None, None))
+        """
+        ai_config = config.AI_CONFIGS.get(ai_type, {})
+        time_limit = ai_config.get('time_limit')
+        max_nodes = ai_config.get('max_nodes')
+        if time_limit is None and max_nodes is None:
+            return None, None
+
+        scale = self.scale(self.load(running, queued, capacity))
+        metrics = self.metrics
+        metrics.searches += 1
+        reduced = floored = False
+
+        granted_time = None
+        if time_limit is not None:
+            floor = min(ai_config.get('min_time_limit', time_limit), time_limit)
+            granted_time = max(time_limit * scale, floor)
+            metrics.requested_seconds += time_limit
+            metrics.granted_seconds += granted_time
+            reduced = granted_time < time_limit
+            floored = reduced and granted_time == floor
+
+        granted_nodes = None
+        if max_nodes is not None:
+            floor = min(ai_config.get('min_max_nodes', max_nodes), max_nodes)
+            granted_nodes = max(int(max_nodes * scale), floor)
+            metrics.requested_nodes += max_nodes
+            metrics.granted_nodes += granted_nodes
+            reduced = reduced or granted_nodes < max_nodes
+            floored = floored or (granted_nodes < max_nodes and granted_nodes == floor)
+
+        if reduced:
+            metrics.reduced += 1
+            metrics.reduced_by_type[ai_type] = metrics.reduced_by_type.get(ai_type, 0) + 1
+        if floored:
+            metrics.floored += 1
+
+        return granted_time, granted_nodes
@@ -1,21 +1,45 @@
 """
 Game session service - manages game state for each session
+
+All mutations of a session go through its own asyncio lock when called
+from the event loop (the *_async methods), so moves, undos and AI moves
+on one game are serialized without a global lock. The synchronous
+methods are kept for callers outside the event loop.
+
+Sessions idle for SESSION_IDLE_EVICT seconds (or beyond MAX_SESSIONS) are
+evicted to the session store as compact snapshots and rehydrated the next
+time they are requested. Store calls that do I/O (SQLite, Redis) run in a
+worker thread, so a slow store never blocks the event loop; the methods
+that reach the store are coroutines.
 """
-import uuid
+import asyncio
+import json
+import logging
 import time
-from typing import Dict, Optional, List, Tuple
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, List, Tuple
 from dataclasses import dataclass, field
 
-from app.core.board import Board
+from app.core.board import Board, INITIAL_FEN
 from app.core.move import Move
 from app.core.rules import is_in_check, is_checkmate, get_game_result, is_legal_move
-from app.ai.random_ai import RandomAI
-from app.ai.greedy_ai import GreedyAI
-from app.ai.minimax_ai import MinimaxAI
-from app.ai.alphabeta_ai import AlphaBetaAI
-from app.ai.master_ai import MasterAI
+from app.services.ai_pool import (
+    ai_pool, AIJobError, AIJobTimeout, AIJobCancelled, AIOverloaded
+)
+from app.services.sharding import shard_map
+from app.services.session_store import (
+    SessionSnapshot, SessionStore, SnapshotError, create_session_store,
+    decode_snapshot, encode_snapshot
+)
 from app import config
 
+logger = logging.getLogger(__name__)
+
+
+# Result of a move, undo or AI move request on a game the server plays
+READ_ONLY_ERROR = {'success': False, 'error': 'Game is played by the server', 'code': 'read_only'}
+
 
 @dataclass
 class MoveRecord:
@@ -43,102 +67,292 @@ class GameSession:
     player_color: str = 'red'
     created_at: float = field(default_factory=time.time)
     last_activity: float = field(default_factory=time.time)
+    initial_fen: str = INITIAL_FEN
 
     # Internal state for undo
     _move_stack: List[Tuple[Move, any]] = field(default_factory=list)
 
+    # Serializes moves, undos and AI moves on this session
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    # True while an AI search for this session is queued or running
+    ai_pending: bool = False
+
+    # Incremented on every change to the position; keys the cached state
+    version: int = 0
+    _state_cache: Optional[Tuple[int, dict, str]] = field(default=None, repr=False, compare=False)
+    # (version, {(from_row, from_col): [[to_row, to_col], ...]}) for the side to move
+    _legal_cache: Optional[Tuple[int, Dict[Tuple[int, int], List[List[int]]]]] = field(
+        default=None, repr=False, compare=False
+    )
+
+    # Played by the server (AI-vs-AI matches); clients may only watch
+    spectator_only: bool = False
+
+    # Open WebSocket connections holding this session object; a pinned
+    # session is never evicted, so they never act on a stale copy
+    clients: int = 0
+
+    def is_busy(self) -> bool:
+        """Whether an operation on this session is in progress"""
+        return self.lock.locked() or self.ai_pending or self.clients > 0
+
 
 class GameSessionManager:
     """Manages all game sessions"""
 
-    def __init__(self):
-        self.sessions: Dict[str, GameSession] = {}
-        self._ai_cache: Dict[str, any] = {}
+    def __init__(self, store: Optional[SessionStore] = None):
+        # Ordered by last activity (least recently used first), so expiry
+        # only ever looks at the front of the dict
+        self.sessions: 'OrderedDict[str, GameSession]' = OrderedDict()
+        self.store = store if store is not None else create_session_store()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._cleanup_task: Optional[asyncio.Task] = None
 
     def create_session(
         self,
         ai_type: str = 'alphabeta',
-        player_color: str = 'red'
+        player_color: str = 'red',
+        spectator_only: bool = False
     ) -> GameSession:
-        """Create a new game session"""
-        game_id = str(uuid.uuid4())
+        """Create a new game session (with an id owned by this replica)"""
+        game_id = shard_map.new_game_id()
         board = Board()
 
         session = GameSession(
             game_id=game_id,
             board=board,
             ai_type=ai_type,
-            player_color=player_color
+            player_color=player_color,
+            spectator_only=spectator_only
         )
 
         self.sessions[game_id] = session
-        self._cleanup_old_sessions()
+        self._schedule_cleanup()
 
         return session
 
-    def get_session(self, game_id: str) -> Optional[GameSession]:
-        """Get a game session by ID"""
+    async def get_session(self, game_id: str) -> Optional[GameSession]:
+        """Get a game session by ID, rehydrating it from the store if it was evicted"""
         session = self.sessions.get(game_id)
+        if session is None:
+            session = await self._rehydrate(game_id)
         if session:
-            session.last_activity = time.time()
+            self._touch(session)
         return session
 
-    def delete_session(self, game_id: str) -> bool:
+    def _touch(self, session: GameSession):
+        """Record activity on a session and move it to the back of the LRU order"""
+        session.last_activity = time.time()
+        if session.game_id in self.sessions:
+            self.sessions.move_to_end(session.game_id)
+
+    async def delete_session(self, game_id: str) -> bool:
         """Delete a game session"""
         if game_id in self.sessions:
-            del self.sessions[game_id]
+            await self._remove_session(game_id)
             return True
-        return False
-
-    def _cleanup_old_sessions(self):
-        """Remove sessions that have been inactive for too long"""
-        current_time = time.time()
-        expired_ids = [
-            gid for gid, session in self.sessions.items()
-            if current_time - session.last_activity > config.SESSION_TIMEOUT
-        ]
-        for gid in expired_ids:
-            del self.sessions[gid]
-
-        # Also limit total sessions
-        if len(self.sessions) > config.MAX_SESSIONS:
-            # Remove oldest sessions
-            sorted_sessions = sorted(
-                self.sessions.items(),
-                key=lambda x: x[1].last_activity
-            )
-            for gid, _ in sorted_sessions[:len(self.sessions) - config.MAX_SESSIONS]:
-                del self.sessions[gid]
-
-    def get_ai(self, ai_type: str, color: str):
-        """Get or create an AI instance"""
-        cache_key = f"{ai_type}_{color}"
-
-        if cache_key not in self._ai_cache:
-            if ai_type == 'random':
-                self._ai_cache[cache_key] = RandomAI(color)
-            elif ai_type == 'greedy':
-                self._ai_cache[cache_key] = GreedyAI(color)
-            elif ai_type == 'minimax':
-                ai_config = config.AI_CONFIGS.get('minimax', {})
-                self._ai_cache[cache_key] = MinimaxAI(color, depth=ai_config.get('depth', 3))
-            elif ai_type == 'master':
-                ai_config = config.AI_CONFIGS.get('master', {})
-                self._ai_cache[cache_key] = MasterAI(
-                    color,
-                    depth=ai_config.get('depth', 10),
-                    time_limit=ai_config.get('time_limit', 60),
-                    quiescence_depth=ai_config.get('quiescence_depth', 8)
-                )
-            else:  # alphabeta
-                ai_config = config.AI_CONFIGS.get('alphabeta', {})
-                self._ai_cache[cache_key] = AlphaBetaAI(
-                    color,
-                    depth=ai_config.get('depth', 8),
-                    time_limit=ai_config.get('time_limit', 30)
+        return await self._store_call(self.store.delete, game_id)
+
+    async def _store_call(self, method: Callable, *args):
+        """Call a store method, in a worker thread when the store does I/O"""
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def pin(self, session: GameSession):
+        """Keep a session in memory while a connection holds it"""
+        session.clients += 1
+
+    def unpin(self, session: GameSession):
+        """Release a pin taken with pin()"""
+        session.clients = max(session.clients - 1, 0)
+        self._touch(session)
+
+    def snapshot(self, session: GameSession) -> SessionSnapshot:
+        """Build the snapshot of a session"""
+        return SessionSnapshot(
+            game_id=session.game_id,
+            ai_type=session.ai_type,
+            player_color=session.player_color,
+            initial_fen=session.initial_fen,
+            created_at=session.created_at,
+            last_activity=session.last_activity,
+            moves=[
+                (move.from_row, move.from_col, move.to_row, move.to_col)
+                for move, _ in session._move_stack
+            ],
+            spectator_only=session.spectator_only
+        )
+
+    def restore(self, snapshot: SessionSnapshot) -> GameSession:
+        """
+        Rebuild a session from a snapshot by replaying its moves
+
+        Raises:
+            SnapshotError: a move in the snapshot is not legal
+        """
+        board, turn = Board.from_fen(snapshot.initial_fen)
+        session = GameSession(
+            game_id=snapshot.game_id,
+            board=board,
+            current_turn=turn,
+            ai_type=snapshot.ai_type,
+            player_color=snapshot.player_color,
+            created_at=snapshot.created_at,
+            last_activity=snapshot.last_activity,
+            initial_fen=snapshot.initial_fen,
+            spectator_only=snapshot.spectator_only
+        )
+        session.game_result = get_game_result(board, turn)
+
+        for from_row, from_col, to_row, to_col in snapshot.moves:
+            move = self._find_legal_move(session, from_row, from_col, to_row, to_col)
+            if move is None:
+                raise SnapshotError(
+                    f"Illegal move in snapshot of {snapshot.game_id}: "
+                    f"{(from_row, from_col)} -> {(to_row, to_col)}"
                 )
+            self._play_move(session, move)
+
+        return session
+
+    async def _rehydrate(self, game_id: str) -> Optional[GameSession]:
+        """Load an evicted session back from the store"""
+        data = await self._store_call(self.store.load, game_id)
+        session = self.sessions.get(game_id)
+        if session is not None:
+            # A concurrent request rehydrated it while the store was read
+            return session
+        if data is None:
+            return None
+        try:
+            session = self.restore(decode_snapshot(data))
+        except SnapshotError:
+            await self._store_call(self.store.delete, game_id)
+            return None
+
+        self.sessions[game_id] = session
+        self._schedule_cleanup()
+        return session
+
+    async def _save_session(self, session: GameSession):
+        """Write a session's snapshot to the store, expiring with the session"""
+        ttl = session.last_activity + config.SESSION_TIMEOUT - time.time()
+        if ttl > 0:
+            data = encode_snapshot(self.snapshot(session))
+            await self._store_call(self.store.save, session.game_id, data, ttl)
+
+    async def _evict_session(self, game_id: str):
+        """Move a session from memory to the store"""
+        session = self.sessions.get(game_id)
+        if session is None or session.is_busy():
+            return
+        activity, version = session.last_activity, session.version
+        await self._save_session(session)
+        if (self.sessions.get(game_id) is not session or session.is_busy()
+                or session.last_activity != activity or session.version != version):
+            # Used while its snapshot was written: keep it in memory (the
+            # snapshot is overwritten on its next eviction)
+            return
+        self._unload_session(game_id)
+
+    async def flush(self):
+        """Save every live session to the store (for shutdown)"""
+        for session in list(self.sessions.values()):
+            await self._save_session(session)
+
+    def _schedule_cleanup(self):
+        """Trim the sessions in memory in the background once they exceed MAX_SESSIONS"""
+        if len(self.sessions) <= config.MAX_SESSIONS:
+            return
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.create_task(self._run_cleanup())
+
+    async def _run_cleanup(self):
+        try:
+            await self._cleanup_old_sessions()
+        except Exception:
+            logger.exception("Session cleanup failed")
+
+    async def _cleanup_old_sessions(self):
+        """
+        Remove expired sessions, and move idle sessions and the least
+        recently used sessions beyond MAX_SESSIONS to the store
+
+        Walks the LRU order from the front and stops at the first session
+        that is neither idle nor needed to get under the limit, so the
+        cost is proportional to the number of sessions removed. Busy and
+        pinned sessions are in use, so they are touched (moved to the back)
+        instead of being walked again on every call.
+        """
+        now = time.time()
+        expire_cutoff = now - config.SESSION_TIMEOUT
+        evict_cutoff = now - config.SESSION_IDLE_EVICT
+        excess = len(self.sessions) - config.MAX_SESSIONS
+
+        expired = []
+        evicted = []
+        in_use = []
+        for gid, session in self.sessions.items():
+            if session.last_activity >= evict_cutoff and excess <= 0:
+                break
+            if session.is_busy():
+                in_use.append(session)
+                continue
+            if session.last_activity < expire_cutoff:
+                expired.append(gid)
+            else:
+                evicted.append(gid)
+            excess -= 1
+
+        for session in in_use:
+            self._touch(session)
+        for gid in expired:
+            session = self.sessions.get(gid)
+            # Store calls for earlier sessions may have let requests use this one
+            if session is not None and not session.is_busy() and session.last_activity < expire_cutoff:
+                await self._remove_session(gid)
+        for gid in evicted:
+            await self._evict_session(gid)
+
+    def start_sweeper(self, interval: Optional[float] = None):
+        """Start the background task that expires idle sessions"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(
+                self._sweep(interval or config.SESSION_SWEEP_INTERVAL)
+            )
+
+    async def stop_sweeper(self):
+        """Stop the background expiry task"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep(self, interval: float):
+        """Periodically expire and evict idle sessions"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._cleanup_old_sessions()
+                await self._store_call(self.store.purge_expired)
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    async def _remove_session(self, game_id: str):
+        """Drop a session from memory and from the store"""
+        if game_id in self.sessions:
+            self._unload_session(game_id)
+        await self._store_call(self.store.delete, game_id)
 
-        return self._ai_cache[cache_key]
+    def _unload_session(self, game_id: str):
+        """Drop a session from memory and cancel its queued AI job"""
+        self.sessions.pop(game_id)
+        ai_pool.cancel(game_id)
 
     def make_move(
         self,
@@ -166,19 +380,55 @@ class GameSessionManager:
         if piece.color != session.current_turn:
             return {'success': False, 'error': 'Not your turn'}
 
-        # Find the move in legal moves
-        legal_moves = board.get_legal_moves(session.current_turn)
-        target_move = None
-
-        for move in legal_moves:
-            if (move.from_row == from_row and move.from_col == from_col and
-                move.to_row == to_row and move.to_col == to_col):
-                target_move = move
-                break
-
+        target_move = self._find_legal_move(session, from_row, from_col, to_row, to_col)
         if not target_move:
             return {'success': False, 'error': 'Illegal move'}
 
+        move_record, captured = self._play_move(session, target_move)
+        self._touch(session)
+
+        return {
+            'success': True,
+            'move_info': {
+                'from': [from_row, from_col],
+                'to': [to_row, to_col],
+                'piece_type': piece.type,
+                'piece_color': piece.color,
+                'captured': {'type': captured.type, 'color': captured.color} if captured else None,
+                'is_check': move_record.is_check,
+                'notation': move_record.notation
+            },
+            'game_state': self.get_game_state(session)
+        }
+
+    def _find_legal_move(
+        self,
+        session: GameSession,
+        from_row: int,
+        from_col: int,
+        to_row: int,
+        to_col: int
+    ) -> Optional[Move]:
+        """Find the legal move for the side to move with these squares"""
+        piece = session.board.get_piece(from_row, from_col)
+        if piece is None or piece.color != session.current_turn:
+            return None
+        # Only the moving piece's moves are generated and checked
+        for move in session.board.get_legal_moves_from(from_row, from_col):
+            if move.to_row == to_row and move.to_col == to_col:
+                return move
+        return None
+
+    def _play_move(self, session: GameSession, target_move: Move) -> Tuple[MoveRecord, any]:
+        """
+        Execute a legal move and update the session's history and result
+
+        Returns:
+            (move record, captured piece or None)
+        """
+        board = session.board
+        piece = board.get_piece(target_move.from_row, target_move.from_col)
+
         # Execute the move
         captured = board.make_move(target_move)
 
@@ -187,8 +437,8 @@ class GameSessionManager:
 
         # Create move record
         move_record = MoveRecord(
-            from_pos=(from_row, from_col),
-            to_pos=(to_row, to_col),
+            from_pos=(target_move.from_row, target_move.from_col),
+            to_pos=(target_move.to_row, target_move.to_col),
             piece_type=piece.type,
             piece_color=piece.color,
             captured_type=captured.type if captured else None,
@@ -212,63 +462,163 @@ class GameSessionManager:
 
         # Check game result
         session.game_result = get_game_result(board, session.current_turn)
-        session.last_activity = time.time()
-
-        return {
-            'success': True,
-            'move_info': {
-                'from': [from_row, from_col],
-                'to': [to_row, to_col],
-                'piece_type': piece.type,
-                'piece_color': piece.color,
-                'captured': {'type': captured.type, 'color': captured.color} if captured else None,
-                'is_check': move_record.is_check,
-                'notation': move_record.notation
-            },
-            'game_state': self.get_game_state(session)
-        }
+        session.version += 1
 
-    def get_ai_move(self, session: GameSession) -> dict:
-        """
-        Get AI's move for the current position
+        return move_record, captured
 
-        Returns:
-            dict with keys: success, error, move_info, thinking_info, game_state
-        """
+    async def make_move_async(
+        self,
+        session: GameSession,
+        from_row: int,
+        from_col: int,
+        to_row: int,
+        to_col: int
+    ) -> dict:
+        """Make a move while holding the session lock"""
+        if session.spectator_only:
+            return dict(READ_ONLY_ERROR)
+        async with session.lock:
+            return self.make_move(session, from_row, from_col, to_row, to_col)
+
+    def _check_ai_turn(self, session: GameSession) -> Optional[dict]:
+        """Return an error result if the AI cannot move now, else None"""
         if session.game_result != 'ongoing':
             return {'success': False, 'error': 'Game has ended'}
 
-        # Determine AI color
-        ai_color = 'black' if session.player_color == 'red' else 'red'
-
-        if session.current_turn != ai_color:
+        if session.current_turn != self._ai_color(session):
             return {'success': False, 'error': 'Not AI turn'}
 
-        ai = self.get_ai(session.ai_type, ai_color)
-        move = ai.get_move(session.board)
+        return None
+
+    def _ai_color(self, session: GameSession) -> str:
+        """The color played by the AI in this session"""
+        return 'black' if session.player_color == 'red' else 'red'
 
+    def _apply_ai_move(self, session: GameSession, move: Optional[Tuple[int, int, int, int]],
+                       thinking_info: dict) -> dict:
+        """Play the AI's chosen move and attach its thinking info"""
         if not move:
             return {'success': False, 'error': 'AI could not find a move'}
 
-        # Get thinking info before making the move
-        thinking_info = ai.get_thinking_info()
-
-        # Make the move
-        result = self.make_move(
-            session,
-            move.from_row, move.from_col,
-            move.to_row, move.to_col
-        )
+        result = self.make_move(session, *move)
 
         if result['success']:
             result['thinking_info'] = {
                 'depth': thinking_info.get('depth', 0),
                 'nodes_evaluated': thinking_info.get('nodes_evaluated', 0),
-                'score': thinking_info.get('score', 0)
+                'score': thinking_info.get('score', 0),
+                'elapsed': thinking_info.get('elapsed', 0),
+                'nps': thinking_info.get('nps', 0)
             }
 
         return result
 
+    async def get_ai_move_async(
+        self,
+        session: GameSession,
+        on_queued: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> dict:
+        """
+        Get AI's move by searching in the AI worker pool
+
+        The event loop stays free while the search runs. The session lock
+        is held while the position is read and while the move is applied,
+        but not during the search, so the game stays responsive; if the
+        position changes meanwhile (undo, new game), the result is
+        discarded. Only one AI search per session runs at a time.
+        on_queued is awaited with the queue position while the search waits
+        for a free worker.
+
+        Returns:
+            dict with keys: success, error, code, move_info, thinking_info, game_state
+        """
+        if session.spectator_only:
+            return dict(READ_ONLY_ERROR)
+        async with session.lock:
+            error = self._check_ai_turn(session)
+            if error:
+                return error
+            if session.ai_pending:
+                return {'success': False, 'error': 'AI is already thinking', 'code': 'busy'}
+
+            ai_color = self._ai_color(session)
+            position = (session.board.hash_value, len(session._move_stack))
+            fen = session.board.to_fen(ai_color)
+            session.ai_pending = True
+
+        try:
+            job = await ai_pool.search(
+                session.ai_type,
+                ai_color,
+                fen,
+                job_key=session.game_id,
+                on_queued=on_queued
+            )
+        except AIJobError as e:
+            return self._search_error(e)
+        finally:
+            session.ai_pending = False
+
+        async with session.lock:
+            if (session.board.hash_value, len(session._move_stack)) != position:
+                return {'success': False, 'error': 'Position changed during AI search', 'code': 'stale'}
+
+            return self._apply_ai_move(session, job['move'], job['thinking_info'])
+
+    async def play_server_move(
+        self,
+        session: GameSession,
+        ai_type: str,
+        time_limit: Optional[float] = None,
+        priority: Optional[int] = None
+    ) -> dict:
+        """
+        Search and play a move for the side to move with the given AI
+
+        Used for games the server plays itself (AI-vs-AI matches), so there
+        is no check of whose turn it is for the player; otherwise works
+        like get_ai_move_async.
+
+        Returns:
+            dict with keys: success, error, code, move_info, thinking_info, game_state
+        """
+        async with session.lock:
+            if session.game_result != 'ongoing':
+                return {'success': False, 'error': 'Game has ended'}
+            color = session.current_turn
+            fen = session.board.to_fen(color)
+            session.ai_pending = True
+
+        try:
+            job = await ai_pool.search(
+                ai_type,
+                color,
+                fen,
+                job_key=session.game_id,
+                time_limit=time_limit,
+                priority=priority
+            )
+        except AIJobError as e:
+            return self._search_error(e)
+        finally:
+            session.ai_pending = False
+
+        async with session.lock:
+            return self._apply_ai_move(session, job['move'], job['thinking_info'])
+
+    @staticmethod
+    def _search_error(error: AIJobError) -> dict:
+        """The error result for a failed AI search"""
+        if isinstance(error, AIOverloaded):
+            code = 'overloaded'
+        elif isinstance(error, AIJobTimeout):
+            code = 'timeout'
+        elif isinstance(error, AIJobCancelled):
+            code = 'cancelled'
+        else:
+            code = 'ai_error'
+        return {'success': False, 'error': str(error), 'code': code}
+
     def undo_move(self, session: GameSession, steps: int = 2) -> dict:
         """
         Undo moves (default 2 for human-AI game)
@@ -291,28 +641,98 @@ class GameSessionManager:
                 session.captured_pieces.pop()
 
         session.game_result = 'ongoing'
-        session.last_activity = time.time()
+        session.version += 1
+        self._touch(session)
 
         return {
             'success': True,
+            'steps': steps,
             'game_state': self.get_game_state(session)
         }
 
+    async def undo_move_async(self, session: GameSession, steps: int = 2) -> dict:
+        """Undo moves while holding the session lock"""
+        if session.spectator_only:
+            return dict(READ_ONLY_ERROR)
+        async with session.lock:
+            return self.undo_move(session, steps)
+
     def get_legal_moves(self, session: GameSession, row: int, col: int) -> List[List[int]]:
-        """Get legal moves for a piece at the given position"""
+        """
+        Get legal moves for a piece at the given position
+
+        Served from the legal-move map when it is already cached for this
+        position, otherwise only the one piece's moves are generated.
+        """
+        cache = session._legal_cache
+        if cache is not None and cache[0] == session.version:
+            return list(cache[1].get((row, col), []))
+
         piece = session.board.get_piece(row, col)
-        if not piece or piece.color != session.current_turn:
+        if not piece or piece.color != session.current_turn or session.game_result != 'ongoing':
             return []
 
-        legal_moves = session.board.get_legal_moves(session.current_turn)
         return [
             [move.to_row, move.to_col]
-            for move in legal_moves
-            if move.from_row == row and move.from_col == col
+            for move in session.board.get_legal_moves_from(row, col)
         ]
 
+    def get_legal_move_map(self, session: GameSession) -> dict:
+        """
+        Legal moves of every piece of the side to move
+
+        Returns:
+            dict with keys: version, current_turn, legal_moves
+            ([{'from': [row, col], 'to': [[row, col], ...]}, ...])
+        """
+        return {
+            'version': session.version,
+            'current_turn': session.current_turn,
+            'legal_moves': [
+                {'from': list(origin), 'to': targets}
+                for origin, targets in self._legal_move_map(session).items()
+            ]
+        }
+
+    def _legal_move_map(self, session: GameSession) -> Dict[Tuple[int, int], List[List[int]]]:
+        """Legal moves by origin square, generated once per position version"""
+        cache = session._legal_cache
+        if cache is not None and cache[0] == session.version:
+            return cache[1]
+
+        move_map: Dict[Tuple[int, int], List[List[int]]] = {}
+        if session.game_result == 'ongoing':
+            for move in session.board.get_legal_moves(session.current_turn):
+                move_map.setdefault((move.from_row, move.from_col), []).append(
+                    [move.to_row, move.to_col]
+                )
+        session._legal_cache = (session.version, move_map)
+        return move_map
+
     def get_game_state(self, session: GameSession) -> dict:
-        """Get the current game state as a dictionary"""
+        """
+        Get the current game state as a dictionary
+
+        The dict is cached until the position changes and shared between
+        callers, so it must not be modified.
+        """
+        return self._cached_state(session)[1]
+
+    def get_game_state_json(self, session: GameSession) -> str:
+        """The current game state, already encoded as JSON"""
+        return self._cached_state(session)[2]
+
+    def _cached_state(self, session: GameSession) -> Tuple[int, dict, str]:
+        """(version, state, state JSON), rebuilt only after the position changed"""
+        cache = session._state_cache
+        if cache is None or cache[0] != session.version:
+            state = self._build_game_state(session)
+            cache = (session.version, state, json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+            session._state_cache = cache
+        return cache
+
+    def _build_game_state(self, session: GameSession) -> dict:
+        """Build the game state dictionary from the board"""
         board_state = []
         for row in range(10):
             row_data = []
@@ -332,15 +752,23 @@ class GameSessionManager:
             'board': board_state,
             'current_turn': session.current_turn,
             'game_result': session.game_result,
-            'is_check': is_in_check(session.board, session.current_turn),
+            # The last move record already knows whether it gave check
+            'is_check': (
+                session.move_history[-1].is_check if session.move_history
+                else is_in_check(session.board, session.current_turn)
+            ),
             'move_count': len(session.move_history),
             'last_move': {
                 'from': list(session.move_history[-1].from_pos),
                 'to': list(session.move_history[-1].to_pos)
             } if session.move_history else None,
-            'captured_pieces': session.captured_pieces,
+            'captured_pieces': list(session.captured_pieces),
             'ai_type': session.ai_type,
-            'player_color': session.player_color
+            'player_color': session.player_color,
+            'spectator_only': session.spectator_only,
+            'version': session.version,
+            # CRC-32 of the position's FEN, lets delta clients verify their board
+            'hash': '%08x' % zlib.crc32(session.board.to_fen(session.current_turn).encode())
         }
 
 
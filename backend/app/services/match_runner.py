@@ -0,0 +1,245 @@
+"""
+AI-vs-AI matches played by the server
+
+Each match is an ordinary game session marked spectator_only, so clients
+watch it over the game WebSocket (/ws/games/{match_id}?role=spectator) like
+any other game. Moves are searched on the AI worker pool at a lower queue
+priority than player searches. At most MATCH_MAX_CONCURRENT matches play at
+once; further matches wait for a slot, up to MATCH_MAX_PENDING.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from app.services.game_service import GameSession, session_manager
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Called with (game_id, message_type, result) for every move and when a match ends
+MatchListener = Callable[[str, str, dict], Awaitable[None]]
+
+
+class MatchError(Exception):
+    """A match could not be created"""
+
+
+class MatchLimitReached(MatchError):
+    """Too many matches are waiting to play"""
+
+
+@dataclass
+class Match:
+    """One AI-vs-AI match"""
+    match_id: str
+    red_ai: str
+    black_ai: str
+    move_time: Optional[float]
+    max_moves: int
+    move_interval: float
+    session: GameSession = field(repr=False)
+    status: str = 'pending'  # pending, running, finished, cancelled, error
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('finished', 'cancelled', 'error')
+
+    def to_dict(self) -> dict:
+        session = self.session
+        return {
+            'match_id': self.match_id,
+            'red_ai': self.red_ai,
+            'black_ai': self.black_ai,
+            'move_time': self.move_time,
+            'max_moves': self.max_moves,
+            'status': self.status,
+            'error': self.error,
+            'result': session.game_result,
+            'move_count': len(session.move_history),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class MatchRunner:
+    """Creates, plays and tracks AI-vs-AI matches"""
+
+    def __init__(self):
+        self.matches: 'OrderedDict[str, Match]' = OrderedDict()
+        self.listeners: List[MatchListener] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def running(self) -> int:
+        return sum(1 for m in self.matches.values() if m.status == 'running')
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for m in self.matches.values() if m.status == 'pending')
+
+    def start_match(
+        self,
+        red_ai: str,
+        black_ai: str,
+        move_time: Optional[float] = None,
+        max_moves: Optional[int] = None,
+        move_interval: Optional[float] = None
+    ) -> Match:
+        """
+        Create a match and start playing it in the background
+
+        Args:
+            red_ai, black_ai: AI types from config.AI_CONFIGS
+            move_time: seconds per move (None: each AI's own time budget),
+                at most MATCH_MAX_MOVE_TIME
+            max_moves: the match is stopped as ongoing after this many moves,
+                at most MATCH_MAX_MOVES
+            move_interval: minimum seconds between moves, for watchable streams,
+                at most MATCH_MAX_MOVE_INTERVAL
+
+        Raises:
+            MatchError: an AI type is unknown
+            MatchLimitReached: MATCH_MAX_PENDING matches are already waiting
+        """
+        for ai_type in (red_ai, black_ai):
+            if ai_type not in config.AI_CONFIGS:
+                raise MatchError(f"Invalid AI type: {ai_type}")
+        if self.pending >= config.MATCH_MAX_PENDING:
+            raise MatchLimitReached("Too many matches waiting, please try again later")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(config.MATCH_MAX_CONCURRENT)
+
+        if move_time is not None:
+            move_time = min(move_time, config.MATCH_MAX_MOVE_TIME)
+        max_moves = min(max_moves or config.MATCH_MAX_MOVES, config.MATCH_MAX_MOVES)
+        if move_interval is None:
+            move_interval = config.MATCH_MOVE_INTERVAL
+        move_interval = min(max(move_interval, 0.0), config.MATCH_MAX_MOVE_INTERVAL)
+
+        session = session_manager.create_session(ai_type=red_ai, spectator_only=True)
+        # Keep the game in memory from the start: a match may wait for a slot
+        # longer than SESSION_IDLE_EVICT
+        session_manager.pin(session)
+        match = Match(
+            match_id=session.game_id,
+            red_ai=red_ai,
+            black_ai=black_ai,
+            move_time=move_time,
+            max_moves=max_moves,
+            move_interval=move_interval,
+            session=session
+        )
+        self.matches[match.match_id] = match
+        self._trim_history()
+        match.task = asyncio.create_task(self._play(match))
+        match.task.add_done_callback(lambda _task: self._task_done(match))
+        return match
+
+    def get_match(self, match_id: str) -> Optional[Match]:
+        return self.matches.get(match_id)
+
+    def cancel_match(self, match_id: str) -> bool:
+        """Stop a pending or running match"""
+        match = self.matches.get(match_id)
+        if match is None or match.done:
+            return False
+        match.task.cancel()
+        return True
+
+    async def shutdown(self):
+        """Cancel all unfinished matches"""
+        tasks = [m.task for m in self.matches.values() if m.task and not m.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _task_done(self, match: Match):
+        """Release the match's session however its task ended"""
+        session_manager.unpin(match.session)
+        if not match.done:
+            # Cancelled before the task first ran
+            match.status = 'cancelled'
+            match.finished_at = time.time()
+
+    async def _play(self, match: Match):
+        """Play a match to the end (runs as a task)"""
+        try:
+            async with self._slots:
+                match.status = 'running'
+                match.started_at = time.time()
+                await self._play_moves(match)
+            match.status = 'finished'
+        except asyncio.CancelledError:
+            match.status = 'cancelled'
+            match.finished_at = time.time()
+            # Spectators still hear that the match ended; shielded so a second
+            # cancel cannot cut the notification short, then the task ends
+            # cancelled as its canceller expects
+            await asyncio.shield(self._notify_finished(match))
+            raise
+        except Exception as e:
+            match.status = 'error'
+            match.error = str(e)
+        match.finished_at = time.time()
+        await self._notify_finished(match)
+
+    async def _notify_finished(self, match: Match):
+        await self._notify(match.match_id, 'match_finished', {
+            'match': match.to_dict(),
+            'game_state': session_manager.get_game_state(match.session),
+        })
+
+    async def _play_moves(self, match: Match):
+        session = match.session
+        priority = config.MATCH_PRIORITY
+        while session.game_result == 'ongoing' and len(session.move_history) < match.max_moves:
+            started = time.monotonic()
+            ai_type = match.red_ai if session.current_turn == 'red' else match.black_ai
+            result = await session_manager.play_server_move(
+                session, ai_type, time_limit=match.move_time, priority=priority
+            )
+            if not result['success']:
+                if result.get('code') == 'overloaded':
+                    # Give way to player searches and try again
+                    await asyncio.sleep(config.MATCH_RETRY_DELAY)
+                    continue
+                raise RuntimeError(result['error'])
+
+            await self._notify(match.match_id, 'ai_move', result)
+
+            wait = match.move_interval - (time.monotonic() - started)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def _notify(self, game_id: str, message_type: str, result: dict):
+        for listener in self.listeners:
+            try:
+                await listener(game_id, message_type, result)
+            except Exception:
+                logger.exception("Match listener failed for %s (%s)", game_id, message_type)
+
+    def _trim_history(self):
+        """Forget the oldest finished matches beyond MATCH_HISTORY"""
+        finished = [mid for mid, m in self.matches.items() if m.done]
+        for match_id in finished[:max(len(finished) - config.MATCH_HISTORY, 0)]:
+            del self.matches[match_id]
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'pending': self.pending,
+            'max_concurrent': config.MATCH_MAX_CONCURRENT,
+        }
+
+
+match_runner = MatchRunner()
@@ -0,0 +1,285 @@
+"""
+Session snapshots and session stores
+
+A snapshot is a compact binary encoding of a game session: the starting
+position as FEN plus the moves played, two bytes per move (from and to
+squares as row * 9 + col). Everything else in a GameSession (board,
+move history, captured pieces, undo stack) is rebuilt by replaying the
+moves, so a snapshot stays small and never goes out of sync with the
+rules.
+
+Stores hold snapshots keyed by game id, so idle sessions can be evicted
+from process memory and rehydrated on demand, and games survive restarts
+when the store is persistent (SQLite, Redis). Store calls are synchronous;
+the session manager runs those of blocking stores (any doing I/O) in a
+worker thread, so they must be thread-safe.
+"""
+import sqlite3
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app import config
+
+SNAPSHOT_MAGIC = b'XQS'
+SNAPSHOT_VERSION = 2
+
+# magic, version, created_at, last_activity
+_HEADER = struct.Struct('<3sBdd')
+# version 2+: flags
+_FLAGS = struct.Struct('<B')
+_LENGTH = struct.Struct('<B')
+_MOVE_COUNT = struct.Struct('<H')
+
+FLAG_SPECTATOR_ONLY = 1
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot cannot be decoded or replayed"""
+
+
+@dataclass
+class SessionSnapshot:
+    """Everything needed to rebuild a GameSession"""
+    game_id: str
+    ai_type: str
+    player_color: str
+    initial_fen: str
+    created_at: float
+    last_activity: float
+    moves: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    spectator_only: bool = False
+
+
+def encode_snapshot(snapshot: SessionSnapshot) -> bytes:
+    """Encode a snapshot to bytes"""
+    parts = [
+        _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, snapshot.created_at, snapshot.last_activity),
+        _FLAGS.pack(FLAG_SPECTATOR_ONLY if snapshot.spectator_only else 0),
+    ]
+    for text in (snapshot.game_id, snapshot.ai_type, snapshot.player_color, snapshot.initial_fen):
+        data = text.encode('ascii')
+        parts.append(_LENGTH.pack(len(data)))
+        parts.append(data)
+
+    parts.append(_MOVE_COUNT.pack(len(snapshot.moves)))
+    parts.append(bytes(
+        square
+        for from_row, from_col, to_row, to_col in snapshot.moves
+        for square in (from_row * 9 + from_col, to_row * 9 + to_col)
+    ))
+    return b''.join(parts)
+
+
+def decode_snapshot(data: bytes) -> SessionSnapshot:
+    """
+    Decode bytes produced by encode_snapshot
+
+    Raises:
+        SnapshotError: the data is truncated or not a snapshot
+    """
+    try:
+        magic, version, created_at, last_activity = _HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC or not 1 <= version <= SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format: {magic!r} v{version}")
+        offset = _HEADER.size
+
+        flags = 0
+        if version >= 2:
+            (flags,) = _FLAGS.unpack_from(data, offset)
+            offset += _FLAGS.size
+
+        texts = []
+        for _ in range(4):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            texts.append(data[offset:offset + length].decode('ascii'))
+            offset += length
+
+        (count,) = _MOVE_COUNT.unpack_from(data, offset)
+        offset += _MOVE_COUNT.size
+        squares = data[offset:offset + count * 2]
+        if len(squares) != count * 2:
+            raise SnapshotError("Truncated snapshot move list")
+    except (struct.error, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+
+    moves = [
+        divmod(squares[i], 9) + divmod(squares[i + 1], 9)
+        for i in range(0, len(squares), 2)
+    ]
+    game_id, ai_type, player_color, initial_fen = texts
+    return SessionSnapshot(
+        game_id=game_id,
+        ai_type=ai_type,
+        player_color=player_color,
+        initial_fen=initial_fen,
+        created_at=created_at,
+        last_activity=last_activity,
+        moves=moves,
+        spectator_only=bool(flags & FLAG_SPECTATOR_ONLY)
+    )
+
+
+class SessionStore(ABC):
+    """
+    Storage for session snapshots
+
+    Snapshots expire ttl seconds after they are saved; an expired snapshot
+    is never returned by load().
+    """
+
+    # Whether calls do I/O (and so are run off the event loop)
+    blocking = True
+
+    @abstractmethod
+    def save(self, game_id: str, data: bytes, ttl: float):
+        """Store a snapshot, replacing any previous one for the game"""
+
+    @abstractmethod
+    def load(self, game_id: str) -> Optional[bytes]:
+        """The stored snapshot, or None if there is none or it expired"""
+
+    @abstractmethod
+    def delete(self, game_id: str) -> bool:
+        """Drop a snapshot, returning whether an unexpired one was stored"""
+
+    def purge_expired(self) -> int:
+        """Drop expired snapshots, returning how many were removed"""
+        return 0
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store
+
+    Evicted sessions take only a few hundred bytes here instead of a live
+    board and move history, but nothing survives a restart and replicas do
+    not share it.
+    """
+
+    blocking = False
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+
+    def save(self, game_id: str, data: bytes, ttl: float):
+        self._data[game_id] = (data, time.time() + ttl)
+
+    def load(self, game_id: str) -> Optional[bytes]:
+        item = self._data.get(game_id)
+        if item is None:
+            return None
+        data, expires = item
+        if expires <= time.time():
+            del self._data[game_id]
+            return None
+        return data
+
+    def delete(self, game_id: str) -> bool:
+        item = self._data.pop(game_id, None)
+        return item is not None and item[1] > time.time()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [gid for gid, (_, expires) in self._data.items() if expires <= now]
+        for gid in expired:
+            del self._data[gid]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store backed by a local SQLite file (survives restarts)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'game_id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)')
+        self._lock = threading.Lock()
+
+    def save(self, game_id: str, data: bytes, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sessions (game_id, data, expires) VALUES (?, ?, ?)',
+                (game_id, data, time.time() + ttl)
+            )
+
+    def load(self, game_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM sessions WHERE game_id = ? AND expires > ?',
+                (game_id, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def delete(self, game_id: str) -> bool:
+        with self._lock:
+            # Expired rows are left to purge_expired()
+            cursor = self._conn.execute(
+                'DELETE FROM sessions WHERE game_id = ? AND expires > ?',
+                (game_id, time.time())
+            )
+        return cursor.rowcount > 0
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store backed by Redis or any server speaking its protocol
+
+    Requires the optional 'redis' package. Expiry uses Redis key TTLs.
+    """
+
+    def __init__(self, url: str, prefix: str = 'xiangqi:session:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_STORE='redis' requires the 'redis' package") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def save(self, game_id: str, data: bytes, ttl: float):
+        self._client.set(self.prefix + game_id, data, px=max(int(ttl * 1000), 1))
+
+    def load(self, game_id: str) -> Optional[bytes]:
+        return self._client.get(self.prefix + game_id)
+
+    def delete(self, game_id: str) -> bool:
+        return self._client.delete(self.prefix + game_id) > 0
+
+    def close(self):
+        self._client.close()
+
+
+def create_session_store(kind: Optional[str] = None) -> SessionStore:
+    """Create the session store selected by config.SESSION_STORE"""
+    kind = kind or config.SESSION_STORE
+    if kind == 'memory':
+        return MemorySessionStore()
+    if kind == 'sqlite':
+        return SQLiteSessionStore(config.SESSION_STORE_PATH)
+    if kind == 'redis':
+        return RedisSessionStore(config.SESSION_STORE_URL)
+    raise ValueError(f"Unknown session store: {kind}")
@@ -0,0 +1,91 @@
+"""
+Game-to-replica sharding with a consistent hash ring
+
+Each backend replica owns the games whose ids hash to it on the ring, and
+keeps those sessions in memory. New games are given ids that hash to the
+replica creating them, so a game never has to move after creation. The
+router (app.router) and the 421 check in the API use the same ring to send
+every REST and WebSocket request for a game to its owner.
+
+Sharding is off when SHARD_NODES is empty (single replica, every game local).
+"""
+import bisect
+import hashlib
+import uuid
+from typing import Dict, List, Optional
+
+from app import config
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit position of a key on the ring"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes
+
+    Adding or removing a node only moves the keys next to that node's
+    virtual points, about 1/N of all keys.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        if not nodes:
+            raise ValueError("HashRing needs at least one node")
+        self.nodes = list(nodes)
+        self.vnodes = vnodes
+        points: Dict[int, str] = {}
+        for node in self.nodes:
+            for i in range(vnodes):
+                points[_hash(f'{node}#{i}')] = node
+        self._positions = sorted(points)
+        self._owners = [points[p] for p in self._positions]
+
+    def node_for(self, key: str) -> str:
+        """The node owning a key (first virtual point clockwise of its hash)"""
+        index = bisect.bisect(self._positions, _hash(key)) % len(self._positions)
+        return self._owners[index]
+
+
+class ShardMap:
+    """This replica's view of the ring"""
+
+    def __init__(self, nodes: List[str], node_id: Optional[str] = None):
+        self.nodes = list(nodes)
+        self.node_id = node_id
+        self.ring = HashRing(self.nodes, config.SHARD_VNODES) if self.nodes else None
+        # The router has no SHARD_ID: it owns no games and only looks up owners
+        if node_id is not None and self.ring and node_id not in self.nodes:
+            raise ValueError(f"SHARD_ID {node_id!r} is not one of SHARD_NODES")
+
+    @property
+    def enabled(self) -> bool:
+        return self.ring is not None
+
+    def owner(self, game_id: str) -> Optional[str]:
+        """The replica owning a game (None when sharding is off)"""
+        return self.ring.node_for(game_id) if self.ring else None
+
+    def is_local(self, game_id: str) -> bool:
+        """Whether this replica owns a game"""
+        return self.ring is None or self.ring.node_for(game_id) == self.node_id
+
+    def new_game_id(self) -> str:
+        """
+        A fresh game id owned by this replica
+
+        Random ids land on this replica with probability ~1/N, so this
+        takes N tries on average.
+        """
+        while True:
+            game_id = str(uuid.uuid4())
+            if self.is_local(game_id):
+                return game_id
+
+
+def _parse_nodes(value: str) -> List[str]:
+    return [node.strip() for node in value.split(',') if node.strip()]
+
+
+shard_map = ShardMap(_parse_nodes(config.SHARD_NODES), config.SHARD_ID or None)
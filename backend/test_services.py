@@ -0,0 +1,992 @@
+"""
+测试脚本 - 验证后端服务（AI 工作进程池、会话、分片、分析等）
+
+在 backend 目录下运行: python test_services.py
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.board import Board
+from app.ai.evaluator import Evaluator
+from app import config
+
+
+def test_lazy_evaluation():
+    """测试懒惰评估"""
+    print("测试懒惰评估...")
+    board = Board()
+    board.remove_piece(board.get_piece(0, 0))  # 去掉黑车，红方大优
+    evaluator = Evaluator(lazy_margin=200)
+    full = evaluator.evaluate(board)
+
+    # 窗口包含评分时与完整评估一致
+    assert evaluator.evaluate_lazy(board, full - 1, full + 1) == full, "窗口内应完整评估"
+    assert evaluator.lazy_stats == {'calls': 1, 'exits': 0}, "窗口内不应提前返回"
+
+    # 评分远高于窗口时只计算子力和位置
+    partial = evaluator.evaluate_lazy(board, -100, 0)
+    assert evaluator.lazy_stats['exits'] == 1, "远离窗口时应提前返回"
+    assert partial >= 200, "提前返回的评分应仍在窗口之外"
+
+    evaluator.reset_lazy_stats()
+    assert evaluator.lazy_stats == {'calls': 0, 'exits': 0}, "统计应被重置"
+
+    # 已分胜负的局面不提前返回
+    mated, _ = Board.from_fen('R3k4/R8/9/9/9/9/9/9/9/3K5 b')
+    assert evaluator.evaluate_lazy(mated, 10 ** 6, 10 ** 6 + 1) == evaluator.evaluate(mated) >= 50000, \
+        "将死的局面应返回胜负分数"
+
+    # 默认裕量由评估参数推导，覆盖其余评估项的实际取值
+    evaluator = Evaluator()
+    assert evaluator.lazy_margin is None and evaluator.positional_bound > 0
+    for fen in ('2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w',
+                'r1bakab1r/9/1cn3nc1/p1p1p1p1p/9/2P6/P3P1P1P/1C2C1N2/9/RNBAKAB1R b'):
+        board, _ = Board.from_fen(fen)
+        partial = evaluator._evaluate_material_position(board)[0]
+        assert abs(evaluator.evaluate(board) - partial) <= evaluator.positional_bound, "裕量应不小于其余评估项之和"
+
+    print("✓ 懒惰评估测试通过")
+
+
+def test_lazy_search():
+    """测试懒惰评估不改变搜索结果"""
+    print("\n测试懒惰评估搜索...")
+    from app.ai.alphabeta_ai import AlphaBetaAI
+    from app.ai.master_ai import MasterAI
+
+    exits = 0
+    for fen in ('2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w',
+                '2bakab2/9/2n1c4/p3p3p/2p6/6P2/P3P3P/2N1C4/9/2BAKAB2 b'):
+        for cls, options in ((AlphaBetaAI, {}), (MasterAI, {'quiescence_depth': 3})):
+            results = []
+            for lazy_eval in (False, True):
+                board, turn = Board.from_fen(fen)
+                ai = cls(turn, depth=2, time_limit=600, lazy_eval=lazy_eval, **options)
+                move = ai.get_move(board)
+                info = ai.get_thinking_info()
+                results.append(((move.from_row, move.from_col, move.to_row, move.to_col), info['score']))
+                if lazy_eval:
+                    exits += info['lazy_exits']
+            assert results[0] == results[1], f"{cls.__name__} 懒惰评估改变了搜索结果: {results}"
+    assert exits > 0, "懒惰评估应提前返回"
+
+    print("✓ 懒惰评估搜索测试通过")
+
+
+def test_root_parallel_search():
+    """测试多进程根节点并行搜索"""
+    print("\n测试根节点并行搜索...")
+    from app.ai.alphabeta_ai import AlphaBetaAI
+    from app.ai.parallel_search import shutdown_pools
+
+    fen = '2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w'
+    serial_board, _ = Board.from_fen(fen)
+    serial = AlphaBetaAI('red', depth=2, time_limit=60)
+    serial_move = serial.get_move(serial_board)
+
+    board, _ = Board.from_fen(fen)
+    parallel = AlphaBetaAI('red', depth=2, time_limit=60, parallel_workers=2)
+    try:
+        move = parallel.get_move(board)
+    finally:
+        shutdown_pools()
+
+    assert move is not None and move in board.get_legal_moves('red'), "并行搜索应返回合法走法"
+    info, serial_info = parallel.get_thinking_info(), serial.get_thinking_info()
+    assert abs(info['score'] - serial_info['score']) < 1e-6, "并行与串行搜索的评分应一致"
+    assert (move.from_row, move.from_col, move.to_row, move.to_col) == \
+        (serial_move.from_row, serial_move.from_col, serial_move.to_row, serial_move.to_col), "并行与串行搜索的走法应一致"
+    assert info['nodes_evaluated'] > 0, "节点数应包含工作进程"
+
+    # 节点预算模式：各任务平分剩余预算，结果与进程完成顺序无关
+    results = []
+    try:
+        for _ in range(3):
+            board, _ = Board.from_fen(fen)
+            ai = AlphaBetaAI('red', depth=8, parallel_workers=2, max_nodes=3000)
+            move = ai.get_move(board)
+            info = ai.get_thinking_info()
+            assert move in board.get_legal_moves('red'), "节点预算并行搜索应返回合法走法"
+            assert info['nodes_evaluated'] < 2 * 3000, f"各任务预算之和不应超过剩余预算: {info['nodes_evaluated']}"
+            results.append(((move.from_row, move.from_col, move.to_row, move.to_col),
+                            info['nodes_evaluated'], info['depth'], info['score']))
+    finally:
+        shutdown_pools()
+    assert results[0] == results[1] == results[2], f"节点预算并行搜索应可复现: {results}"
+
+    print("✓ 根节点并行搜索测试通过")
+
+
+def test_shared_transposition_table():
+    """测试 Lazy SMP 共享置换表"""
+    print("\n测试共享置换表...")
+    from app.ai.lazy_smp import SharedTranspositionTable, process_shared_table
+    from app.ai.master_ai import MasterAI
+    from app.ai.parallel_search import shutdown_pools
+
+    table = SharedTranspositionTable(entries=1024)
+    try:
+        table.new_generation()
+        helper = SharedTranspositionTable(entries=1024, name=table.name, generation=table.generation)
+
+        # 写入的条目在其他进程（连接者）可见，同一局面只用更深的结果替换
+        table[12345] = (3, 1.5, 'exact')
+        assert 12345 in helper and helper[12345] == (3, 1.5, 'exact'), "连接者应读到创建者写入的条目"
+        table[12345] = (2, -7.0, 'lower')
+        assert table[12345] == (3, 1.5, 'exact'), "较浅的结果不应替换较深的结果"
+        table[12345 + 1024] = (1, float('-inf'), 'upper')
+        assert 12345 not in table, "同一槽位的其他局面应替换旧条目"
+        assert table[12345 + 1024] == (1, float('-inf'), 'upper'), "无穷分数应能往返"
+
+        # 新的一代使旧条目失效，并让旧一代的辅助进程停止
+        assert not helper.stop_requested(), "本代搜索进行中不应停止"
+        table.new_generation()
+        assert 12345 + 1024 not in table, "新一代应使旧条目失效"
+        assert helper.stop_requested(), "旧一代的辅助进程应停止"
+
+        helper.clear()
+        helper.generation = table.generation
+        table[7] = (1, 0.0, 'exact')
+        assert 7 in helper, "连接者调用 clear() 不应清空置换表"
+        table.request_stop()
+        assert helper.stop_requested(), "创建者请求停止后辅助进程应停止"
+        helper.close()
+    finally:
+        table.close()
+
+    # Lazy SMP 搜索在多次搜索间复用本进程的共享置换表
+    board, _ = Board.from_fen('2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w')
+    names = []
+    try:
+        for _ in range(2):
+            ai = MasterAI('red', depth=2, time_limit=10, quiescence_depth=2,
+                          parallel_workers=2, parallel_mode='lazy_smp')
+            move = ai.get_move(board)
+            assert move in board.get_legal_moves('red'), "Lazy SMP 应返回合法走法"
+            names.append(ai.transposition_table.name)
+            ai.close()
+            assert isinstance(ai.transposition_table, dict), "close() 后应换回普通置换表"
+    finally:
+        shutdown_pools()
+    assert names[0] == names[1] == process_shared_table().name, "应复用同一张共享置换表"
+
+    print("✓ 共享置换表测试通过")
+
+
+def _exit_worker():
+    """在工作进程中模拟崩溃"""
+    os._exit(1)
+
+
+def test_ai_worker_pool():
+    """测试 AI 工作进程池"""
+    print("\n测试AI工作进程池...")
+    from app.services.ai_pool import (
+        AIJobError, AIWorkerPool, job_timeout, run_search_job, search_slots
+    )
+
+    fen = Board().to_fen('red')
+    result = run_search_job('greedy', 'red', fen)
+    from_row, from_col, to_row, to_col = result['move']
+    board = Board()
+    assert any(
+        (m.from_row, m.from_col, m.to_row, m.to_col) == (from_row, from_col, to_row, to_col)
+        for m in board.get_legal_moves('red')
+    ), "搜索任务应返回合法走法"
+    assert set(result['thinking_info']) == {'depth', 'nodes_evaluated', 'score', 'elapsed', 'nps'}
+
+    assert job_timeout('alphabeta', 3) == 3 + config.AI_JOB_TIMEOUT_GRACE, "超时应为时限加余量"
+    assert job_timeout('random') == config.AI_JOB_TIMEOUT + config.AI_JOB_TIMEOUT_GRACE
+    assert search_slots('random') == 1, "串行搜索占一个槽位"
+
+    async def run():
+        pool = AIWorkerPool(workers=1)
+        try:
+            result = await pool.search('random', 'red', fen)
+            assert result['move'] is not None, "进程池搜索应返回走法"
+            assert pool.stats()['searches'] == 1, "应统计完成的搜索"
+
+            # 工作进程崩溃后换用新的进程池
+            try:
+                await pool.run_task(_exit_worker, (), ai_type='random', timeout=30)
+                assert False, "崩溃的任务应报错"
+            except AIJobError:
+                pass
+            assert await pool.run_task(abs, (-3,), ai_type='random', timeout=30) == 3, "崩溃后应能继续执行任务"
+            assert pool.running == 0, "任务结束后应释放槽位"
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+    print("✓ AI工作进程池测试通过")
+
+
+def test_session_ai_instances():
+    """测试 AI 工作进程中每个搜索任务独立的 AI 实例"""
+    print("\n测试搜索任务AI实例...")
+    from app.services import ai_pool as pool_module
+
+    created, released = [], []
+    create_ai, release_ai = pool_module.create_ai, pool_module.release_ai
+
+    def recording_create(ai_type, color):
+        ai = create_ai(ai_type, color)
+        created.append(ai)
+        return ai
+
+    def recording_release(ai):
+        released.append(ai)
+        release_ai(ai)
+
+    # 节点预算搜索可复现：两次相同的任务结果一致说明置换表等状态没有沿用
+    saved = config.AI_CONFIGS['alphabeta']
+    config.AI_CONFIGS['alphabeta'] = dict(saved, max_nodes=2000, parallel_workers=0)
+    pool_module.create_ai, pool_module.release_ai = recording_create, recording_release
+    try:
+        fen = '2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w'
+        first = pool_module.run_search_job('alphabeta', 'red', fen)
+        second = pool_module.run_search_job('alphabeta', 'red', fen)
+    finally:
+        pool_module.create_ai, pool_module.release_ai = create_ai, release_ai
+        config.AI_CONFIGS['alphabeta'] = saved
+
+    assert len(created) == 2 and created[0] is not created[1], "每个搜索任务应创建自己的AI实例"
+    assert released == created, "搜索结束后应释放AI实例"
+    for key in ('depth', 'nodes_evaluated', 'score'):
+        assert first['thinking_info'][key] == second['thinking_info'][key], \
+            "前一个任务的搜索状态不应影响下一个任务"
+    assert first['move'] == second['move'], "前一个任务的搜索状态不应影响下一个任务"
+    board, _ = Board.from_fen(fen)
+    legal = {(m.from_row, m.from_col, m.to_row, m.to_col) for m in board.get_legal_moves('red')}
+    assert first['move'] in legal, "搜索任务应返回合法走法"
+
+    print("✓ 搜索任务AI实例测试通过")
+
+
+def test_ai_queue_priority():
+    """测试AI队列的优先级、老化和准入控制"""
+    print("\n测试AI队列优先级...")
+    import time
+    from app.services.ai_pool import AIJob, AIOverloaded, AIWorkerPool
+
+    # 等待越久优先级越高（数值越小）
+    job = AIJob('master', 'red', '', None, None, priority=5, seq=1, enqueued_at=100.0, started=None)
+    assert job.effective_priority(100.0) == 5, "刚入队时为原始优先级"
+    assert job.effective_priority(100.0 + 2 * config.AI_QUEUE_AGING) == 3, "等待后优先级应提高"
+
+    async def run():
+        pool = AIWorkerPool(workers=1)
+        order = []
+        positions = {}
+
+        async def submit(name, priority):
+            async def on_queued(position):
+                positions.setdefault(name, position)
+            await pool.run_task(abs, (-1,), ai_type='random', timeout=30,
+                                priority=priority, on_queued=on_queued)
+            order.append(name)
+
+        try:
+            blocker = asyncio.ensure_future(pool.run_task(time.sleep, (1,), ai_type='random', timeout=30))
+            await asyncio.sleep(0.1)
+            tasks = [asyncio.ensure_future(submit(name, priority))
+                     for name, priority in (('low', 5), ('high', 1), ('mid', 3))]
+            await asyncio.sleep(0.1)
+            assert pool.queued == 3, "工作进程忙时任务应排队"
+            await asyncio.gather(blocker, *tasks)
+            assert order == ['high', 'mid', 'low'], f"应按优先级执行: {order}"
+            assert positions['low'] == 1 and positions['mid'] == 2, "应通知排队位置"
+
+            # 队列已满时拒绝新任务
+            queue_max = config.AI_QUEUE_MAX
+            config.AI_QUEUE_MAX = 0
+            try:
+                await pool.search('random', 'red', Board().to_fen('red'))
+                assert False, "队列已满时应拒绝"
+            except AIOverloaded:
+                pass
+            finally:
+                config.AI_QUEUE_MAX = queue_max
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+    print("✓ AI队列优先级测试通过")
+
+
+def test_budget_policy():
+    """测试负载感知的搜索预算"""
+    print("\n测试搜索预算...")
+    from app.services.budget import BudgetPolicy
+
+    policy = BudgetPolicy()
+    assert policy.load(2, 2, 4) == 1.0, "负载应为(运行+排队)/容量"
+    assert policy.scale(config.AI_BUDGET_LOAD_THRESHOLD) == 1.0, "阈值以下不缩减"
+
+    time_limit = config.AI_CONFIGS['alphabeta']['time_limit']
+    floor = config.AI_CONFIGS['alphabeta']['min_time_limit']
+    assert policy.budget('alphabeta', 0, 0, 4) == (time_limit, None), "空闲时使用配置的时限"
+    seconds, _ = policy.budget('alphabeta', 4, 4, 4)
+    assert floor < seconds < time_limit, "负载高时时限应缩减"
+    assert policy.budget('alphabeta', 4, 400, 4) == (floor, None), "时限不应低于下限"
+    assert policy.budget('random', 4, 400, 4) == (None, None), "无时限的AI不受影响"
+
+    # 节点预算同样缩减，且不低于下限
+    config.AI_CONFIGS['_budget_test'] = {'max_nodes': 10000, 'min_max_nodes': 2000}
+    try:
+        assert policy.budget('_budget_test', 0, 0, 4) == (None, 10000)
+        assert policy.budget('_budget_test', 4, 400, 4) == (None, 2000), "节点预算不应低于下限"
+    finally:
+        del config.AI_CONFIGS['_budget_test']
+
+    metrics = policy.metrics.to_dict()
+    assert metrics['searches'] == 5, "只统计有预算的搜索"
+    assert metrics['reduced'] == 3 and metrics['floored'] == 2, f"缩减统计错误: {metrics}"
+    assert metrics['reduced_by_type'] == {'alphabeta': 2, '_budget_test': 1}
+
+    print("✓ 搜索预算测试通过")
+
+
+def test_node_budget():
+    """测试节点预算搜索"""
+    print("\n测试节点预算...")
+    from app.ai.alphabeta_ai import AlphaBetaAI
+    from app.ai.master_ai import MasterAI
+
+    fen = '2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w'
+    for cls in (AlphaBetaAI, MasterAI):
+        results = []
+        for _ in range(2):
+            board, _ = Board.from_fen(fen)
+            ai = cls('red', depth=8, max_nodes=500)
+            move = ai.get_move(board)
+            info = ai.get_thinking_info()
+            assert move in board.get_legal_moves('red'), "节点预算搜索应返回合法走法"
+            assert 500 <= info['nodes_evaluated'] < 1000, f"{cls.__name__} 应在预算附近停止: {info['nodes_evaluated']}"
+            assert info['nps'] > 0, "应报告每秒节点数"
+            results.append(((move.from_row, move.from_col, move.to_row, move.to_col),
+                            info['nodes_evaluated'], info['depth'], info['score']))
+        assert results[0] == results[1], f"{cls.__name__} 节点预算搜索应可复现"
+
+    print("✓ 节点预算测试通过")
+
+
+def test_session_lock():
+    """测试同一会话的并发操作被串行化"""
+    print("\n测试会话锁...")
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import MemorySessionStore
+
+    async def run():
+        manager = GameSessionManager(store=MemorySessionStore())
+        session = manager.create_session('random', player_color='red')
+
+        # 同一步棋并发提交两次，只能成功一次
+        results = await asyncio.gather(
+            manager.make_move_async(session, 7, 1, 7, 4),
+            manager.make_move_async(session, 7, 1, 7, 4)
+        )
+        assert [r['success'] for r in results].count(True) == 1, "同一走法只能成功一次"
+        assert len(session.move_history) == 1 and session.current_turn == 'black'
+        assert not session.is_busy(), "操作结束后会话不应忙碌"
+
+        # 已有AI搜索时拒绝新的搜索
+        session.ai_pending = True
+        result = await manager.get_ai_move_async(session)
+        assert result['code'] == 'busy', "AI思考中时应拒绝重复搜索"
+        session.ai_pending = False
+
+    asyncio.run(run())
+
+    print("✓ 会话锁测试通过")
+
+
+def test_session_lru_cleanup():
+    """测试会话按LRU顺序过期和换出"""
+    print("\n测试会话LRU清理...")
+    import time
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import MemorySessionStore
+
+    async def run():
+        manager = GameSessionManager(store=MemorySessionStore())
+        expired, pinned, idle, fresh, recent = [manager.create_session('random') for _ in range(5)]
+        now = time.time()
+        expired.last_activity = now - config.SESSION_TIMEOUT - 1
+        pinned.last_activity = idle.last_activity = now - config.SESSION_IDLE_EVICT - 1
+        manager.pin(pinned)
+
+        await manager._cleanup_old_sessions()
+        assert list(manager.sessions) == [fresh.game_id, recent.game_id, pinned.game_id], \
+            "过期和空闲会话应被移出，固定的会话应移到队尾"
+        assert manager.store.load(expired.game_id) is None, "过期会话应被删除"
+        assert manager.store.load(idle.game_id) is not None, "空闲会话应换出到存储"
+
+        # 超过上限时从最久未用的会话开始换出
+        max_sessions = config.MAX_SESSIONS
+        config.MAX_SESSIONS = 1
+        try:
+            await manager._cleanup_old_sessions()
+        finally:
+            config.MAX_SESSIONS = max_sessions
+        assert list(manager.sessions) == [pinned.game_id], "应换出最久未用的会话"
+        assert (await manager.get_session(fresh.game_id)).game_id == fresh.game_id, "换出的会话应能重新加载"
+
+    asyncio.run(run())
+
+    print("✓ 会话LRU清理测试通过")
+
+
+def test_session_snapshots():
+    """测试会话快照、持久化存储和换出/重新加载"""
+    print("\n测试会话快照...")
+    import tempfile
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import (
+        SessionSnapshot, SessionStore, SnapshotError, SQLiteSessionStore, decode_snapshot, encode_snapshot
+    )
+
+    class IncompleteStore(SessionStore):
+        def save(self, game_id, data, ttl):
+            pass
+
+    for store_class in (SessionStore, IncompleteStore):
+        try:
+            store_class()
+            assert False, "未实现 load/delete 的存储不应能创建"
+        except TypeError:
+            pass
+
+    snapshot = SessionSnapshot('abc123', 'master', 'black', Board().to_fen('red'), 1.5, 2.5,
+                               moves=[(7, 1, 7, 4), (0, 1, 2, 2)])
+    data = encode_snapshot(snapshot)
+    assert decode_snapshot(data) == snapshot, "快照应能往返"
+
+    # 版本1的快照没有标志字节
+    v1 = data[:3] + bytes([1]) + data[4:20] + data[21:]
+    assert decode_snapshot(v1) == snapshot, "应能读取版本1的快照"
+    for corrupt in (b'', b'XYZ' + data[3:], data[:-1]):
+        try:
+            decode_snapshot(corrupt)
+            assert False, "损坏的快照应报错"
+        except SnapshotError:
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(os.path.join(tmp, 'sessions.db'))
+        try:
+            store.save('a', b'data', 60)
+            store.save('b', b'old', -1)
+            assert store.load('a') == b'data' and store.load('b') is None, "过期快照不应返回"
+            assert store.delete('a') and not store.delete('a'), "删除应报告是否存在"
+            assert not store.delete('b') and store.purge_expired() == 1, "过期快照由清理删除"
+
+            async def run():
+                manager = GameSessionManager(store=store)
+                session = manager.create_session('random', player_color='black')
+                manager.make_move(session, 7, 1, 7, 4)
+                game_id = session.game_id
+
+                await manager._evict_session(game_id)
+                assert game_id not in manager.sessions, "会话应被换出"
+                first, second = await asyncio.gather(manager.get_session(game_id), manager.get_session(game_id))
+                assert first is second, "并发加载应得到同一会话"
+                assert first.board.to_fen(first.current_turn) == session.board.to_fen(session.current_turn)
+                assert first.player_color == 'black' and len(first.move_history) == 1
+
+                assert await manager.delete_session(game_id) and store.load(game_id) is None
+                assert not await manager.delete_session(game_id), "删除不存在的会话应返回False"
+
+            asyncio.run(run())
+        finally:
+            store.close()
+
+    print("✓ 会话快照测试通过")
+
+
+def test_shard_ring():
+    """测试一致性哈希环和分片"""
+    print("\n测试分片...")
+    from app.services.sharding import HashRing, ShardMap
+
+    nodes = ['http://a:8000', 'http://b:8000', 'http://c:8000']
+    keys = [f'game-{i}' for i in range(3000)]
+    ring = HashRing(nodes)
+    owners = {key: ring.node_for(key) for key in keys}
+    assert owners == {key: HashRing(nodes).node_for(key) for key in keys}, "归属应是确定的"
+    for node in nodes:
+        share = list(owners.values()).count(node) / len(keys)
+        assert 0.2 < share < 0.5, f"负载应大致均衡: {node} {share:.2f}"
+
+    # 增加节点只移动归属新节点的少量键
+    grown = HashRing(nodes + ['http://d:8000'])
+    moved = [key for key in keys if grown.node_for(key) != owners[key]]
+    assert all(grown.node_for(key) == 'http://d:8000' for key in moved), "移动的键应归新节点"
+    assert len(moved) < len(keys) * 0.4, "应只移动约1/N的键"
+
+    shard = ShardMap(nodes, 'http://b:8000')
+    for _ in range(10):
+        game_id = shard.new_game_id()
+        assert shard.is_local(game_id) and shard.owner(game_id) == 'http://b:8000', "新对局应归本副本"
+    local = ShardMap([])
+    assert not local.enabled and local.owner('x') is None and local.is_local('x'), "未分片时对局都在本地"
+    try:
+        ShardMap(nodes, 'http://z:8000')
+        assert False, "未知的 SHARD_ID 应报错"
+    except ValueError:
+        pass
+
+    print("✓ 分片测试通过")
+
+
+def test_game_state_cache():
+    """测试游戏状态缓存"""
+    print("\n测试游戏状态缓存...")
+    import json
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import MemorySessionStore
+
+    manager = GameSessionManager(store=MemorySessionStore())
+    session = manager.create_session('random')
+    state = manager.get_game_state(session)
+    state_json = manager.get_game_state_json(session)
+    assert manager.get_game_state(session) is state, "局面未变时应复用缓存的状态"
+    assert manager.get_game_state_json(session) is state_json
+    assert json.loads(state_json) == state, "缓存的JSON应与状态一致"
+    assert state['version'] == 0
+
+    manager.make_move(session, 7, 1, 7, 4)
+    moved = manager.get_game_state(session)
+    assert moved is not state and moved['version'] == 1, "走子后应重建状态"
+    assert moved['last_move'] == {'from': [7, 1], 'to': [7, 4]} and moved['current_turn'] == 'black'
+    assert json.loads(manager.get_game_state_json(session)) == moved
+
+    print("✓ 游戏状态缓存测试通过")
+
+
+def test_state_delta():
+    """测试v2协议的增量消息"""
+    print("\n测试增量消息...")
+    import zlib
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import MemorySessionStore
+
+    manager = GameSessionManager(store=MemorySessionStore())
+    session = manager.create_session('random')
+    start_hash = manager.get_game_state(session)['hash']
+    assert start_hash == '%08x' % zlib.crc32(Board().to_fen('red').encode()), "哈希应为FEN的CRC-32"
+
+    moved = manager.make_move(session, 7, 1, 7, 4)
+    assert moved['game_state']['hash'] != start_hash, "局面改变后哈希应改变"
+    undone = manager.undo_move(session, steps=1)
+    assert undone['game_state']['hash'] == start_hash, "回到同一局面时哈希应相同"
+    assert undone['game_state']['version'] == 2, "悔棋也应递增版本"
+
+    try:
+        from app.api.websocket.game_ws import delta_data
+    except ImportError:
+        print("  (未安装 fastapi，跳过 delta_data 测试)")
+    else:
+        delta = delta_data(moved)
+        assert delta == {
+            'seq': 1, 'hash': moved['game_state']['hash'], 'current_turn': 'black',
+            'game_result': 'ongoing', 'is_check': False, 'move': moved['move_info']
+        }, f"增量消息错误: {delta}"
+        assert delta_data(undone)['steps'] == 1 and 'move' not in delta_data(undone)
+
+        # 对战结束等非走子消息对 v2 连接也原样发送
+        from app.api.websocket.game_ws import Connection, ConnectionManager
+        ws_manager = ConnectionManager()
+        connections = [Connection(_FakeWebSocket(), protocol) for protocol in (1, 2)]
+        ws_manager.active_connections['g'] = {c.websocket: c for c in connections}
+        finished = {'match': {'match_id': 'g', 'status': 'finished'}, 'game_state': moved['game_state']}
+        asyncio.run(ws_manager.send_result_to_game('g', 'match_finished', finished))
+        for connection in connections:
+            assert connection._queue[0][1] == connection.codec.encode({'type': 'match_finished', 'data': finished}), \
+                f"v{connection.protocol} 应收到完整的对战结束消息"
+
+    print("✓ 增量消息测试通过")
+
+
+class _FakeWebSocket:
+    """记录发送帧的 WebSocket 替身"""
+
+    def __init__(self, incoming=()):
+        self.incoming = list(incoming)
+        self.sent = []
+
+    async def receive(self):
+        return self.incoming.pop(0)
+
+    async def send_text(self, frame):
+        self.sent.append(frame)
+
+    async def send_bytes(self, frame):
+        self.sent.append(frame)
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+
+class _GoneWebSocket(_FakeWebSocket):
+    """已断开的客户端：发送即报错"""
+
+    async def send_text(self, frame):
+        raise RuntimeError("websocket is closed")
+
+    send_bytes = send_text
+
+
+class _StalledWebSocket(_FakeWebSocket):
+    """不再读取的客户端：发送一直阻塞"""
+
+    async def send_text(self, frame):
+        await asyncio.sleep(3600)
+
+    send_bytes = send_text
+
+
+def test_ws_codecs():
+    """测试 WebSocket 消息编码"""
+    print("\n测试消息编码...")
+    try:
+        from app.api.websocket.codecs import JSON_CODEC, get_codec, receive_message
+    except ImportError:
+        print("  (未安装 fastapi，跳过)")
+        return
+    from fastapi import WebSocketDisconnect
+
+    message = {'type': 'move', 'data': {'from': [7, 1], 'to': [7, 4], 'notation': '炮二平五'}}
+    frame = JSON_CODEC.encode(message)
+    assert get_codec('json') is JSON_CODEC and get_codec('xml') is None
+    assert '炮二平五' in frame, "JSON 不应转义中文"
+
+    async def run():
+        messages = [{'type': 'websocket.receive', 'text': frame}]
+        codec = get_codec('msgpack')
+        if codec is not None:
+            messages.append({'type': 'websocket.receive', 'bytes': codec.encode(message)})
+        messages.append({'type': 'websocket.disconnect', 'code': 1000})
+        websocket = _FakeWebSocket(messages)
+        for _ in range(len(messages) - 1):
+            assert await receive_message(websocket) == message, "解码后应与原消息一致"
+        try:
+            await receive_message(websocket)
+            assert False, "断开连接应抛出 WebSocketDisconnect"
+        except WebSocketDisconnect:
+            pass
+
+    asyncio.run(run())
+    if get_codec('msgpack') is None:
+        print("  (未安装 msgpack，跳过二进制帧测试)")
+
+    print("✓ 消息编码测试通过")
+
+
+def test_ws_send_queue():
+    """测试 WebSocket 发送队列的背压处理"""
+    print("\n测试发送队列...")
+    try:
+        from app.api.websocket.game_ws import Connection, FanoutMetrics
+    except ImportError:
+        print("  (未安装 fastapi，跳过)")
+        return
+
+    async def run():
+        queue_max = config.WS_SEND_QUEUE_MAX
+        config.WS_SEND_QUEUE_MAX = 3
+        try:
+            connection = Connection(_FakeWebSocket())
+            connection.send({'type': 'ai_thinking', 'depth': 1})
+            connection.send({'type': 'ai_thinking', 'depth': 2})
+            assert len(connection._queue) == 1, "新的进度消息应替换排队中的旧消息"
+            connection.send({'type': 'move_made', 'n': 1})
+            connection.send({'type': 'move_made', 'n': 2})
+
+            # 队列满时先丢弃进度消息
+            connection.send({'type': 'ai_queued', 'position': 1})
+            assert connection.dropped == 1 and len(connection._queue) == 3
+            connection.send({'type': 'move_made', 'n': 3})
+            assert connection.dropped == 2, "应丢弃排队中的进度消息"
+            assert [key for key, _, _ in connection._queue] == [None, None, None]
+
+            # 积压的都是必须送达的消息时断开客户端
+            connection.send({'type': 'move_made', 'n': 4})
+            assert connection.closed and not connection._queue, "跟不上的客户端应被断开"
+        finally:
+            config.WS_SEND_QUEUE_MAX = queue_max
+
+        websocket = _FakeWebSocket()
+        connection = Connection(websocket)
+        metrics = FanoutMetrics()
+        failures = []
+        connection.start(failures.append, metrics)
+        for n in range(3):
+            connection.send({'type': 'move_made', 'n': n})
+        await asyncio.sleep(0.05)
+        connection.stop()
+        assert websocket.sent == [connection.codec.encode({'type': 'move_made', 'n': n}) for n in range(3)], \
+            "应按顺序发送"
+        assert metrics.sent == 3 and not failures
+
+        # 只有跟不上的客户端计为驱逐，正常断开不计
+        from app.api.websocket.game_ws import ConnectionManager, SLOW_CONSUMER_CLOSE_CODE
+        send_timeout = config.WS_SEND_TIMEOUT
+        config.WS_SEND_TIMEOUT = 0.05
+        try:
+            manager = ConnectionManager()
+            gone, stalled = _GoneWebSocket(), _StalledWebSocket()
+            for websocket in (gone, stalled):
+                await manager.connect(websocket, 'g')
+            await manager.send_to_game('g', {'type': 'move_made', 'n': 1})
+            await asyncio.sleep(0.2)
+            assert not manager.active_connections, "发送失败的连接都应被移除"
+            assert manager.evicted == 1, f"断开的客户端不应计为驱逐: {manager.evicted}"
+            assert stalled.close_code == SLOW_CONSUMER_CLOSE_CODE and gone.close_code == 1000
+        finally:
+            config.WS_SEND_TIMEOUT = send_timeout
+
+    asyncio.run(run())
+
+    print("✓ 发送队列测试通过")
+
+
+def test_spectator_sessions():
+    """测试由服务器对弈、只能观看的会话"""
+    print("\n测试观战会话...")
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import MemorySessionStore
+
+    async def run():
+        manager = GameSessionManager(store=MemorySessionStore())
+        session = manager.create_session('random', spectator_only=True)
+        for result in (
+            await manager.make_move_async(session, 7, 1, 7, 4),
+            await manager.undo_move_async(session, 1),
+            await manager.get_ai_move_async(session),
+        ):
+            assert not result['success'] and result['code'] == 'read_only', "观战会话应拒绝客户端操作"
+        assert manager.get_game_state(session)['spectator_only'], "状态应标明只能观看"
+
+        # 服务器自己走棋不受限制，只读标志在换出后保留
+        manager.make_move(session, 7, 1, 7, 4)
+        await manager._evict_session(session.game_id)
+        restored = await manager.get_session(session.game_id)
+        assert restored is not session and restored.spectator_only, "换出后应保留只读标志"
+        assert len(restored.move_history) == 1
+
+    asyncio.run(run())
+
+    print("✓ 观战会话测试通过")
+
+
+def test_match_runner():
+    """测试服务器对弈的AI对战"""
+    print("\n测试AI对战...")
+    from app.services.ai_pool import ai_pool
+    from app.services.game_service import session_manager
+    from app.services.match_runner import MatchError, MatchRunner
+
+    async def run():
+        runner = MatchRunner()
+        events = []
+
+        async def listener(game_id, message_type, result):
+            events.append(message_type)
+            raise RuntimeError("监听器出错不应影响对战")
+        runner.listeners.append(listener)
+
+        try:
+            runner.start_match('random', 'unknown')
+            assert False, "未知的AI类型应报错"
+        except MatchError:
+            pass
+
+        try:
+            match = runner.start_match('random', 'random', move_time=10 ** 6, max_moves=6, move_interval=-1)
+            assert match.move_time == config.MATCH_MAX_MOVE_TIME and match.move_interval == 0, "参数应被限制"
+            assert match.session.clients == 1, "对战会话应从创建起被固定"
+            await match.task
+            assert match.status == 'finished', f"对战应正常结束: {match.error}"
+            moves = len(match.session.move_history)
+            assert moves == 6 or match.session.game_result != 'ongoing', "应在步数上限处停止"
+            assert events == ['ai_move'] * moves + ['match_finished'], "每步和结束时都应通知"
+            assert match.session.clients == 0, "结束后应释放会话"
+
+            # 开始前取消的对战也应结束并释放会话
+            cancelled = runner.start_match('random', 'random', max_moves=10 ** 6)
+            assert cancelled.max_moves == config.MATCH_MAX_MOVES
+            assert runner.cancel_match(cancelled.match_id)
+            await asyncio.gather(cancelled.task, return_exceptions=True)
+            assert cancelled.status == 'cancelled' and cancelled.session.clients == 0
+            assert not runner.cancel_match(cancelled.match_id), "已结束的对战不能再取消"
+
+            # 对战中取消：通知结束后任务以取消状态结束
+            events.clear()
+            stopped = runner.start_match('random', 'random', move_interval=60)
+            while not events:
+                await asyncio.sleep(0.01)
+            assert runner.cancel_match(stopped.match_id)
+            await asyncio.gather(stopped.task, return_exceptions=True)
+            assert stopped.task.cancelled(), "取消后任务应以取消状态结束"
+            assert stopped.status == 'cancelled' and events == ['ai_move', 'match_finished'], events
+            assert stopped.session.clients == 0
+
+            for finished in (match, cancelled, stopped):
+                await session_manager.delete_session(finished.match_id)
+        finally:
+            ai_pool.shutdown()
+
+    asyncio.run(run())
+
+    print("✓ AI对战测试通过")
+
+
+def test_legal_move_map():
+    """测试走子方全部合法走法的缓存"""
+    print("\n测试合法走法表...")
+    from app.services.game_service import GameSessionManager
+    from app.services.session_store import MemorySessionStore
+
+    manager = GameSessionManager(store=MemorySessionStore())
+    session = manager.create_session('random')
+    move_map = manager.get_legal_move_map(session)
+    assert move_map['version'] == 0 and move_map['current_turn'] == 'red'
+    assert sum(len(entry['to']) for entry in move_map['legal_moves']) == 44, "开局红方应有44种走法"
+    for entry in move_map['legal_moves']:
+        assert sorted(entry['to']) == sorted(manager.get_legal_moves(session, *entry['from'])), \
+            "走法表应与单个棋子的合法走法一致"
+
+    cached = manager._legal_move_map(session)
+    assert manager._legal_move_map(session) is cached, "局面未变时应复用缓存"
+    manager.make_move(session, 7, 1, 7, 4)
+    move_map = manager.get_legal_move_map(session)
+    assert move_map['version'] == 1 and move_map['current_turn'] == 'black', "走子后应重新生成"
+    assert all(session.board.get_piece(*entry['from']).color == 'black' for entry in move_map['legal_moves'])
+
+    # 只为走动的棋子生成走法，仍需是走子方的棋子
+    move = manager._find_legal_move(session, 0, 1, 2, 2)
+    assert (move.from_row, move.from_col, move.to_row, move.to_col) == (0, 1, 2, 2)
+    assert manager._find_legal_move(session, 9, 1, 7, 2) is None, "不能走对方的棋子"
+    assert manager._find_legal_move(session, 4, 4, 5, 4) is None, "空格没有走法"
+    assert manager._find_legal_move(session, 0, 1, 1, 1) is None, "不合法的目标格"
+
+    print("✓ 合法走法表测试通过")
+
+
+def test_position_analysis():
+    """测试局面分析服务"""
+    print("\n测试局面分析...")
+    from app.ai.master_ai import MasterAI
+    from app.services.ai_pool import ai_pool
+    from app.services.analysis import (
+        AnalysisError, AnalysisService, _CachedAnalysis, _score_value, run_analysis_job
+    )
+
+    mate = config.ANALYSIS_MATE_SCORE
+    assert _score_value(12.6) == (13, False)
+    assert _score_value(float('inf')) == (mate, True) and _score_value(float('-inf')) == (-mate, True)
+    assert _score_value(-100000) == (-mate, True), "已分胜负的评分应报告为杀棋"
+
+    entry = _CachedAnalysis('fen', 4, 5.0, 2, {})
+    assert entry.covers('fen', 3, 5.0, 1) and not entry.covers('fen', 5, 5.0, 1), "更深的请求不能用缓存"
+    assert not entry.covers('fen', 4, 10.0, 2) and not entry.covers('other', 1, 1.0, 1)
+
+    # 缓存按LRU淘汰，已覆盖的请求不替换更好的结果
+    service = AnalysisService(cache_size=2)
+    service._store('a', entry)
+    service._store('b', _CachedAnalysis('fen-b', 4, 5.0, 1, {}))
+    service._store('a', _CachedAnalysis('fen', 2, 1.0, 1, {}))
+    assert service._cache['a'] is entry, "较浅的结果不应替换缓存"
+    service._store('c', _CachedAnalysis('fen-c', 4, 5.0, 1, {}))
+    assert list(service._cache) == ['a', 'c'], "应淘汰最久未用的局面"
+
+    # 多条主变例：每条都是合法的走法序列，且首步各不相同
+    fen = '2bak4/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w'
+    result = run_analysis_job(fen, 2, 4, 2)
+    assert len(result['lines']) == 2 and result['lines'][0]['move'] != result['lines'][1]['move']
+    for line in result['lines']:
+        board, turn = Board.from_fen(fen)
+        assert line['pv'][0] == line['move']
+        for from_row, from_col, to_row, to_col in line['pv']:
+            move = next(m for m in board.get_legal_moves(turn)
+                        if (m.from_row, m.from_col, m.to_row, m.to_col) == (from_row, from_col, to_row, to_col))
+            board.make_move(move)
+            turn = 'black' if turn == 'red' else 'red'
+
+    board, _ = Board.from_fen(fen)
+    ai = MasterAI('red', depth=2, time_limit=10, quiescence_depth=2)
+    move = ai.get_move(board)
+    assert ai.principal_variation(board, move, 1) == [(move.from_row, move.from_col, move.to_row, move.to_col)]
+
+    async def run():
+        for bad in ('not a fen', '2ba5/4a4/4b4/9/9/9/9/2C6/4R4/3AK4 w', '3ak4/9/9/9/9/9/9/9/4R4/3AK4 w'):
+            try:
+                await service.analyze(bad)
+                assert False, f"非法局面应报错: {bad}"
+            except AnalysisError:
+                pass
+
+        try:
+            first = await service.analyze(fen, depth=2, time_limit=2)
+            second = await service.analyze(fen, depth=1, time_limit=1)
+        finally:
+            ai_pool.shutdown()
+        assert not first['cached'] and second['cached'], "同一局面较浅的请求应命中缓存"
+        assert second['best_move'] == first['best_move'] and second['depth'] == 1
+        assert service.stats()['hits'] == 1
+
+    asyncio.run(run())
+
+    print("✓ 局面分析测试通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 50)
+    print("中国象棋游戏 - 后端服务测试")
+    print("=" * 50)
+
+    try:
+        test_lazy_evaluation()
+        test_lazy_search()
+        test_root_parallel_search()
+        test_shared_transposition_table()
+        test_ai_worker_pool()
+        test_session_ai_instances()
+        test_ai_queue_priority()
+        test_budget_policy()
+        test_node_budget()
+        test_session_lock()
+        test_session_lru_cleanup()
+        test_session_snapshots()
+        test_shard_ring()
+        test_game_state_cache()
+        test_state_delta()
+        test_ws_codecs()
+        test_ws_send_queue()
+        test_spectator_sessions()
+        test_match_runner()
+        test_legal_move_map()
+        test_position_analysis()
+
+        print("\n" + "=" * 50)
+        print("✓ 所有测试通过！")
+        print("=" * 50)
+
+    except Exception as e:
+        print(f"\n✗ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
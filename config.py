@@ -56,16 +56,8 @@ PIECE_TYPES = {
     'p': '卒'   # Pawn (黑方)
 }
 
-# 棋子价值
-PIECE_VALUES = {
-    'K': 10000,
-    'R': 900,
-    'C': 450,
-    'H': 450,
-    'A': 200,
-    'E': 200,
-    'P': 100
-}
+# 评估参数（ai/params/ 下的参数名称或参数文件路径），棋子价值、权重和位置价值表都在参数文件中
+EVAL_PARAMS = 'default'
 
 # AI 配置
 AI_CONFIGS = {
@@ -0,0 +1,130 @@
+"""
+攻击图：一个局面中双方棋子能走到的格子、攻击者数量和炮架
+
+同一局面（相同的 board.hash_value）只生成一次走法，供评估、走法排序和将军判定共用。
+"""
+
+
+class AttackMap:
+    """
+    某一局面的攻击图
+
+    每一方的数据在第一次使用时才生成，因此只能在棋盘仍处于该局面时访问，
+    应通过 board.get_attack_map() 获取，而不要跨走法保存引用。
+    """
+
+    def __init__(self, board):
+        """
+        初始化攻击图
+
+        Args:
+            board: 棋盘对象（当前局面）
+        """
+        self.board = board
+        self.hash_value = board.hash_value
+        self._sides = {}
+
+    def _side(self, color):
+        """获取（必要时生成）某一方的攻击数据"""
+        side = self._sides.get(color)
+        if side is None:
+            side = self._build(color)
+            self._sides[color] = side
+        return side
+
+    def _build(self, color):
+        """
+        生成某一方的攻击数据
+
+        Args:
+            color: 'red' or 'black'
+
+        Returns:
+            dict: counts（每格攻击者数量，下标 row * 9 + col）、
+                  targets（每个棋子可到达的格子）、screens（炮架）、move_count
+        """
+        board = self.board
+        counts = [0] * 90
+        targets = {}
+        screens = []
+        move_count = 0
+
+        pieces = board.red_pieces if color == 'red' else board.black_pieces
+        for piece in pieces:
+            squares = []
+            for move in piece.get_possible_moves(board):
+                counts[move.to_row * 9 + move.to_col] += 1
+                squares.append((move.to_row, move.to_col))
+            targets[(piece.row, piece.col)] = squares
+            move_count += len(squares)
+
+            if piece.type == 'C':
+                screens.extend(self._find_screens(piece))
+
+        return {
+            'counts': counts,
+            'targets': targets,
+            'screens': screens,
+            'move_count': move_count,
+        }
+
+    def _find_screens(self, cannon):
+        """
+        找出炮在四个方向上的炮架（遇到的第一个棋子）
+
+        Args:
+            cannon: 炮
+
+        Returns:
+            list: [((炮行, 炮列), (炮架行, 炮架列)), ...]
+        """
+        board = self.board
+        screens = []
+        for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            row, col = cannon.row + dr, cannon.col + dc
+            while 0 <= row <= 9 and 0 <= col <= 8:
+                if board.grid[row][col] is not None:
+                    screens.append(((cannon.row, cannon.col), (row, col)))
+                    break
+                row += dr
+                col += dc
+        return screens
+
+    def attackers(self, row, col, color):
+        """
+        某格被指定一方攻击的次数
+
+        Args:
+            row: 行
+            col: 列
+            color: 攻击方
+
+        Returns:
+            int: 攻击者数量
+        """
+        return self._side(color)['counts'][row * 9 + col]
+
+    def is_attacked(self, row, col, color):
+        """某格是否被指定一方攻击"""
+        return self._side(color)['counts'][row * 9 + col] > 0
+
+    def targets(self, color):
+        """
+        指定一方每个棋子可到达的格子
+
+        Returns:
+            dict: {(棋子行, 棋子列): [(行, 列), ...]}
+        """
+        return self._side(color)['targets']
+
+    def piece_targets(self, piece):
+        """某个棋子可到达的格子"""
+        return self._side(piece.color)['targets'].get((piece.row, piece.col), [])
+
+    def cannon_screens(self, color):
+        """指定一方所有炮的炮架"""
+        return self._side(color)['screens']
+
+    def move_count(self, color):
+        """指定一方的伪合法走法数（不检查是否送将）"""
+        return self._side(color)['move_count']
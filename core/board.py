@@ -3,6 +3,47 @@
 """
 import random
 from core.piece import King, Advisor, Elephant, Horse, Rook, Cannon, Pawn
+from core.attack_map import AttackMap
+
+# 参与结构哈希的棋子类型（兵、士、象、将），这些棋子的位置在搜索中很少变化
+STRUCTURE_PIECE_TYPES = frozenset(['P', 'A', 'E', 'K'])
+
+# 攻击图缓存的最大局面数，超过后整体清空
+ATTACK_MAP_CACHE_SIZE = 4096
+
+# FEN 棋子字符（红方大写、黑方小写，象记为 B、马记为 N，与通用象棋 FEN 一致）
+FEN_PIECE_CHARS = {'K': 'K', 'A': 'A', 'E': 'B', 'H': 'N', 'R': 'R', 'C': 'C', 'P': 'P'}
+FEN_PIECE_CLASSES = {
+    'K': King, 'A': Advisor, 'B': Elephant, 'E': Elephant,
+    'N': Horse, 'H': Horse, 'R': Rook, 'C': Cannon, 'P': Pawn
+}
+
+# 初始局面 FEN
+INITIAL_FEN = 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w'
+
+
+def _build_zobrist_table():
+    """
+    生成 Zobrist 哈希表
+
+    使用独立的固定种子随机数生成器：所有棋盘、所有进程得到同一组键，
+    且不会重置全局 random 的状态。
+
+    Returns:
+        dict: {(棋子类型, 颜色, 行, 列): 64 位随机数}
+    """
+    rng = random.Random(42)
+    table = {}
+    for piece_type in ['K', 'A', 'E', 'H', 'R', 'C', 'P']:
+        for color in ['red', 'black']:
+            for row in range(10):
+                for col in range(9):
+                    table[(piece_type, color, row, col)] = rng.getrandbits(64)
+    return table
+
+
+# Zobrist 哈希表，模块加载时生成一次，所有棋盘共用
+ZOBRIST_TABLE = _build_zobrist_table()
 
 
 class Board:
@@ -14,23 +55,14 @@ class Board:
         self.red_pieces = []
         self.black_pieces = []
         self.hash_value = 0
+        self.structure_hash = 0  # 只包含兵/士/象/将的哈希，用于结构评估缓存
+        self._attack_maps = {}  # 攻击图缓存（局面哈希 -> AttackMap）
         self._init_zobrist()
         self.setup_initial_position()
 
     def _init_zobrist(self):
-        """初始化 Zobrist 哈希表"""
-        random.seed(42)  # 固定种子以保证一致性
-        self.zobrist_table = {}
-
-        piece_types = ['K', 'A', 'E', 'H', 'R', 'C', 'P']
-        colors = ['red', 'black']
-
-        for piece_type in piece_types:
-            for color in colors:
-                for row in range(10):
-                    for col in range(9):
-                        key = (piece_type, color, row, col)
-                        self.zobrist_table[key] = random.getrandbits(64)
+        """使用模块级共享的 Zobrist 哈希表（只读）"""
+        self.zobrist_table = ZOBRIST_TABLE
 
     def setup_initial_position(self):
         """设置初始棋局"""
@@ -39,6 +71,8 @@ class Board:
         self.red_pieces = []
         self.black_pieces = []
         self.hash_value = 0
+        self.structure_hash = 0
+        self._attack_maps = {}
 
         # 黑方（上方，行0-4）
         # 第0行：车马象士将士象马车
@@ -92,6 +126,8 @@ class Board:
         key = (piece.type, piece.color, piece.row, piece.col)
         if key in self.zobrist_table:
             self.hash_value ^= self.zobrist_table[key]
+            if piece.type in STRUCTURE_PIECE_TYPES:
+                self.structure_hash ^= self.zobrist_table[key]
 
     def remove_piece(self, piece):
         """从棋盘移除棋子"""
@@ -107,6 +143,8 @@ class Board:
         key = (piece.type, piece.color, piece.row, piece.col)
         if key in self.zobrist_table:
             self.hash_value ^= self.zobrist_table[key]
+            if piece.type in STRUCTURE_PIECE_TYPES:
+                self.structure_hash ^= self.zobrist_table[key]
 
     def get_piece(self, row, col):
         """获取指定位置的棋子"""
@@ -132,10 +170,14 @@ class Board:
             # 如果起始位置没有棋子，说明move无效
             return None
 
+        is_structure = actual_piece.type in STRUCTURE_PIECE_TYPES
+
         # 移除起始位置的棋子哈希
         key = (actual_piece.type, actual_piece.color, move.from_row, move.from_col)
         if key in self.zobrist_table:
             self.hash_value ^= self.zobrist_table[key]
+            if is_structure:
+                self.structure_hash ^= self.zobrist_table[key]
 
         # 移除目标位置的棋子（如果有）
         captured = self.get_piece(move.to_row, move.to_col)
@@ -152,6 +194,8 @@ class Board:
         key = (actual_piece.type, actual_piece.color, move.to_row, move.to_col)
         if key in self.zobrist_table:
             self.hash_value ^= self.zobrist_table[key]
+            if is_structure:
+                self.structure_hash ^= self.zobrist_table[key]
 
         return captured
 
@@ -169,10 +213,14 @@ class Board:
         if actual_piece is None:
             return
 
+        is_structure = actual_piece.type in STRUCTURE_PIECE_TYPES
+
         # 移除当前位置的棋子哈希
         key = (actual_piece.type, actual_piece.color, move.to_row, move.to_col)
         if key in self.zobrist_table:
             self.hash_value ^= self.zobrist_table[key]
+            if is_structure:
+                self.structure_hash ^= self.zobrist_table[key]
 
         # 移动棋子回原位
         self.grid[move.to_row][move.to_col] = captured_piece
@@ -193,11 +241,15 @@ class Board:
             key = (captured_piece.type, captured_piece.color, captured_piece.row, captured_piece.col)
             if key in self.zobrist_table:
                 self.hash_value ^= self.zobrist_table[key]
+                if captured_piece.type in STRUCTURE_PIECE_TYPES:
+                    self.structure_hash ^= self.zobrist_table[key]
 
         # 恢复原位置的棋子哈希
         key = (actual_piece.type, actual_piece.color, move.from_row, move.from_col)
         if key in self.zobrist_table:
             self.hash_value ^= self.zobrist_table[key]
+            if is_structure:
+                self.structure_hash ^= self.zobrist_table[key]
 
     def get_all_pieces(self, color=None):
         """获取所有棋子或指定颜色的棋子"""
@@ -231,6 +283,49 @@ class Board:
 
         return legal_moves
 
+    def get_legal_moves_from(self, row, col):
+        """
+        获取指定位置棋子的合法走法（只生成并验证这一个棋子的走法）
+
+        Args:
+            row: 行
+            col: 列
+
+        Returns:
+            list: 合法走法列表，该位置没有棋子时为空
+        """
+        from core.rules import is_legal_move
+
+        piece = self.get_piece(row, col)
+        if piece is None:
+            return []
+
+        return [
+            move for move in piece.get_possible_moves(self)
+            if is_legal_move(self, move, piece.color)
+        ]
+
+    def has_legal_move(self, color):
+        """
+        判断某方是否还有合法走法（找到第一个即返回，用于将死/僵局判定）
+
+        Args:
+            color: 'red' or 'black'
+
+        Returns:
+            bool: 是否有合法走法
+        """
+        from core.rules import is_legal_move
+
+        pieces = self.red_pieces if color == 'red' else self.black_pieces
+
+        for piece in pieces:
+            for move in piece.get_possible_moves(self):
+                if is_legal_move(self, move, color):
+                    return True
+
+        return False
+
     def find_king(self, color):
         """找到指定颜色的将/帅"""
         pieces = self.red_pieces if color == 'red' else self.black_pieces
@@ -246,6 +341,8 @@ class Board:
         new_board.red_pieces = []
         new_board.black_pieces = []
         new_board.hash_value = self.hash_value
+        new_board.structure_hash = self.structure_hash
+        new_board._attack_maps = {}
         new_board.zobrist_table = self.zobrist_table
 
         # 复制所有棋子
@@ -265,6 +362,122 @@ class Board:
         self.red_pieces = []
         self.black_pieces = []
         self.hash_value = 0
+        self.structure_hash = 0
+        self._attack_maps = {}
+
+    def get_attack_map(self):
+        """
+        获取当前局面的攻击图（按局面哈希缓存，同一局面只生成一次走法）
+
+        Returns:
+            AttackMap: 攻击图，只在棋盘处于当前局面时有效
+        """
+        attack_map = self._attack_maps.get(self.hash_value)
+        if attack_map is None:
+            if len(self._attack_maps) >= ATTACK_MAP_CACHE_SIZE:
+                self._attack_maps.clear()
+            attack_map = AttackMap(self)
+            self._attack_maps[self.hash_value] = attack_map
+        return attack_map
+
+    def peek_attack_map(self):
+        """
+        获取当前局面已生成的攻击图，不存在时返回 None（不触发生成）
+
+        Returns:
+            AttackMap: 攻击图或 None
+        """
+        return self._attack_maps.get(self.hash_value)
+
+    def to_fen(self, turn='red'):
+        """
+        导出 FEN 字符串（第0行在前，即黑方底线在前）
+
+        Args:
+            turn: 轮到走棋的一方 'red' or 'black'
+
+        Returns:
+            str: FEN 字符串，例如 INITIAL_FEN
+        """
+        ranks = []
+        for row in range(10):
+            rank = ''
+            empty = 0
+            for col in range(9):
+                piece = self.grid[row][col]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                char = FEN_PIECE_CHARS[piece.type]
+                rank += char if piece.color == 'red' else char.lower()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        return '/'.join(ranks) + (' w' if turn == 'red' else ' b')
+
+    def load_fen(self, fen):
+        """
+        从 FEN 字符串设置局面
+
+        Args:
+            fen: FEN 字符串（只使用局面和走棋方两个字段）
+
+        Returns:
+            str: 轮到走棋的一方 'red' or 'black'
+
+        Raises:
+            ValueError: FEN 格式错误
+        """
+        fields = fen.strip().split()
+        if not fields:
+            raise ValueError("FEN 为空")
+
+        ranks = fields[0].split('/')
+        if len(ranks) != 10:
+            raise ValueError(f"FEN 行数错误: {len(ranks)}")
+
+        pieces = []
+        for row, rank in enumerate(ranks):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                piece_class = FEN_PIECE_CLASSES.get(char.upper())
+                if piece_class is None or col > 8:
+                    raise ValueError(f"FEN 第{row}行无效: {rank}")
+                color = 'red' if char.isupper() else 'black'
+                pieces.append(piece_class(color, row, col))
+                col += 1
+            if col != 9:
+                raise ValueError(f"FEN 第{row}行列数错误: {rank}")
+
+        self.clear()
+        for piece in pieces:
+            self.add_piece(piece)
+
+        if len(fields) > 1 and fields[1] in ('b', 'black'):
+            return 'black'
+        return 'red'
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        从 FEN 字符串创建棋盘
+
+        Args:
+            fen: FEN 字符串
+
+        Returns:
+            tuple: (Board, 轮到走棋的一方)
+        """
+        board = cls()
+        turn = board.load_fen(fen)
+        return board, turn
 
     def __repr__(self):
         """字符串表示（用于调试）"""
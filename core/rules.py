@@ -20,13 +20,18 @@ def is_in_check(board, color):
 
     # 检查对方所有棋子是否能攻击到己方的将/帅
     opponent_color = 'black' if color == 'red' else 'red'
-    opponent_pieces = board.get_all_pieces(opponent_color)
+    attack_map = board.peek_attack_map()
 
-    for piece in opponent_pieces:
-        possible_moves = piece.get_possible_moves(board)
-        for move in possible_moves:
-            if move.to_row == king.row and move.to_col == king.col:
-                return True
+    if attack_map is not None:
+        # 当前局面已有攻击图（评估等已生成），直接复用
+        if attack_map.is_attacked(king.row, king.col, opponent_color):
+            return True
+    else:
+        # 没有攻击图时逐个检查，找到第一个攻击者即返回（合法性检查的子局面大多不会再被访问）
+        for piece in board.get_all_pieces(opponent_color):
+            for move in piece.get_possible_moves(board):
+                if move.to_row == king.row and move.to_col == king.col:
+                    return True
 
     # 特殊规则：检查将帅是否对面
     opponent_king = board.find_king(opponent_color)
@@ -85,8 +90,7 @@ def is_checkmate(board, color):
         return False
 
     # 检查是否有任何合法走法可以解除将军
-    legal_moves = board.get_legal_moves(color)
-    return len(legal_moves) == 0
+    return not board.has_legal_move(color)
 
 
 def is_stalemate(board, color):
@@ -105,8 +109,7 @@ def is_stalemate(board, color):
         return False
 
     # 检查是否有任何合法走法
-    legal_moves = board.get_legal_moves(color)
-    return len(legal_moves) == 0
+    return not board.has_legal_move(color)
 
 
 def get_game_result(board, current_color):
@@ -137,3 +140,26 @@ def get_game_result(board, current_color):
         return 'draw'
 
     return 'ongoing'
+
+
+def validate_position(board, turn):
+    """
+    检查局面能否继续对局（FEN 只检查格式，不检查局面是否合法）
+
+    Args:
+        board: 棋盘对象
+        turn: 轮到走棋的一方 'red' or 'black'
+
+    Returns:
+        str: 局面不合法的原因，合法时为 None
+    """
+    for color, name in (('red', '红方'), ('black', '黑方')):
+        if board.find_king(color) is None:
+            return f"缺少{name}将帅"
+
+    # 非走棋方被将军，说明上一步走棋方送将
+    opponent_color = 'black' if turn == 'red' else 'red'
+    if is_in_check(board, opponent_color):
+        return "非走棋方正被将军"
+
+    return None
@@ -45,6 +45,8 @@ export interface GameState {
   captured_pieces: { type: PieceType; color: PieceColor }[];
   ai_type: string;
   player_color: PieceColor;
+  version: number;  // increments on every move or undo
+  spectator_only: boolean;  // AI-vs-AI match played by the server
 }
 
 export interface AIConfig {
@@ -140,13 +140,7 @@ class GameManager:
 
     def _get_legal_moves_for_piece(self, piece):
         """获取指定棋子的合法走法"""
-        from core.rules import is_legal_move
-        possible_moves = piece.get_possible_moves(self.board)
-        legal_moves = []
-        for move in possible_moves:
-            if is_legal_move(self.board, move, piece.color):
-                legal_moves.append(move)
-        return legal_moves
+        return self.board.get_legal_moves_from(piece.row, piece.col)
 
     def make_move(self, move):
         """
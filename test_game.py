@@ -10,6 +10,7 @@ from ai.random_ai import RandomAI
 from ai.greedy_ai import GreedyAI
 from ai.minimax_ai import MinimaxAI
 from ai.alphabeta_ai import AlphaBetaAI
+from ai.evaluator import Evaluator
 
 
 def test_board():
@@ -126,6 +127,222 @@ def test_game_flow():
     print(f"✓ 游戏流程测试通过 (执行了{moves_played}步)")
 
 
+def test_structure_cache():
+    """测试结构哈希与结构评估缓存"""
+    print("\n测试结构评估缓存...")
+    board = Board()
+    evaluator = Evaluator()
+    initial_hash = board.structure_hash
+
+    # 车马炮的走法不改变结构哈希
+    rook_move = next(m for m in board.get_legal_moves('red') if m.piece.type == 'R')
+    captured = board.make_move(rook_move)
+    assert board.structure_hash == initial_hash, "非结构棋子走动改变了结构哈希"
+    board.undo_move(rook_move, captured)
+
+    # 兵的走法改变结构哈希，撤销后恢复
+    pawn_move = next(m for m in board.get_legal_moves('red') if m.piece.type == 'P')
+    captured = board.make_move(pawn_move)
+    assert board.structure_hash != initial_hash, "兵走动没有改变结构哈希"
+    board.undo_move(pawn_move, captured)
+    assert board.structure_hash == initial_hash, "撤销后结构哈希未恢复"
+
+    # 缓存命中时结果与直接计算一致
+    first = evaluator._evaluate_structure(board)
+    second = evaluator._evaluate_structure(board)
+    assert first == second == evaluator._compute_structure(board), "结构评估缓存结果不一致"
+    assert evaluator.structure_stats['hits'] == 1, "结构评估缓存未命中"
+
+    print("✓ 结构评估缓存测试通过")
+
+
+def test_eval_params():
+    """测试评估参数文件的加载、保存和热替换"""
+    print("\n测试评估参数...")
+    import os
+    import tempfile
+    from ai.eval_params import load_params, save_params
+
+    board = Board()
+    params = load_params('default')
+    assert load_params('default') is params, "参数文件应只加载一次"
+    assert params.piece_values['R'] == 900, "车的价值错误"
+
+    # 修改参数后保存、重新加载，评估结果应随之改变
+    data = params.to_dict()
+    data['name'] = 'test'
+    data['piece_values']['P'] = 150
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'test.json')
+        save_params(data, path)
+        tuned = load_params(path)
+
+        # 相对路径与绝对路径共用缓存，保存后缓存失效
+        relative = os.path.relpath(path)
+        assert load_params(relative) is tuned, "同一文件应只加载一次"
+        data['piece_values']['P'] = 160
+        save_params(data, relative)
+        assert load_params(path).piece_values['P'] == 160, "保存后应重新加载参数"
+
+    evaluator = Evaluator()
+    before = evaluator.evaluate(board)
+    board.remove_piece(board.get_piece(3, 0))  # 去掉一个黑卒
+    default_score = evaluator.evaluate(board)
+    evaluator.set_params(tuned)
+    tuned_score = evaluator.evaluate(board)
+    assert default_score > before, "红方多兵应得到更高评分"
+    assert tuned_score > default_score, "提高兵的价值后评分应更高"
+
+    print("✓ 评估参数测试通过")
+
+
+def test_fen():
+    """测试 FEN 导入导出"""
+    print("\n测试FEN...")
+    from core.board import INITIAL_FEN
+
+    board = Board()
+    assert board.to_fen() == INITIAL_FEN, "初始局面FEN错误"
+
+    move = board.get_legal_moves('red')[0]
+    board.make_move(move)
+    fen = board.to_fen('black')
+    restored, turn = Board.from_fen(fen)
+    assert turn == 'black', "FEN走棋方错误"
+    assert restored.to_fen('black') == fen, "FEN往返不一致"
+    assert restored.hash_value == board.hash_value, "FEN恢复后哈希不一致"
+
+    print("✓ FEN测试通过")
+
+
+def test_validate_position():
+    """测试局面合法性检查"""
+    print("\n测试局面合法性...")
+    from core.rules import validate_position
+
+    board, turn = Board.from_fen(Board().to_fen())
+    assert validate_position(board, turn) is None, "初始局面应合法"
+
+    # 缺少黑将 / 红帅
+    board, turn = Board.from_fen('9/9/9/9/9/9/9/9/9/R3K4 w')
+    assert validate_position(board, turn) is not None, "缺少黑将应不合法"
+    board, turn = Board.from_fen('4k4/9/9/9/9/9/9/9/9/R8 w')
+    assert validate_position(board, turn) is not None, "缺少红帅应不合法"
+
+    # 红车将军黑将：轮到黑方走时合法，轮到红方走时不合法
+    board, turn = Board.from_fen('4k4/9/9/9/9/9/9/9/4R4/3K5 b')
+    assert validate_position(board, turn) is None, "走棋方被将军应合法"
+    board, turn = Board.from_fen('4k4/9/9/9/9/9/9/9/4R4/3K5 w')
+    assert validate_position(board, turn) is not None, "非走棋方被将军应不合法"
+
+    print("✓ 局面合法性测试通过")
+
+
+def test_attack_map():
+    """测试攻击图与将军判定"""
+    print("\n测试攻击图...")
+    board = Board()
+
+    attack_map = board.get_attack_map()
+    assert board.get_attack_map() is attack_map, "同一局面应复用攻击图"
+    assert attack_map.move_count('red') == len(board.get_legal_moves('red')), "初始局面走法数不一致"
+    assert attack_map.is_attacked(7, 4, 'red'), "炮二平五的目标格应被红方攻击"
+    assert len(attack_map.cannon_screens('red')) == 6, "红方两个炮各有三个方向有炮架"
+
+    # 有无攻击图时将军判定结果一致
+    board.clear()
+    board.load_fen('4k4/9/9/9/4P4/9/9/9/4C4/3K5 w')
+    assert board.peek_attack_map() is None
+    assert is_in_check(board, 'black'), "炮隔子将军未识别（无攻击图）"
+    board.get_attack_map()
+    assert is_in_check(board, 'black'), "炮隔子将军未识别（攻击图）"
+
+    print("✓ 攻击图测试通过")
+
+
+def test_legal_moves_from():
+    """测试单个棋子的合法走法生成"""
+    print("\n测试单个棋子走法...")
+    board = Board()
+
+    per_piece = []
+    for piece in board.red_pieces:
+        per_piece.extend(board.get_legal_moves_from(piece.row, piece.col))
+    assert set(per_piece) == set(board.get_legal_moves('red')), "逐子生成与整方生成不一致"
+    assert board.get_legal_moves_from(5, 4) == [], "空位置应没有走法"
+
+    # 被牵制的棋子不能离开将线
+    board.clear()
+    board.load_fen('4k4/4r4/9/9/9/9/9/4R4/9/4K4 w')
+    moves = board.get_legal_moves_from(7, 4)
+    assert moves and all(move.to_col == 4 for move in moves), "被牵制的车离开了将线"
+
+    print("✓ 单个棋子走法测试通过")
+
+
+def test_texel_tuning():
+    """测试 Texel 评估参数调优"""
+    print("\n测试参数调优...")
+    import os
+    import tempfile
+    from ai import tuning
+    from ai.eval_params import load_params, save_params
+
+    params = load_params('default')
+    evaluator = Evaluator(params)
+    base = tuning.params_to_vector(params)
+    positions = [
+        ('rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w', 0.5),
+        ('1nbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w', 1.0),
+        ('rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/R1BAKABNR b', 0.0),
+        ('3ak4/4a4/9/9/9/9/9/2C6/4R4/3AK4 w', 1.0),
+    ]
+
+    # 线性特征与基础向量的点积等于子力+位置评分
+    for fen, _ in positions:
+        board, _ = Board.from_fen(fen)
+        linear = sum(coeff * base[index] for index, coeff in tuning.extract_features(board, params))
+        assert abs(linear - evaluator._evaluate_material_position(board)[0]) < 1e-6, "线性特征与评估不一致"
+
+    # 在本进程中计算样本，检查损失的分片求和与梯度
+    tuning._init_feature_worker(params)
+    samples = [tuning._extract_sample(position) for position in positions]
+    tuning._init_gradient_worker(samples)
+    loss, gradient = tuning._shard_loss_and_gradient((0, 1, base, 1.0, True))
+    shard_losses = [tuning._shard_loss_and_gradient((s, 2, base, 1.0, False))[0] for s in range(2)]
+    assert abs(sum(shard_losses) - loss) < 1e-9, "分片损失之和应等于总损失"
+
+    h = 0.01
+    for index in [i for i, g in enumerate(gradient) if g][:5]:
+        up, down = list(base), list(base)
+        up[index] += h
+        down[index] -= h
+        numeric = (tuning._shard_loss_and_gradient((0, 1, up, 1.0, False))[0]
+                   - tuning._shard_loss_and_gradient((0, 1, down, 1.0, False))[0]) / (2 * h)
+        assert abs(numeric - gradient[index]) < 1e-6 + 1e-3 * abs(numeric), "梯度与数值差分不一致"
+
+    # 多进程调优降低损失，结果可以保存并重新加载
+    tuner = tuning.TexelTuner(params, workers=2)
+    try:
+        assert tuner.load_positions(positions) == len(positions)
+        initial_loss = tuner.loss_and_gradient(with_gradient=False)[0]
+        assert abs(initial_loss - loss / len(positions)) < 1e-9, "并行损失应与单进程一致"
+        final_loss = tuner.tune(iterations=5, learning_rate=5.0)
+        assert final_loss < initial_loss, "调优应降低损失"
+        data = tuner.result_params('tuned')
+    finally:
+        tuner.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tuned.json')
+        save_params(data, path)
+        tuned = load_params(path)
+    assert tuned.name == 'tuned'
+    assert tuning.params_to_vector(tuned) == [float(round(v)) for v in tuner.vector], "参数应能往返"
+
+    print("✓ 参数调优测试通过")
+
+
 def main():
     """运行所有测试"""
     print("=" * 50)
@@ -137,6 +354,13 @@ def main():
         test_moves()
         test_ai()
         test_game_flow()
+        test_structure_cache()
+        test_eval_params()
+        test_fen()
+        test_validate_position()
+        test_attack_map()
+        test_legal_moves_from()
+        test_texel_tuning()
 
         print("\n" + "=" * 50)
         print("✓ 所有测试通过！")